@@ -1,3 +1,4 @@
+import argparse
 import random
 import time
 
@@ -34,9 +35,33 @@ def send_event(event: dict, access_token: str) -> None:
     notification_logger.info(response.text)
 
 
+def send_events_batch(events: list[dict], access_token: str) -> None:
+    """Отправка пачки событий в ручку '/batch' одним запросом"""
+
+    response = requests.post(
+        f"{settings.notification_api_url}batch",
+        json=events,
+        timeout=15,
+        cookies={"access_token": access_token, "X-Request-ID": fake.uuid4()},
+    )
+    notification_logger.info(response.status_code)
+    notification_logger.info(response.text)
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=1)
+    args = parser.parse_args()
+
     for i in range(100):
         random_function = random.choice(event_functions)
-        event, access_token = random_function()
-        send_event(event, access_token)
+        if args.batch_size == 1:
+            event, access_token = random_function()
+            send_event(event, access_token)
+        else:
+            # в пачке события одного типа, поэтому подходит токен любого из них
+            generated = [random_function() for _ in range(args.batch_size)]
+            send_events_batch(
+                [event for event, _ in generated], access_token=generated[-1][1]
+            )
         time.sleep(1)
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends, status
+
+from src.models.admission import ServiceAdmissionStats
+from src.services.admission import admission_controller
+from src.utils.jwt_and_services import CheckService
+from src.utils.services_constant import ServiceEnum
+
+router = APIRouter(tags=["admission"])
+
+
+@router.get(
+    "/stats",
+    status_code=status.HTTP_200_OK,
+    description="Limits and live admission counters of producer services "
+    "in this API process",
+    response_description="Admission counters by service",
+    dependencies=[Depends(CheckService(services=[ServiceEnum.ADMIN_PANEL]))],
+)
+async def admission_stats() -> dict[str, ServiceAdmissionStats]:
+    return admission_controller.stats()
@@ -0,0 +1,83 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from src.core.config import settings
+from src.db.mongo import get_mongo_db
+from src.models.inbox import InboxPage, UnreadCount
+from src.services.inbox import InboxService, InvalidCursor
+from src.utils.jwt_and_services import UserAccessTokenPayload, verify_user_token_dep
+
+router = APIRouter(tags=["inbox"])
+
+PageLimit = Annotated[int, Query(ge=1, le=settings.inbox_max_page_size)]
+
+
+def get_inbox_service() -> InboxService:
+    return InboxService(
+        get_mongo_db(settings.mongo.db_name),
+        notification_collection=settings.mongo.notification_collection,
+        counter_collection=settings.mongo.inbox_counter_collection,
+    )
+
+
+@router.get(
+    "/",
+    status_code=status.HTTP_200_OK,
+    description="User notifications, newest first",
+    response_description="Page of notifications and the cursor of the next page",
+)
+async def inbox(
+    user: Annotated[UserAccessTokenPayload, Depends(verify_user_token_dep)],
+    service: Annotated[InboxService, Depends(get_inbox_service)],
+    cursor: str | None = None,
+    limit: PageLimit = settings.inbox_page_size,
+) -> InboxPage:
+    try:
+        return await service.get_page(user.user_id, cursor, limit)
+    except InvalidCursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+@router.get(
+    "/unread_count",
+    status_code=status.HTTP_200_OK,
+    description="Number of unread user notifications",
+    response_description="Unread notifications count",
+)
+async def unread_count(
+    user: Annotated[UserAccessTokenPayload, Depends(verify_user_token_dep)],
+    service: Annotated[InboxService, Depends(get_inbox_service)],
+) -> UnreadCount:
+    return UnreadCount(unread=await service.unread_count(user.user_id))
+
+
+@router.post(
+    "/read",
+    status_code=status.HTTP_200_OK,
+    description="Marks all user notifications as read",
+    response_description="Unread notifications count",
+)
+async def read_all(
+    user: Annotated[UserAccessTokenPayload, Depends(verify_user_token_dep)],
+    service: Annotated[InboxService, Depends(get_inbox_service)],
+) -> UnreadCount:
+    return UnreadCount(unread=await service.mark_all_read(user.user_id))
+
+
+@router.post(
+    "/{notification_id}/read",
+    status_code=status.HTTP_204_NO_CONTENT,
+    description="Marks user notification as read",
+)
+async def read(
+    notification_id: str,
+    user: Annotated[UserAccessTokenPayload, Depends(verify_user_token_dep)],
+    service: Annotated[InboxService, Depends(get_inbox_service)],
+) -> None:
+    if not await service.mark_read(user.user_id, notification_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Notification not found"
+        )
@@ -0,0 +1,63 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, status
+
+from src.core.config import settings
+from src.db.mongo import get_mongo_db
+from src.models.lineage import BulkUpdateResult, EventNotifications, RescheduleRequest
+from src.services.lineage import EventLineageService
+from src.utils.jwt_and_services import CheckService
+from src.utils.services_constant import ServiceEnum
+
+router = APIRouter(
+    tags=["lineage"],
+    dependencies=[Depends(CheckService(services=[ServiceEnum.ADMIN_PANEL]))],
+)
+
+
+def get_lineage_service() -> EventLineageService:
+    return EventLineageService(
+        get_mongo_db(settings.mongo.db_name),
+        notification_collection=settings.mongo.notification_collection,
+        counter_collection=settings.mongo.inbox_counter_collection,
+    )
+
+
+@router.get(
+    "/{event_id}/notifications",
+    status_code=status.HTTP_200_OK,
+    description="Notifications of the event by status",
+    response_description="Notifications count by status",
+)
+async def event_notifications(
+    event_id: str,
+    service: Annotated[EventLineageService, Depends(get_lineage_service)],
+) -> EventNotifications:
+    return await service.summary(event_id)
+
+
+@router.post(
+    "/{event_id}/cancel",
+    status_code=status.HTTP_200_OK,
+    description="Cancels unsent notifications of the event",
+    response_description="Matched and cancelled notifications count",
+)
+async def cancel_event_notifications(
+    event_id: str,
+    service: Annotated[EventLineageService, Depends(get_lineage_service)],
+) -> BulkUpdateResult:
+    return await service.cancel(event_id)
+
+
+@router.post(
+    "/{event_id}/reschedule",
+    status_code=status.HTTP_200_OK,
+    description="Moves unsent notifications of the event to a new send date",
+    response_description="Matched and rescheduled notifications count",
+)
+async def reschedule_event_notifications(
+    event_id: str,
+    request: RescheduleRequest,
+    service: Annotated[EventLineageService, Depends(get_lineage_service)],
+) -> BulkUpdateResult:
+    return await service.reschedule(event_id, request.send_date)
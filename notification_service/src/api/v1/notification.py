@@ -1,12 +1,30 @@
-from fastapi import APIRouter, Depends, Request, status
+from typing import Annotated
+
+from fastapi import APIRouter, Body, Depends, Request, status
 from starlette.responses import JSONResponse
 
-from src.services.notification import NotificationService
-from src.utils.jwt_and_services import CheckService
+from src.core.config import settings
+from src.models.batch import BatchResult
+from src.services.admission import admission_controller
+from src.services.ndjson_import import (
+    ImportResponse,
+    NDJSONImporter,
+    encode_reports,
+)
+from src.services.notification import NotificationService, get_request_id
+from src.utils.jwt_and_services import (
+    AccessTokenPayload,
+    CheckService,
+    verify_access_token_dep,
+)
 from src.utils.services_constant import ALLOWED_SERVICES
 
 router = APIRouter(tags=["notification"])
 
+BatchItems = Annotated[
+    list[dict], Body(min_length=1, max_length=settings.batch_max_events)
+]
+
 
 @router.post(
     "/",
@@ -18,6 +36,79 @@ router = APIRouter(tags=["notification"])
 async def notification(
     data: dict,
     request: Request,
+    access_token: Annotated[AccessTokenPayload, Depends(admission_controller)],
     service: NotificationService = Depends(NotificationService),
 ) -> JSONResponse:
-    return await service.send_event(data, request)
+    return await service.send_event(data, request, access_token.service_name)
+
+
+@router.post(
+    "/raw",
+    status_code=status.HTTP_200_OK,
+    description="Forwarding events from other services to the queue without parsing",
+    response_description="Collected data for notifications",
+    dependencies=[Depends(CheckService(services=ALLOWED_SERVICES))],
+    openapi_extra={
+        "requestBody": {
+            "content": {"application/json": {"schema": {"type": "object"}}},
+            "required": True,
+        }
+    },
+)
+async def raw_notification(
+    request: Request,
+    access_token: Annotated[AccessTokenPayload, Depends(admission_controller)],
+    service: NotificationService = Depends(NotificationService),
+) -> JSONResponse:
+    return await service.send_raw_event(request, access_token.service_name)
+
+
+@router.post(
+    "/batch",
+    status_code=status.HTTP_200_OK,
+    description="Collecting a batch of events from other services",
+    response_description="Accept or reject result of every event of the batch",
+    dependencies=[Depends(CheckService(services=ALLOWED_SERVICES))],
+)
+async def notification_batch(
+    items: BatchItems,
+    request: Request,
+    access_token: Annotated[AccessTokenPayload, Depends(admission_controller)],
+    service: NotificationService = Depends(NotificationService),
+) -> BatchResult:
+    # the request token pays for the first event
+    admission_controller.get(access_token.service_name).charge(len(items) - 1)
+    return await service.send_events_batch(
+        items, request, access_token.service_name
+    )
+
+
+@router.post(
+    "/import",
+    status_code=status.HTTP_200_OK,
+    description="Streaming import of events in NDJSON format, one event per line",
+    response_description=(
+        "NDJSON progress records with numbers of imported and rejected events "
+        "and line errors, the last record is the final report"
+    ),
+    dependencies=[Depends(CheckService(services=ALLOWED_SERVICES))],
+    openapi_extra={
+        "requestBody": {
+            "content": {"application/x-ndjson": {"schema": {"type": "string"}}},
+            "required": True,
+        }
+    },
+)
+async def import_notifications(
+    request: Request,
+    access_token: Annotated[AccessTokenPayload, Depends(verify_access_token_dep)],
+) -> ImportResponse:
+    # the import stays in flight until its response is streamed,
+    # dependencies with yield exit before that
+    admission = admission_controller.admit(access_token.service_name)
+    headers = {"x-service-name": access_token.service_name}
+    if request_id := get_request_id(request):
+        headers["x-request-id"] = request_id
+    importer = NDJSONImporter(headers, admission.bucket, settings.ndjson_import)
+    reports = encode_reports(importer.run(request.stream()))
+    return ImportResponse(admission.hold(reports))
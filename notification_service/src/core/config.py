@@ -1,10 +1,62 @@
 from pathlib import Path
 
+from pydantic import BaseModel, ByteSize, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from src.core.constants import FsyncPolicy
+from src.utils.services_constant import ServiceEnum
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
+class MongoDBSettings(BaseModel):
+    host: str = "localhost"
+    port: int = 27017
+    db_name: str = "notifications"
+    notification_collection: str = "notifications"
+    inbox_counter_collection: str = "inbox_counters"
+    idempotency_collection: str = "idempotency_keys"
+
+
+class ServiceLimits(BaseModel):
+    # events per second and the allowed burst, a request costs at least one
+    rate: float = 200
+    burst: int = 400
+    # requests of the service processed at the same time
+    max_concurrency: int = 50
+
+
+class AdmissionSettings(BaseModel):
+    default: ServiceLimits = ServiceLimits()
+    # limits of particular services, e.g. {"ugc": {"rate": 100}}
+    services: dict[ServiceEnum, ServiceLimits] = {}
+
+
+class SpoolSettings(BaseModel):
+    # events are written to disk while RabbitMQ is unavailable
+    enabled: bool = True
+    dir: Path = BASE_DIR.parent / "spool"
+    # bytes or sizes like 64MiB
+    segment_size: ByteSize = Field("64MiB", validate_default=True)
+    max_size: ByteSize = Field("1GiB", validate_default=True)
+    # always, interval or never
+    fsync: FsyncPolicy = FsyncPolicy.INTERVAL
+    fsync_interval: float = 1
+    # a publish slower than this switches ingestion to the spool
+    publish_timeout: float = 2
+    drain_interval: float = 5
+    drain_batch: int = 500
+
+
+class ImportSettings(BaseModel):
+    # events waiting for the broker confirm
+    inflight_window: int = 1000
+    # only the first max_errors line errors are reported
+    max_errors: int = 100
+    # lines between progress records of the response
+    progress_interval: int = 10000
+
+
 class Settings(BaseSettings):
     """
     Service settings
@@ -16,6 +68,8 @@ class Settings(BaseSettings):
 
     private_key: str
     public_key: str
+    # verified tokens kept to skip signature checks
+    jwt_cache_size: int = 10000
 
     rabbitmq_username: str
     rabbitmq_password: str
@@ -23,6 +77,31 @@ class Settings(BaseSettings):
     rabbitmq_delivery_mode: int
     rabbitmq_host: str
     rabbitmq_port: int
+    # json or msgpack, consumers accept both
+    rabbitmq_codec: str = "json"
+
+    mongo: MongoDBSettings = MongoDBSettings()
+    spool: SpoolSettings = SpoolSettings()
+    admission: AdmissionSettings = AdmissionSettings()
+
+    # raw events are forwarded to the queue without parsing
+    raw_event_max_size: ByteSize = Field("64KiB", validate_default=True)
+    batch_max_events: int = 1000
+
+    # Idempotency-Key header or, if enabled, the event fingerprint
+    # identifies retries of the same event during idempotency_ttl seconds
+    idempotency_ttl: int = 24 * 60 * 60
+    idempotency_cache_size: int = 100000
+    # identical events are legitimate too, the fingerprint drops them for the TTL
+    idempotency_fingerprint: bool = False
+    # seconds, a key claimed longer ago and not confirmed is taken over by a retry.
+    # Longer than spool.publish_timeout
+    idempotency_pending_timeout: float = 30
+
+    ndjson_import: ImportSettings = ImportSettings()
+
+    inbox_page_size: int = 20
+    inbox_max_page_size: int = 100
 
     model_config = SettingsConfigDict(
         extra="ignore",
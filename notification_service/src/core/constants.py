@@ -17,3 +17,11 @@ class NotificationStatusEnum(StrEnum):
     UNSENT = "unsent"
     SUCCESS = "success"
     FAILED = "failed"
+    STORED = "stored"
+    CANCELLED = "cancelled"
+
+
+class FsyncPolicy(StrEnum):
+    ALWAYS = "always"
+    INTERVAL = "interval"
+    NEVER = "never"
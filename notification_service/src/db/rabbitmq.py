@@ -2,9 +2,12 @@ import aiormq
 import backoff
 
 from src.core.config import settings
+from src.db import spool
+from src.utils.codec import envelope_headers, get_codec
 
 connection: aiormq.Connection | None = None
 channel: aiormq.Channel | None = None
+codec = get_codec(settings.rabbitmq_codec)
 
 
 @backoff.on_exception(
@@ -47,13 +50,45 @@ async def init_queues(_channel: aiormq.abc.AbstractChannel) -> None:
     await _channel.basic_qos(prefetch_count=1, global_=True)
 
 
-async def send_to_rabbitmq(routing_key: str, body: bytes) -> None:
+async def send_to_rabbitmq(routing_key: str, data: dict) -> None:
     """
     Sends a message to RabbitMQ
     """
 
+    await send_raw_to_rabbitmq(routing_key, codec.encode(data), codec.content_type)
+
+
+async def send_raw_to_rabbitmq(
+    routing_key: str,
+    body: bytes,
+    content_type: str,
+    headers: dict[str, str] | None = None,
+) -> None:
+    """
+    Sends an already serialized message to RabbitMQ,
+    through the spool when it is enabled
+    """
+
+    if spool.spool is not None:
+        await spool.spool.publish(routing_key, body, content_type, headers)
+        return
+    await publish_to_rabbitmq(routing_key, body, content_type, headers)
+
+
+async def publish_to_rabbitmq(
+    routing_key: str,
+    body: bytes,
+    content_type: str,
+    headers: dict[str, str] | None = None,
+) -> None:
+    """
+    Publishes a message and waits for the broker confirm
+    """
+
     message_properties = aiormq.spec.Basic.Properties(
         delivery_mode=settings.rabbitmq_delivery_mode,
+        content_type=content_type,
+        headers=envelope_headers(headers),
     )
     await channel.basic_publish(
         exchange="", routing_key=routing_key, body=body, properties=message_properties
@@ -0,0 +1,409 @@
+import asyncio
+import fcntl
+import mmap
+import os
+import shutil
+import struct
+import zlib
+from collections.abc import Awaitable, Callable, Iterator
+from logging import getLogger
+from pathlib import Path
+from typing import Protocol
+
+import orjson
+
+from src.core.config import SpoolSettings
+from src.core.constants import FsyncPolicy
+
+logger = getLogger()
+
+Reconnector = Callable[[], Awaitable[None]]
+
+# metadata length, body length, crc32 of metadata and body
+RECORD_HEADER = struct.Struct(">III")
+SEGMENT_SUFFIX = ".seg"
+OFFSET_SUFFIX = ".offset"
+# segments with records that can't be read are kept for investigation
+CORRUPT_SUFFIX = ".corrupt"
+LOCK_FILE = "lock"
+FILE_MODE = 0o644
+
+
+class Publisher(Protocol):
+    async def __call__(
+        self,
+        routing_key: str,
+        body: bytes,
+        content_type: str,
+        headers: dict | None,
+    ) -> None:
+        """
+        Publishes an event with broker confirms
+        """
+
+
+class SpoolFull(Exception):
+    """
+    Spool reached its size limit
+    """
+
+
+class SpoolRecord:
+    __slots__ = ("routing_key", "content_type", "headers", "body")
+
+    def __init__(
+        self, routing_key: str, content_type: str, headers: dict | None, body: bytes
+    ) -> None:
+        self.routing_key = routing_key
+        self.content_type = content_type
+        self.headers = headers
+        self.body = body
+
+    def encode(self) -> bytes:
+        meta = orjson.dumps([self.routing_key, self.content_type, self.headers])
+        data = meta + self.body
+        crc = zlib.crc32(data)
+        return RECORD_HEADER.pack(len(meta), len(self.body), crc) + data
+
+
+def read_segment(path: Path, offset: int) -> Iterator[tuple[int, SpoolRecord]]:
+    """
+    Records of a segment starting at offset with the offset after each of them.
+    Reading stops at a torn or corrupted record
+    """
+    with open(path, "rb") as segment_file:
+        size = os.fstat(segment_file.fileno()).st_size
+        if size <= offset:
+            return
+        with mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            position = offset
+            while position + RECORD_HEADER.size <= size:
+                meta_length, body_length, crc = RECORD_HEADER.unpack_from(
+                    data, position
+                )
+                start = position + RECORD_HEADER.size
+                end = start + meta_length + body_length
+                if end > size:
+                    logger.error(f"Torn record at {position} in spool segment {path}")
+                    return
+                if zlib.crc32(data[start:end]) != crc:
+                    logger.error(f"Corrupted record at {position} in spool segment {path}")
+                    return
+                routing_key, content_type, headers = orjson.loads(
+                    data[start:start + meta_length]
+                )
+                yield end, SpoolRecord(
+                    routing_key, content_type, headers, data[start + meta_length:end]
+                )
+                position = end
+
+
+def fsync_and_close(fd: int) -> None:
+    try:
+        os.fsync(fd)
+    except OSError:
+        os.close(fd)
+        raise
+    os.close(fd)
+
+
+def read_offset(segment: Path) -> int:
+    try:
+        return int(segment.with_suffix(OFFSET_SUFFIX).read_text())
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def write_offset(segment: Path, offset: int) -> None:
+    offset_path = segment.with_suffix(OFFSET_SUFFIX)
+    temporary_path = offset_path.with_suffix(".tmp")
+    temporary_path.write_text(str(offset))
+    temporary_path.replace(offset_path)
+
+
+class SpoolDirectory:
+    """
+    Segments of one API process. The directory is locked while the process
+    lives, so directories left by dead processes are taken over and drained
+    """
+
+    def __init__(self, path: Path, lock_fd: int) -> None:
+        self.path = path
+        self.lock_fd = lock_fd
+
+    @classmethod
+    def try_lock(cls, path: Path) -> "SpoolDirectory | None":
+        path.mkdir(parents=True, exist_ok=True)
+        lock_fd = os.open(path / LOCK_FILE, os.O_CREAT | os.O_RDWR, FILE_MODE)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(lock_fd)
+            return None
+        return cls(path, lock_fd)
+
+    def segments(self) -> list[Path]:
+        return sorted(self.path.glob(f"*{SEGMENT_SUFFIX}"))
+
+    def unlock(self) -> None:
+        os.close(self.lock_fd)
+
+
+class Spool:
+    """
+    Append-only on-disk spool of events that couldn't be published.
+    Once a publish fails or times out the spool takes all new events, so
+    requests don't wait for a broken broker. The drainer replays segments
+    oldest first with broker confirms and switches publishing back to the
+    broker when the spool is empty. Delivery is at least once: records of
+    a segment after the last saved offset may be replayed after a crash.
+    A segment with a torn or corrupted record is renamed to .corrupt in the
+    spool root once its readable records are replayed
+    """
+
+    def __init__(
+        self, publisher: Publisher, reconnect: Reconnector, options: SpoolSettings
+    ) -> None:
+        self.publisher = publisher
+        self.reconnect = reconnect
+        self.options = options
+
+        # events go to the spool until it is drained
+        self.degraded = False
+        self.running = False
+        self.size = 0
+        self._directory: SpoolDirectory | None = None
+        self._orphans: list[SpoolDirectory] = []
+        self._segment_number = 0
+        self._segment_fd: int | None = None
+        self._segment_size = 0
+        self._dirty = False
+        self._tasks: list[asyncio.Task] = []
+
+    def open(self) -> None:
+        pid = os.getpid()
+        self._directory = SpoolDirectory.try_lock(self.options.dir / str(pid))
+        if self._directory is None:
+            raise RuntimeError(f"Spool directory of process {pid} is locked")
+        self._lock_orphans()
+
+        for directory in (self._directory, *self._orphans):
+            self.size += sum(
+                segment.stat().st_size - read_offset(segment)
+                for segment in directory.segments()
+            )
+        self._segment_number = max(
+            (int(segment.stem) for segment in self._directory.segments()), default=0
+        )
+        if size := self.size:
+            logger.warning(f"Spool contains {size} bytes of undelivered events")
+            self.degraded = True
+        self._open_segment()
+
+    def start(self) -> None:
+        self.running = True
+        self._tasks.append(asyncio.create_task(self._drain_loop()))
+        if self.options.fsync == FsyncPolicy.INTERVAL:
+            self._tasks.append(asyncio.create_task(self._fsync_loop()))
+
+    async def close(self) -> None:
+        self.running = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._segment_fd is not None:
+            if self.options.fsync != FsyncPolicy.NEVER:
+                os.fsync(self._segment_fd)
+            os.close(self._segment_fd)
+            self._segment_fd = None
+        for directory in (self._directory, *self._orphans):
+            if directory is not None:
+                directory.unlock()
+
+    async def publish(
+        self,
+        routing_key: str,
+        body: bytes,
+        content_type: str,
+        headers: dict | None = None,
+    ) -> None:
+        """
+        Publishes an event to the broker or spools it if the broker fails
+        """
+        if not self.degraded:
+            try:
+                await asyncio.wait_for(
+                    self.publisher(routing_key, body, content_type, headers),
+                    self.options.publish_timeout,
+                )
+                return
+            except Exception as error:
+                logger.error(f"Failed to publish event, spooling events: {error!r}")
+                self.degraded = True
+
+        await self.append(SpoolRecord(routing_key, content_type, headers, body))
+
+    async def append(self, record: SpoolRecord) -> None:
+        data = record.encode()
+        max_size = self.options.max_size
+        if self.size + len(data) > max_size:
+            raise SpoolFull(f"Spool size limit {max_size} reached")
+        segment_full = self._segment_size + len(data) > self.options.segment_size
+        if self._segment_size and segment_full:
+            self._rotate()
+
+        os.write(self._segment_fd, data)
+        self._segment_size += len(data)
+        self.size += len(data)
+        self._dirty = True
+        if self.options.fsync == FsyncPolicy.ALWAYS:
+            await self._sync_segment()
+
+    async def drain(self) -> None:
+        """
+        Replays segments of dead processes, then own segments until only
+        the current one is left, and switches publishing back to the broker
+        """
+        for orphan in list(self._orphans):
+            for orphan_segment in orphan.segments():
+                await self._drain_segment(orphan_segment)
+            shutil.rmtree(orphan.path, ignore_errors=True)
+            orphan.unlock()
+            self._orphans.remove(orphan)
+
+        # new events are appended while the older ones are replayed
+        sealed = self._seal_segments()
+        while sealed:
+            for segment in sealed:
+                await self._drain_segment(segment)
+            sealed = self._seal_segments()
+
+        self.degraded = False
+        logger.info("Spool drained, publishing events to the broker")
+
+    def _lock_orphans(self) -> None:
+        for path in self.options.dir.iterdir():
+            if path.is_dir() and path != self._directory.path:
+                if orphan := SpoolDirectory.try_lock(path):
+                    self._orphans.append(orphan)
+
+    def _segment_path(self, number: int) -> Path:
+        return self._directory.path / f"{number:012d}{SEGMENT_SUFFIX}"
+
+    def _open_segment(self) -> None:
+        self._segment_number += 1
+        self._segment_fd = os.open(
+            self._segment_path(self._segment_number),
+            os.O_WRONLY | os.O_CREAT | os.O_APPEND,
+            FILE_MODE,
+        )
+        self._segment_size = 0
+
+    def _rotate(self) -> None:
+        if self.options.fsync != FsyncPolicy.NEVER:
+            os.fsync(self._segment_fd)
+        os.close(self._segment_fd)
+        self._open_segment()
+
+    async def _sync_segment(self) -> None:
+        """
+        Flushes the current segment in a worker thread. The thread syncs a
+        duplicate of the descriptor, so a rotation closing the segment
+        meanwhile doesn't invalidate it
+        """
+        await asyncio.to_thread(fsync_and_close, os.dup(self._segment_fd))
+
+    async def _fsync_loop(self) -> None:
+        while self.running:
+            await asyncio.sleep(self.options.fsync_interval)
+            if not self._dirty:
+                continue
+            self._dirty = False
+            try:
+                await self._sync_segment()
+            except OSError:
+                logger.exception("Failed to fsync the spool segment")
+                self._dirty = True
+
+    async def _drain_loop(self) -> None:
+        while self.running:
+            await asyncio.sleep(self.options.drain_interval)
+            if not self.degraded:
+                continue
+            try:
+                await self.reconnect()
+                await self.drain()
+            except Exception as error:
+                logger.warning(f"Spool drain interrupted: {error!r}")
+
+    def _seal_segments(self) -> list[Path]:
+        """
+        Own segments to replay, the current one is rotated if it has records
+        """
+        if self._segment_size:
+            self._rotate()
+        current = self._segment_path(self._segment_number)
+        return [
+            segment for segment in self._directory.segments() if segment != current
+        ]
+
+    async def _drain_segment(self, segment: Path) -> None:
+        read_to = await self._replay_segment(segment)
+        size = segment.stat().st_size
+        # the records after a torn or corrupted one are lost
+        self.size -= size - read_to
+        if read_to < size:
+            self._keep_corrupt(segment)
+        else:
+            segment.unlink()
+        segment.with_suffix(OFFSET_SUFFIX).unlink(missing_ok=True)
+
+    async def _replay_segment(self, segment: Path) -> int:
+        """
+        Publishes the readable records of a segment, returns where reading stopped
+        """
+        offset = read_offset(segment)
+        read_to = offset
+        batch: list[SpoolRecord] = []
+        for record_end, record in read_segment(segment, offset):
+            batch.append(record)
+            read_to = record_end
+            if len(batch) >= self.options.drain_batch:
+                await self._publish_batch(batch)
+                self.size -= read_to - offset
+                offset = read_to
+                write_offset(segment, offset)
+                batch = []
+        if batch:
+            await self._publish_batch(batch)
+        self.size -= read_to - offset
+        return read_to
+
+    def _keep_corrupt(self, segment: Path) -> None:
+        """
+        Moves a segment whose records after a torn or corrupted one can't be
+        read to the spool root, so draining the directory doesn't delete it
+        """
+        directory_name = segment.parent.name
+        corrupt_path = self.options.dir / (
+            f"{directory_name}-{segment.stem}{CORRUPT_SUFFIX}"
+        )
+        segment.replace(corrupt_path)
+        logger.error(f"Unreadable records in spool segment, kept as {corrupt_path}")
+
+    async def _publish_batch(self, batch: list[SpoolRecord]) -> None:
+        # published concurrently, the broker confirms the whole batch
+        await asyncio.gather(
+            *(
+                self.publisher(
+                    record.routing_key,
+                    record.body,
+                    record.content_type,
+                    record.headers,
+                )
+                for record in batch
+            ),
+        )
+
+
+spool: Spool | None = None
@@ -1,16 +1,19 @@
 import asyncio
-import json
 from logging import config, getLogger
 
 import aio_pika
+from pydantic import ValidationError
 
 import src.db.mongo as mongo
 import src.event_worker.rabbitmq as rabbitmq
 from src.db.mongo import get_mongo_db
 from src.event_worker.logging import LOGGING
 from src.event_worker.settings import BASE_DIR, settings
+from src.models.event import Event
 from src.services.event import EVENT_HANDLER_REGISTRY
+from src.services.send_time import SendTimeShaper
 from src.services.template import TemplateService
+from src.utils.codec import UnsupportedMessage, codec_for_message
 
 config.dictConfig(LOGGING)
 logger = getLogger()
@@ -26,10 +29,15 @@ async def process_events(message: aio_pika.abc.AbstractIncomingMessage) -> None:
         logger.debug(" [x] Received message %r" % message)
         logger.info("Message body is: %r" % message.body)
 
-        mongo_db = get_mongo_db(settings.mongo.db_name)
-        event = json.loads(message.body.decode(encoding="utf-8"))
+        try:
+            codec = codec_for_message(message.content_type, message.headers)
+            event = codec.validate(Event, message.body)
+        except (UnsupportedMessage, ValidationError, ValueError):
+            logger.exception(f"Invalid message in the events queue: {message.body}")
+            raise
 
-        if handler_cls := EVENT_HANDLER_REGISTRY.get(event["type"]):
+        mongo_db = get_mongo_db(settings.mongo.db_name)
+        if handler_cls := EVENT_HANDLER_REGISTRY.get(event.type):
             async with handler_cls(
                 mongo_db=mongo_db,
                 template_service=template_service,
@@ -43,6 +51,11 @@ async def process_events(message: aio_pika.abc.AbstractIncomingMessage) -> None:
 
 async def main() -> None:
     mongo.mongo = mongo.init_mongo(host=settings.mongo.host, port=settings.mongo.port)
+    await SendTimeShaper(
+        get_mongo_db(settings.mongo.db_name),
+        slot_collection=settings.mongo.release_slot_collection,
+        options=settings.release,
+    ).ensure_indexes()
     rabbitmq.connection = await rabbitmq.create_connection()
 
     async with rabbitmq.connection:
@@ -1,12 +1,13 @@
-import json
-
 import aio_pika
 from aio_pika import DeliveryMode, Message
 
 from src.event_worker.settings import settings
+from src.models.notification import NotificationQueue
+from src.utils.codec import PayloadStrategy, compress, envelope_headers, get_codec
 
 connection: aio_pika.abc.AbstractRobustConnection | None = None
 channel: aio_pika.abc.AbstractRobustChannel | None = None
+codec = get_codec(settings.rabbitmq_codec)
 
 
 async def create_connection() -> aio_pika.abc.AbstractRobustConnection:
@@ -27,10 +28,10 @@ async def create_channel(
 
 
 async def send_message(data: dict, queue_name: str) -> None:
-    message_body = json.dumps(data).encode("utf-8")
-
     message = Message(
-        message_body,
+        codec.encode(data),
+        content_type=codec.content_type,
+        headers=envelope_headers(),
         delivery_mode=DeliveryMode.PERSISTENT,
     )
 
@@ -38,3 +39,30 @@ async def send_message(data: dict, queue_name: str) -> None:
         message,
         routing_key=queue_name,
     )
+
+
+async def send_notification(notification: NotificationQueue, queue_name: str) -> None:
+    """
+    Publishes a notification with the configured payload strategy
+    """
+    if settings.payload.strategy == PayloadStrategy.CLAIM_CHECK:
+        body = codec.encode(notification.model_dump(exclude={"message"}))
+    else:
+        body = codec.encode(notification)
+
+    content_encoding = None
+    if settings.payload.strategy == PayloadStrategy.COMPRESS:
+        body, content_encoding = compress(
+            body,
+            threshold=settings.payload.compress_threshold,
+            level=settings.payload.compression_level,
+        )
+
+    message = Message(
+        body,
+        content_type=codec.content_type,
+        content_encoding=content_encoding,
+        headers=envelope_headers(),
+        delivery_mode=DeliveryMode.PERSISTENT,
+    )
+    await channel.default_exchange.publish(message, routing_key=queue_name)
@@ -0,0 +1,36 @@
+import asyncio
+from datetime import datetime, timezone
+from logging import config, getLogger
+
+import src.db.mongo as mongo
+from src.db.mongo import get_mongo_db
+from src.event_worker.logging import LOGGING
+from src.event_worker.settings import settings
+from src.services.send_time import SendTimeShaper
+
+logger = getLogger()
+
+
+async def main() -> None:
+    """
+    Logs the projected release curve of deferred notifications per timezone
+    """
+    config.dictConfig(LOGGING)
+    mongo.mongo = mongo.init_mongo(host=settings.mongo.host, port=settings.mongo.port)
+    shaper = SendTimeShaper(
+        get_mongo_db(settings.mongo.db_name),
+        slot_collection=settings.mongo.release_slot_collection,
+        options=settings.release,
+    )
+    curve = await shaper.release_curve(since=datetime.now(tz=timezone.utc))
+
+    for user_timezone, points in sorted(curve.items()):
+        total = sum(count for _, count in points)
+        peak = max(count for _, count in points)
+        logger.info(f"{user_timezone}: {total} notifications, peak {peak}/min")
+        for minute, count in points:
+            logger.info(f"  {minute:%Y-%m-%d %H:%M} UTC  {count}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+from datetime import timedelta
+from logging import config, getLogger
+from pathlib import Path
+
+import src.db.mongo as mongo
+from src.db.mongo import get_mongo_db
+from src.event_worker.logging import LOGGING
+from src.event_worker.settings import settings
+from src.services.retention import (
+    RetentionPolicy,
+    RetentionService,
+    event_policy,
+    notification_policy,
+)
+
+logger = getLogger()
+
+
+def get_policies() -> list[RetentionPolicy]:
+    retention = settings.retention
+    return [
+        notification_policy(
+            settings.mongo.notification_collection,
+            archive_after=timedelta(days=retention.notification_archive_days),
+            ttl=timedelta(days=retention.notification_ttl_days)
+            if retention.notification_ttl_days
+            else None,
+        ),
+        event_policy(
+            settings.mongo.event_collection,
+            archive_after=timedelta(days=retention.event_archive_days),
+            ttl=timedelta(days=retention.event_ttl_days)
+            if retention.event_ttl_days
+            else None,
+        ),
+    ]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("ttl")
+    commands.add_parser("archive")
+    restore_parser = commands.add_parser("restore")
+    restore_parser.add_argument("collection")
+    restore_parser.add_argument("paths", nargs="+", type=Path)
+    return parser.parse_args()
+
+
+async def create_ttl_indexes(service: RetentionService) -> None:
+    for policy in get_policies():
+        await service.ensure_ttl_index(policy)
+        ttl = policy.ttl or "disabled"
+        logger.info(f"{policy.collection}: TTL {ttl}")
+
+
+async def archive(service: RetentionService) -> None:
+    for policy in get_policies():
+        archived = await service.archive(policy)
+        total = sum(archived.values())
+        logger.info(f"{policy.collection}: {total} documents archived")
+        for day, count in archived.items():
+            logger.info(f"  {day}  {count}")
+
+
+async def restore(
+    service: RetentionService, collection: str, paths: list[Path]
+) -> None:
+    for path in paths:
+        restored = await service.restore(collection, path)
+        logger.info(f"{path}: {restored} documents restored to {collection}")
+
+
+async def main() -> None:
+    """
+    Retention of events and notifications:
+    ttl creates TTL indexes, archive moves old documents to archive files,
+    restore loads archive files back
+    """
+    args = parse_args()
+
+    config.dictConfig(LOGGING)
+    mongo.mongo = mongo.init_mongo(host=settings.mongo.host, port=settings.mongo.port)
+    service = RetentionService(
+        get_mongo_db(settings.mongo.db_name),
+        archive_dir=settings.retention.archive_dir,
+        batch_size=settings.retention.batch_size,
+    )
+
+    if args.command == "ttl":
+        await create_ttl_indexes(service)
+    elif args.command == "archive":
+        await archive(service)
+    else:
+        await restore(service, args.collection, args.paths)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,6 +3,8 @@ from pathlib import Path
 from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from src.utils.codec import PayloadStrategy
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
@@ -12,6 +14,49 @@ class MongoDBSettings(BaseModel):
     db_name: str = "notifications"
     event_collection: str = "events"
     notification_collection: str = "notifications"
+    release_slot_collection: str = "release_slots"
+    inbox_counter_collection: str = "inbox_counters"
+    presence_collection: str = "presence"
+    outbox_state_collection: str = "outbox_state"
+    template_collection: str = "templates"
+    shared_context_collection: str = "shared_contexts"
+
+
+class OutboxRelaySettings(BaseModel):
+    batch_size: int = 500
+    # how long the relay waits to fill a batch
+    batch_interval: float = 0.05
+    # polling fallback for Mongo without a replica set
+    poll_interval: float = 0.5
+    settle_seconds: int = 5
+    # longest pause of polling while notifications fail to publish
+    max_backoff: float = 30
+
+
+class ReleaseSettings(BaseModel):
+    # deferred notifications of users are spread over this many minutes
+    spread_minutes: int = 60
+    # notifications released per minute, 0 - unlimited
+    minute_capacity: int = 0
+    max_shift_minutes: int = 180
+
+
+class PayloadSettings(BaseModel):
+    strategy: PayloadStrategy = PayloadStrategy.INLINE
+    # bodies smaller than this are not worth compressing
+    compress_threshold: int = 4096
+    compression_level: int = 3
+
+
+class RetentionSettings(BaseModel):
+    archive_dir: Path = BASE_DIR.parent / "archive"
+    # documents older than this are moved to the archive
+    notification_archive_days: int = 30
+    event_archive_days: int = 30
+    # TTL indexes in case archival doesn't run, 0 - disabled
+    notification_ttl_days: int = 90
+    event_ttl_days: int = 90
+    batch_size: int = 1000
 
 
 class Settings(BaseSettings):
@@ -26,10 +71,29 @@ class Settings(BaseSettings):
     rabbitmq_delivery_mode: int
     rabbitmq_host: str
     rabbitmq_port: int
+    # json or msgpack, consumers accept both
+    rabbitmq_codec: str = "json"
+    # how notification messages carry the rendered text
+    payload: PayloadSettings = PayloadSettings()
+    # email notifications store the template and the context,
+    # the sender renders them right before delivery
+    lazy_render: bool = False
+
+    # Immediate notifications are published right away and skipped by the scheduler
+    # until the lease runs out
+    dispatch_lease_seconds: int = 300
+    # saved notifications are published by the outbox relay, not the event worker
+    outbox_relay_enabled: bool = False
+    outbox_relay: OutboxRelaySettings = OutboxRelaySettings()
+
+    retention: RetentionSettings = RetentionSettings()
 
     nighttime_start_hour: int = 22
     nighttime_end_hour: int = 7
 
+    # Spreading of notifications deferred until the end of the night
+    release: ReleaseSettings = ReleaseSettings()
+
     profile_service_host: str = "localhost"
     profile_service_port: int = 8001
 
@@ -1,22 +1,62 @@
 from contextlib import asynccontextmanager
+from http import HTTPStatus
 
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.responses import ORJSONResponse
 
-from src.api.v1 import notification
+from src.api.v1 import admission, inbox, lineage, notification
 from src.core.config import settings
-from src.db import rabbitmq
+from src.db import mongo, rabbitmq, spool
+from src.services import idempotency
+
+
+async def connect_rabbitmq() -> None:
+    """
+    Opens the connection and the channel, or reopens them if the broker
+    closed them
+    """
+    if rabbitmq.connection is None or rabbitmq.connection.is_closed:
+        rabbitmq.connection = await rabbitmq.create_connection_rabbitmq()
+    if rabbitmq.channel is None or rabbitmq.channel.is_closed:
+        rabbitmq.channel = await rabbitmq.create_channel_rabbitmq(rabbitmq.connection)
+        await rabbitmq.init_queues(rabbitmq.channel)
+
+
+def start_spool() -> None:
+    spool.spool = spool.Spool(
+        publisher=rabbitmq.publish_to_rabbitmq,
+        reconnect=connect_rabbitmq,
+        options=settings.spool,
+    )
+    spool.spool.open()
+    spool.spool.start()
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
-    rabbitmq.connection = await rabbitmq.create_connection_rabbitmq()
-    rabbitmq.channel = await rabbitmq.create_channel_rabbitmq(rabbitmq.connection)
+    await connect_rabbitmq()
 
-    await rabbitmq.init_queues(rabbitmq.channel)
+    if settings.spool.enabled:
+        start_spool()
+
+    mongo.mongo = mongo.init_mongo(host=settings.mongo.host, port=settings.mongo.port)
+    await inbox.get_inbox_service().ensure_indexes()
+    await lineage.get_lineage_service().ensure_indexes()
+    idempotency.idempotency_store = idempotency.IdempotencyStore(
+        mongo.get_mongo_db(settings.mongo.db_name)[
+            settings.mongo.idempotency_collection
+        ],
+        cache_size=settings.idempotency_cache_size,
+        ttl=settings.idempotency_ttl,
+        pending_timeout=settings.idempotency_pending_timeout,
+    )
+    await idempotency.idempotency_store.ensure_indexes()
     yield
+    if spool.spool is not None:
+        await spool.spool.close()
     await rabbitmq.connection.close()
+    mongo.mongo.close()
 
 
 app = FastAPI(
@@ -33,7 +73,20 @@ app = FastAPI(
     },
 )
 
+
+@app.exception_handler(spool.SpoolFull)
+async def spool_full_handler(_: Request, error: spool.SpoolFull) -> ORJSONResponse:
+    return ORJSONResponse(
+        {"detail": "Service is temporarily unavailable"},
+        status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+        headers={"Retry-After": str(int(settings.spool.drain_interval))},
+    )
+
+
 app.include_router(notification.router, prefix="/api/v1/notification")
+app.include_router(inbox.router, prefix="/api/v1/inbox")
+app.include_router(admission.router, prefix="/api/v1/admission")
+app.include_router(lineage.router, prefix="/api/v1/admin/events")
 
 if __name__ == "__main__":
     uvicorn.run("main:app", reload=True)
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+
+
+class ServiceAdmissionStats(BaseModel):
+    rate: float
+    burst: int
+    tokens: float
+    max_concurrency: int
+    in_flight: int
+    admitted: int
+    rejected_rate: int
+    rejected_concurrency: int
@@ -0,0 +1,31 @@
+from pydantic import BaseModel
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    accepted: bool
+    # the event was accepted by an earlier request and wasn't published again
+    duplicate: bool = False
+    error: str | None = None
+
+
+class BatchResult(BaseModel):
+    accepted: int
+    rejected: int
+    items: list[BatchItemResult]
+
+
+class ImportLineError(BaseModel):
+    line: int
+    error: str
+
+
+class ImportReport(BaseModel):
+    lines: int = 0
+    accepted: int = 0
+    rejected: int = 0
+    errors: list[ImportLineError] = []
+    # only the first ndjson_import.max_errors errors are reported
+    errors_truncated: bool = False
+    # progress records of an import come before its final report
+    finished: bool = False
@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class InboxNotification(BaseModel):
+    id: str
+    message: str
+    created_at: datetime
+    read_at: datetime | None = None
+
+
+class InboxPage(BaseModel):
+    items: list[InboxNotification]
+    # passed as cursor to get the next page, None on the last page
+    next_cursor: str | None = None
+
+
+class UnreadCount(BaseModel):
+    unread: int
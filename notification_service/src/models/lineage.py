@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from pydantic import AwareDatetime, BaseModel
+
+
+class RescheduleRequest(BaseModel):
+    send_date: AwareDatetime
+
+
+class BulkUpdateResult(BaseModel):
+    matched: int
+    modified: int
+
+
+class EventNotifications(BaseModel):
+    event_id: str
+    # notifications count by status
+    statuses: dict[str, int]
+    # earliest and latest send date of pending notifications
+    first_send_date: datetime | None = None
+    last_send_date: datetime | None = None
@@ -1,12 +1,18 @@
-from datetime import datetime
+from datetime import datetime, timezone
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from src.core.constants import ChannelEnum, NotificationStatusEnum
 
 
+class TemplateRef(BaseModel):
+    name: str
+    version: str
+
+
 class NotificationDB(BaseModel):
-    message: str
+    # None for notifications rendered by the sender
+    message: str | None = None
     channel: ChannelEnum
     data: dict
     send_date: datetime | None = None
@@ -14,6 +20,24 @@ class NotificationDB(BaseModel):
 
     status: NotificationStatusEnum = NotificationStatusEnum.UNSENT
     retry_count: int = 0
+    next_attempt_at: datetime | None = None
+    # same content for every recipient, allows bulk delivery
+    personalized: bool = True
+
+    # event the notification was created for
+    event_id: str | None = None
+    # recipient, websocket notifications form the user inbox
+    user_id: str | None = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(tz=timezone.utc))
+    read_at: datetime | None = None
+    # counted in the unread counter, deferred notifications are counted on delivery
+    inbox_counted: bool = False
+
+    # lazy rendering: the template, the recipient context
+    # and a reference to the context shared by all recipients
+    template: TemplateRef | None = None
+    context: dict | None = None
+    shared_context_id: str | None = None
 
 
 class NotificationEmailData(BaseModel):
@@ -21,9 +45,19 @@ class NotificationEmailData(BaseModel):
     subject: str
 
 
+class NotificationWebsocketData(BaseModel):
+    user_id: str
+
+
 class NotificationQueue(BaseModel):
-    message: str
+    message: str | None = None
     channel: ChannelEnum
     data: dict
 
     notification_id: str
+    retry_count: int = 0
+    personalized: bool = True
+
+    template: TemplateRef | None = None
+    context: dict | None = None
+    shared_context_id: str | None = None
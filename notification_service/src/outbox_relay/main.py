@@ -0,0 +1,45 @@
+import asyncio
+from logging import config, getLogger
+
+import src.db.mongo as mongo
+import src.event_worker.rabbitmq as rabbitmq
+from src.db.mongo import get_mongo_db
+from src.event_worker.logging import LOGGING
+from src.event_worker.settings import settings
+from src.models.notification import NotificationQueue
+from src.services.outbox import OutboxRelay
+
+config.dictConfig(LOGGING)
+logger = getLogger()
+
+
+async def publish_notification(notification: NotificationQueue) -> None:
+    await rabbitmq.send_notification(
+        notification, settings.rabbitmq_queue_notifications
+    )
+
+
+async def main() -> None:
+    """
+    Publishes notifications saved by the event workers.
+    Run a single relay: the stream position is shared through Mongo
+    """
+    mongo.mongo = mongo.init_mongo(host=settings.mongo.host, port=settings.mongo.port)
+    relay = OutboxRelay(
+        get_mongo_db(settings.mongo.db_name),
+        publisher=publish_notification,
+        options=settings.outbox_relay,
+    )
+    await relay.ensure_indexes()
+    rabbitmq.connection = await rabbitmq.create_connection()
+
+    async with rabbitmq.connection:
+        rabbitmq.channel = await rabbitmq.create_channel(rabbitmq.connection)
+        await rabbitmq.channel.declare_queue(
+            settings.rabbitmq_queue_notifications, durable=True
+        )
+        await relay.run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,158 @@
+import asyncio
+import math
+import time
+from collections.abc import AsyncIterator
+from http import HTTPStatus
+
+from fastapi import Depends, HTTPException
+
+from src.core.config import ServiceLimits, settings
+from src.models.admission import ServiceAdmissionStats
+from src.utils.jwt_and_services import AccessTokenPayload, verify_access_token_dep
+
+
+class TokenBucket:
+    """
+    Request rate limit
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        refilled = (now - self.updated_at) * self.rate
+        self.tokens = min(self.burst, self.tokens + refilled)
+        self.updated_at = now
+
+    def take(self, count: int = 1) -> float:
+        """
+        Takes count tokens, returns 0 or seconds until they are available.
+        A request costlier than the burst is admitted with a full bucket
+        and leaves it in debt
+        """
+        self.refill()
+        needed = min(count, self.burst)
+        if self.tokens >= needed:
+            self.tokens -= count
+            return 0
+        return (needed - self.tokens) / self.rate
+
+    async def acquire(self, count: int = 1) -> None:
+        """
+        Waits until count tokens are taken
+        """
+        while wait := self.take(count):
+            await asyncio.sleep(wait)
+
+
+class ServiceAdmission:
+    """
+    Rate and concurrency limits of one service with their counters
+    """
+
+    def __init__(self, limits: ServiceLimits) -> None:
+        self.limits = limits
+        self.bucket = TokenBucket(limits.rate, limits.burst)
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected_rate = 0
+        self.rejected_concurrency = 0
+
+    def __enter__(self) -> "ServiceAdmission":
+        self.admitted += 1
+        self.in_flight += 1
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.in_flight -= 1
+
+    def charge(self, events: int) -> None:
+        """
+        Takes a token per event or rejects the request
+        """
+        if wait := self.bucket.take(events):
+            self.rejected_rate += 1
+            raise HTTPException(
+                status_code=HTTPStatus.TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+    async def hold(self, stream: AsyncIterator[str]) -> AsyncIterator[str]:
+        """
+        Keeps a request in flight while its response is streamed
+        """
+        with self:
+            async for chunk in stream:
+                yield chunk
+
+    def stats(self) -> ServiceAdmissionStats:
+        self.bucket.refill()
+        return ServiceAdmissionStats(
+            rate=self.limits.rate,
+            burst=self.limits.burst,
+            tokens=self.bucket.tokens,
+            max_concurrency=self.limits.max_concurrency,
+            in_flight=self.in_flight,
+            admitted=self.admitted,
+            rejected_rate=self.rejected_rate,
+            rejected_concurrency=self.rejected_concurrency,
+        )
+
+
+class AdmissionController:
+    """
+    Admits requests of producer services, so that one of them can't
+    saturate the events queue for the others. Limits and counters are
+    kept per API process. A request costs a token, multi-event endpoints
+    charge the rest of their events themselves
+    """
+
+    def __init__(self) -> None:
+        self._services: dict[str, ServiceAdmission] = {}
+
+    def get(self, service_name: str) -> ServiceAdmission:
+        admission = self._services.get(service_name)
+        if admission is None:
+            limits = settings.admission.services.get(
+                service_name, settings.admission.default
+            )
+            admission = ServiceAdmission(limits)
+            self._services[service_name] = admission
+        return admission
+
+    def stats(self) -> dict[str, ServiceAdmissionStats]:
+        return {
+            service_name: admission.stats()
+            for service_name, admission in self._services.items()
+        }
+
+    def admit(self, service_name: str) -> ServiceAdmission:
+        """
+        Checks the concurrency limit of the service and takes a token
+        or rejects the request
+        """
+        admission = self.get(service_name)
+        if admission.in_flight >= admission.limits.max_concurrency:
+            admission.rejected_concurrency += 1
+            raise HTTPException(
+                status_code=HTTPStatus.TOO_MANY_REQUESTS,
+                detail="Too many concurrent requests",
+                headers={"Retry-After": "1"},
+            )
+        admission.charge(1)
+        return admission
+
+    async def __call__(
+        self,
+        access_token: AccessTokenPayload = Depends(verify_access_token_dep),
+    ) -> AsyncIterator[AccessTokenPayload]:
+        with self.admit(access_token.service_name):
+            yield access_token
+
+
+admission_controller = AdmissionController()
@@ -7,8 +7,8 @@ from zoneinfo import ZoneInfo
 
 import httpx
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from src.core.constants import ChannelEnum, EventsEnum
-from src.event_worker.rabbitmq import send_message
+from src.core.constants import ChannelEnum, EventsEnum, NotificationStatusEnum
+from src.event_worker.rabbitmq import send_notification
 from src.event_worker.settings import settings
 from src.models.etc import NewEpisodeData, UserProfile
 from src.models.event import Event, NewEpisodeEventData
@@ -16,8 +16,12 @@ from src.models.notification import (
     NotificationDB,
     NotificationEmailData,
     NotificationQueue,
+    NotificationWebsocketData,
 )
-from src.services.template import TemplateService
+from src.services.inbox import InboxService
+from src.services.presence import PresenceService
+from src.services.send_time import SendTimeShaper
+from src.services.template import SharedContext, TemplateService, TemplateStore
 
 logger = getLogger()
 
@@ -41,6 +45,24 @@ class BaseEventHandler(ABC):
         self.event_collection = event_collection
         self.notification_collection = notification_collection
         self.temlate_service = template_service
+        self.inbox_service = InboxService(
+            mongo_db,
+            notification_collection=notification_collection,
+            counter_collection=settings.mongo.inbox_counter_collection,
+        )
+        self.presence_service = PresenceService(
+            mongo_db, presence_collection=settings.mongo.presence_collection
+        )
+        self.template_store = TemplateStore(
+            mongo_db,
+            template_collection=settings.mongo.template_collection,
+            shared_context_collection=settings.mongo.shared_context_collection,
+        )
+        self.send_time_shaper = SendTimeShaper(
+            mongo_db,
+            slot_collection=settings.mongo.release_slot_collection,
+            options=settings.release,
+        )
         self.profile_service_url = (
             f"http://{settings.profile_service_host}:{settings.profile_service_port}"
         )
@@ -70,8 +92,7 @@ class BaseEventHandler(ABC):
         if exc_type:
             return False
 
-    async def process(self, raw_event: dict) -> None:
-        event = Event.model_validate(raw_event)
+    async def process(self, event: Event) -> None:
         event = await self._save_event(event)
         await self.process_event(event)
 
@@ -84,8 +105,24 @@ class BaseEventHandler(ABC):
 
     async def _send_notification(self, notification: NotificationDB) -> None:
         """
-        Saving the notification in the database and sending it to the instant message queue
+        Saving the notification in the database and sending it to the instant message queue.
+        Notifications stored for the inbox are not queued
         """
+        queued = (
+            notification.send_date is None
+            and notification.status == NotificationStatusEnum.UNSENT
+        )
+        # deferred notifications enter the inbox when the sender delivers them
+        counted = (
+            notification.channel == ChannelEnum.WEBSOCKET
+            and notification.user_id is not None
+            and notification.send_date is None
+        )
+        notification.inbox_counted = counted
+        if queued:
+            notification.next_attempt_at = datetime.now(tz=timezone.utc) + timedelta(
+                seconds=settings.dispatch_lease_seconds
+            )
         try:
             result = await self.mongo[
                 settings.mongo.notification_collection
@@ -97,15 +134,69 @@ class BaseEventHandler(ABC):
             notification_id = str(result.inserted_id)
             logger.info(f"New notification has been saved in the database {notification}")
 
-        if notification.send_date is None:
+        if counted:
+            await self.inbox_service.increment_unread(notification.user_id)
+
+        # with the outbox relay enabled the relay publishes saved notifications
+        if queued and not settings.outbox_relay_enabled:
             queue_notification = NotificationQueue(
                 message=notification.message,
                 channel=notification.channel,
                 data=notification.data,
                 notification_id=notification_id,
+                personalized=notification.personalized,
+                template=notification.template,
+                context=notification.context,
+                shared_context_id=notification.shared_context_id,
             )
             await self._send_notification_to_queue(queue_notification)
 
+    def _is_lazy(self, channel: ChannelEnum) -> bool:
+        # the inbox reads websocket messages, so they are always rendered
+        return settings.lazy_render and channel == ChannelEnum.EMAIL
+
+    async def _save_shared_context(
+        self, channel: ChannelEnum, context: dict
+    ) -> SharedContext:
+        """
+        Stores the context shared by all recipients when the channel renders lazily
+        """
+        if not self._is_lazy(channel):
+            return SharedContext(context)
+        context_id = await self.template_store.save_shared_context(context)
+        return SharedContext(context, context_id)
+
+    async def _render(
+        self,
+        event_type: EventsEnum,
+        channel: ChannelEnum,
+        context: dict,
+        shared_context: SharedContext | None = None,
+    ) -> dict:
+        """
+        Message fields of a notification: the rendered message or, with lazy
+        rendering, the template reference and the recipient context
+        """
+        template = self.temlate_service.get_template(event_type, channel)
+        shared_context = shared_context or SharedContext({})
+        if not self._is_lazy(channel):
+            message = self.temlate_service.render_template(
+                template, {**shared_context.context, **context}
+            )
+            logger.debug(message)
+            return {"message": message}
+
+        template_ref = await self.template_store.publish(
+            template.name, self.temlate_service.get_source(template)
+        )
+        if shared_context.context_id is None:
+            context = {**shared_context.context, **context}
+        return {
+            "template": template_ref,
+            "context": context,
+            "shared_context_id": shared_context.context_id,
+        }
+
     async def _get_user_profile(self, user_id: UUID | str) -> UserProfile:
         """
         Obtaining user information
@@ -178,9 +269,8 @@ class BaseEventHandler(ABC):
         Sends notification to queue
         """
         try:
-            await send_message(
-                notification.model_dump(),
-                queue_name=settings.rabbitmq_queue_notifications,
+            await send_notification(
+                notification, queue_name=settings.rabbitmq_queue_notifications
             )
         except Exception:
             logger.exception(
@@ -209,29 +299,51 @@ class BaseEventHandler(ABC):
         return user_send_date, nighttime_flag
 
     def calculate_send_datetime(
-        self, user_timezone: str, send_date: datetime | None
+        self,
+        user_timezone: str,
+        send_date: datetime | None,
+        user_id: UUID | str | None = None,
     ) -> datetime | None:
         """
-        Calculates the sending time based on the user time zone
+        Calculates the sending time based on the user time zone.
+        Notifications deferred by the night are spread over the release window
+        with a per-user offset when the user is known
         """
         user_send_date, nighttime_flag = self.is_user_nighttime(
             user_timezone, send_date
         )
         if nighttime_flag:
+            night_end_hour = settings.nighttime_end_hour
             if user_send_date.time() < time(settings.nighttime_start_hour, 0):
                 next_notification_time = user_send_date.replace(
-                    hour=7, minute=0, second=0, microsecond=0
+                    hour=night_end_hour, minute=0, second=0, microsecond=0
                 )
             else:
                 next_day = user_send_date + timedelta(days=1)
                 next_notification_time = next_day.replace(
-                    hour=7, minute=0, second=0, microsecond=0
+                    hour=night_end_hour, minute=0, second=0, microsecond=0
                 )
-            next_notification_time.astimezone(tz=timezone.utc)
-            return next_notification_time
+            if user_id is not None:
+                next_notification_time += self.send_time_shaper.jitter(user_id)
+            return next_notification_time.astimezone(tz=timezone.utc)
 
         return send_date
 
+    async def calculate_release_datetime(
+        self, user_id: UUID | str, user_timezone: str, send_date: datetime | None
+    ) -> datetime | None:
+        """
+        Calculates the sending time and books a release slot for notifications
+        deferred by the night
+        """
+        user_send_date = self.calculate_send_datetime(
+            user_timezone, send_date, user_id
+        )
+        if user_send_date is None or user_send_date == send_date:
+            return user_send_date
+
+        return await self.send_time_shaper.reserve(user_send_date, user_timezone)
+
 
 EVENT_HANDLER_REGISTRY: dict[str, type[BaseEventHandler]] = {}
 
@@ -266,22 +378,20 @@ class NewUserEvent(BaseEventHandler):
         user_email = user_profile.email
 
         notification_channel = ChannelEnum.EMAIL
-        template_str = self.temlate_service.get_template(
-            event.type, notification_channel
-        )
-        message = self.temlate_service.render_template(template_str, context)
-        logger.debug(message)
+        content = await self._render(event.type, notification_channel, context)
 
         send_data = NotificationEmailData(
             email=user_email, subject="Подтверждение регистрации в онлайн-кинотеатре"
         )
 
         db_notification = NotificationDB(
-            message=message,
+            **content,
             channel=notification_channel,
             send_date=event.send_date,
             data=send_data.model_dump(),
             updated_at=datetime.now(tz=timezone.utc),
+            user_id=str(user_id),
+            event_id=event.id,
         )
         await self._send_notification(db_notification)
 
@@ -300,57 +410,64 @@ class NewEpisodeEvent(BaseEventHandler):
         filmwork_data = await self._get_new_episode_data(
             event_data.filmwork_id, event_data.episode_id
         )
+        online_users = await self.presence_service.online_users(subscribed_users)
+        shared_context = {
+            "series_name": filmwork_data.series_name,
+            "episode_name": filmwork_data.episode_name,
+            "url": filmwork_data.url,
+        }
+        email_context = await self._save_shared_context(
+            ChannelEnum.EMAIL, shared_context
+        )
         for user_id in subscribed_users:
             user_profile = await self._get_user_profile(user_id)
-            user_send_date = self.calculate_send_datetime(
-                user_profile.timezone, event.send_date
+            user_send_date = await self.calculate_release_datetime(
+                user_id, user_profile.timezone, event.send_date
             )
 
             notification_channel = ChannelEnum.EMAIL
             if user_profile.notification_settings[notification_channel]:
                 user_email = user_profile.email
-                email_context = {
-                    "fullname": user_profile.fullname,
-                    "series_name": filmwork_data.series_name,
-                    "episode_name": filmwork_data.episode_name,
-                    "url": filmwork_data.url,
-                }
-                template_str = self.temlate_service.get_template(
-                    event.type, notification_channel
-                )
-                message = self.temlate_service.render_template(
-                    template_str, email_context
+                content = await self._render(
+                    event.type,
+                    notification_channel,
+                    {"fullname": user_profile.fullname},
+                    email_context,
                 )
                 send_data = NotificationEmailData(
                     email=user_email,
                     subject=f"Online Cinema: {filmwork_data.series_name} вышла новая серия!",
                 )
                 db_notification = NotificationDB(
-                    message=message,
+                    **content,
                     channel=notification_channel,
                     send_date=user_send_date,
                     data=send_data.model_dump(),
                     updated_at=datetime.now(tz=timezone.utc),
+                    user_id=str(user_id),
+                    event_id=event.id,
                 )
                 await self._send_notification(db_notification)
 
             notification_channel = ChannelEnum.WEBSOCKET
             if user_profile.notification_settings[notification_channel]:
-                context = {
-                    "fullname": user_profile.fullname,
-                    "series_name": filmwork_data.series_name,
-                    "episode_name": filmwork_data.episode_name,
-                    "url": filmwork_data.url,
-                }
-                template_str = self.temlate_service.get_template(
-                    event.type, notification_channel
+                content = await self._render(
+                    event.type,
+                    notification_channel,
+                    {"fullname": user_profile.fullname},
+                    SharedContext(shared_context),
                 )
-                message = self.temlate_service.render_template(template_str, context)
+                send_data = NotificationWebsocketData(user_id=str(user_id))
                 db_notification = NotificationDB(
-                    message=message,
+                    **content,
                     channel=notification_channel,
                     send_date=user_send_date,
-                    data={},
+                    data=send_data.model_dump(),
                     updated_at=datetime.now(tz=timezone.utc),
+                    user_id=str(user_id),
+                    event_id=event.id,
                 )
+                # offline users will find it in the inbox, delivery would be wasted
+                if user_send_date is None and str(user_id) not in online_users:
+                    db_notification.status = NotificationStatusEnum.STORED
                 await self._send_notification(db_notification)
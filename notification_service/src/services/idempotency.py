@@ -0,0 +1,181 @@
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from enum import StrEnum
+from logging import getLogger
+
+import orjson
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import BulkWriteError, PyMongoError
+
+logger = getLogger()
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def fingerprint(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+def event_fingerprint(event: dict) -> str:
+    """
+    Fingerprint of an event that doesn't depend on the key order
+    """
+    return fingerprint(orjson.dumps(event, option=orjson.OPT_SORT_KEYS))
+
+
+class KeyState(StrEnum):
+    # claimed, the event is being published
+    PENDING = "pending"
+    # the broker confirmed the event
+    DONE = "done"
+
+
+class ClaimResult(StrEnum):
+    # the key is new or was taken over, the event is published by this request
+    CLAIMED = "claimed"
+    # the event was accepted before
+    DUPLICATE = "duplicate"
+    # another request is publishing the event, its outcome is unknown yet
+    IN_PROGRESS = "in_progress"
+
+
+class IdempotencyStore:
+    """
+    Keys of accepted events. A key is claimed as pending by inserting it
+    into a collection with a TTL index, so it is claimed once by all API
+    processes, and marked done once the broker confirms the event.
+    Only retries of done keys are answered as duplicates: a retry arriving
+    while the key is pending can't know whether the event will be published.
+    A pending key older than pending_timeout belongs to a request that died
+    before publishing, so a retry takes it over. Done keys are remembered in
+    an in-memory LRU and answered without a query
+    """
+
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection,
+        cache_size: int,
+        ttl: int,
+        pending_timeout: float,
+    ) -> None:
+        self.collection = collection
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.pending_timeout = pending_timeout
+        # key -> monotonic time it was seen
+        self._seen: OrderedDict[str, float] = OrderedDict()
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index("created_at", expireAfterSeconds=self.ttl)
+
+    async def claim(self, key: str) -> ClaimResult:
+        return (await self.claim_many([key]))[0]
+
+    async def claim_many(self, keys: list[str]) -> list[ClaimResult]:
+        claimed = [
+            ClaimResult.DUPLICATE if self._is_seen(key) else ClaimResult.CLAIMED
+            for key in keys
+        ]
+        to_insert = [
+            index
+            for index, claim in enumerate(claimed)
+            if claim == ClaimResult.CLAIMED
+        ]
+        if not to_insert:
+            return claimed
+
+        now = datetime.now(tz=timezone.utc)
+        try:
+            await self.collection.insert_many(
+                [
+                    {"_id": keys[index], "created_at": now, "state": KeyState.PENDING}
+                    for index in to_insert
+                ],
+                ordered=False,
+            )
+        except BulkWriteError as error:
+            write_errors = error.details.get("writeErrors", [])
+            if any(item["code"] != DUPLICATE_KEY_ERROR for item in write_errors):
+                raise
+            for item in write_errors:
+                index = to_insert[item["index"]]
+                claimed[index] = await self._take_over(keys[index], now)
+        return claimed
+
+    async def complete(self, keys: list[str]) -> None:
+        """
+        Marks keys of published events as done. A failure is only logged:
+        the events are published and the keys stay pending
+        """
+        if not keys:
+            return
+        try:
+            await self.collection.update_many(
+                {"_id": {"$in": keys}}, {"$set": {"state": KeyState.DONE}}
+            )
+        except PyMongoError:
+            count = len(keys)
+            logger.exception(f"Failed to complete {count} idempotency keys")
+            return
+        for key in keys:
+            self._remember(key)
+
+    async def release(self, keys: list[str]) -> None:
+        """
+        Forgets keys of events that weren't published, so a retry is accepted.
+        A failure is only logged, so it doesn't hide the publish error:
+        the keys stay pending and a retry takes them over after pending_timeout
+        """
+        if not keys:
+            return
+        for key in keys:
+            self._seen.pop(key, None)
+        try:
+            await self.collection.delete_many({"_id": {"$in": keys}})
+        except PyMongoError:
+            count = len(keys)
+            logger.exception(f"Failed to release {count} idempotency keys")
+
+    async def _take_over(self, key: str, now: datetime) -> ClaimResult:
+        """
+        Claims a key left pending by a request that didn't finish publishing.
+        Keys stored before states were introduced count as done
+        """
+        document = await self.collection.find_one_and_update(
+            {
+                "_id": key,
+                "state": KeyState.PENDING,
+                "created_at": {"$lt": now - timedelta(seconds=self.pending_timeout)},
+            },
+            {"$set": {"created_at": now}},
+        )
+        if document is not None:
+            logger.warning(f"Idempotency key {key} was left pending, taking it over")
+            return ClaimResult.CLAIMED
+
+        document = await self.collection.find_one({"_id": key}, {"state": 1})
+        # a released key is claimed again by a retry of the producer
+        if document is None or document.get("state") == KeyState.PENDING:
+            return ClaimResult.IN_PROGRESS
+        return ClaimResult.DUPLICATE
+
+    def _is_seen(self, key: str) -> bool:
+        seen_at = self._seen.get(key)
+        if seen_at is None:
+            return False
+        if time.monotonic() - seen_at > self.ttl:
+            self._seen.pop(key)
+            return False
+        self._seen.move_to_end(key)
+        return True
+
+    def _remember(self, key: str) -> None:
+        self._seen[key] = time.monotonic()
+        self._seen.move_to_end(key)
+        while len(self._seen) > self.cache_size:
+            self._seen.popitem(last=False)
+
+
+idempotency_store: IdempotencyStore | None = None
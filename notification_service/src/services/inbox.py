@@ -0,0 +1,195 @@
+import base64
+from datetime import datetime, timedelta, timezone
+
+import orjson
+from bson import ObjectId
+from bson.errors import InvalidId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import DESCENDING, ReturnDocument
+
+from src.core.constants import ChannelEnum, NotificationStatusEnum
+from src.models.inbox import InboxNotification, InboxPage
+
+EPOCH = datetime.fromtimestamp(0, tz=timezone.utc)
+BASE64_BLOCK = 4
+
+
+class InvalidCursor(Exception):
+    """
+    Inbox cursor can't be decoded
+    """
+
+
+def encode_cursor(created_at: datetime, notification_id: ObjectId) -> str:
+    """
+    Position of the last notification of a page.
+    MongoDB stores dates with millisecond precision, so do the cursors
+    """
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    milliseconds = (created_at - EPOCH) // timedelta(milliseconds=1)
+    raw_cursor = orjson.dumps([milliseconds, str(notification_id)])
+    return base64.urlsafe_b64encode(raw_cursor).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, ObjectId]:
+    try:
+        padded_length = len(cursor) + -len(cursor) % BASE64_BLOCK
+        raw_cursor = base64.urlsafe_b64decode(cursor.ljust(padded_length, "="))
+        milliseconds, notification_id = orjson.loads(raw_cursor)
+        return EPOCH + timedelta(milliseconds=milliseconds), ObjectId(notification_id)
+    except (ValueError, TypeError, InvalidId, orjson.JSONDecodeError):
+        raise InvalidCursor(cursor)
+
+
+class InboxService:
+    """
+    Per-user history of websocket notifications.
+    Pages are read by keyset over the (user_id, channel, created_at, _id) index,
+    so a page costs the same for any history length. Unread counts are kept
+    in a counter document updated together with the notifications.
+    Notifications appear in the inbox once they are due: deferred ones are
+    hidden and uncounted until the sender delivers them
+    """
+
+    channel = ChannelEnum.WEBSOCKET
+
+    def __init__(
+        self,
+        mongo_db: AsyncIOMotorDatabase,
+        notification_collection: str,
+        counter_collection: str,
+    ) -> None:
+        self.notifications = mongo_db[notification_collection]
+        self.counters = mongo_db[counter_collection]
+
+    async def ensure_indexes(self) -> None:
+        await self.notifications.create_index(
+            [
+                ("user_id", 1),
+                ("channel", 1),
+                ("created_at", DESCENDING),
+                ("_id", DESCENDING),
+            ],
+            name="user_inbox",
+        )
+
+    async def increment_unread(self, user_id: str) -> None:
+        await self.counters.update_one(
+            {"_id": user_id}, {"$inc": {"unread": 1}}, upsert=True
+        )
+
+    def visible_filter(self, user_id: str) -> dict:
+        """
+        Notifications of the user that are due and not cancelled
+        """
+        return {
+            "user_id": user_id,
+            "channel": self.channel,
+            "status": {"$ne": NotificationStatusEnum.CANCELLED},
+            "$and": [
+                {
+                    "$or": [
+                        {"send_date": None},
+                        {"send_date": {"$lte": datetime.now(tz=timezone.utc)}},
+                    ]
+                }
+            ],
+        }
+
+    async def get_page(
+        self, user_id: str, cursor: str | None, limit: int
+    ) -> InboxPage:
+        query = self.visible_filter(user_id)
+        if cursor is not None:
+            created_at, notification_id = decode_cursor(cursor)
+            query["$and"].append(
+                {
+                    "$or": [
+                        {"created_at": {"$lt": created_at}},
+                        {"created_at": created_at, "_id": {"$lt": notification_id}},
+                    ]
+                }
+            )
+
+        found = self.notifications.find(
+            query, {"message": 1, "created_at": 1, "read_at": 1}
+        )
+        newest_first = found.sort([("created_at", DESCENDING), ("_id", DESCENDING)])
+        documents = await newest_first.limit(limit).to_list(length=limit)
+
+        next_cursor = None
+        if len(documents) == limit:
+            last = documents[-1]
+            next_cursor = encode_cursor(last["created_at"], last["_id"])
+        return InboxPage(
+            items=[
+                InboxNotification(
+                    id=str(document["_id"]),
+                    message=document["message"],
+                    created_at=document["created_at"],
+                    read_at=document.get("read_at"),
+                )
+                for document in documents
+            ],
+            next_cursor=next_cursor,
+        )
+
+    async def unread_count(self, user_id: str) -> int:
+        counter = await self.counters.find_one({"_id": user_id})
+        return counter["unread"] if counter else 0
+
+    async def mark_read(self, user_id: str, notification_id: str) -> bool:
+        """
+        Returns False if the user has no such notification
+        """
+        try:
+            object_id = ObjectId(notification_id)
+        except InvalidId:
+            return False
+
+        # notifications stored before inbox_counted existed were counted on save
+        result = await self.notifications.update_one(
+            {
+                "_id": object_id,
+                "user_id": user_id,
+                "channel": self.channel,
+                "read_at": None,
+                "inbox_counted": {"$ne": False},
+            },
+            {"$set": {"read_at": datetime.now(tz=timezone.utc)}},
+        )
+        if result.modified_count:
+            await self.counters.update_one(
+                {"_id": user_id}, {"$inc": {"unread": -1}}
+            )
+            return True
+
+        return (
+            await self.notifications.count_documents(
+                {"_id": object_id, "user_id": user_id, "channel": self.channel},
+                limit=1,
+            )
+            > 0
+        )
+
+    async def mark_all_read(self, user_id: str) -> int:
+        """
+        Returns the number of unread notifications left
+        """
+        result = await self.notifications.update_many(
+            {
+                "user_id": user_id,
+                "channel": self.channel,
+                "read_at": None,
+                "inbox_counted": {"$ne": False},
+            },
+            {"$set": {"read_at": datetime.now(tz=timezone.utc)}},
+        )
+        # notifications inserted meanwhile stay counted as unread
+        counter = await self.counters.find_one_and_update(
+            {"_id": user_id},
+            {"$inc": {"unread": -result.modified_count}},
+            return_document=ReturnDocument.AFTER,
+        )
+        return max(counter["unread"], 0) if counter else 0
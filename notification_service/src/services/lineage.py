@@ -0,0 +1,110 @@
+from datetime import datetime, timezone
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, UpdateOne
+
+from src.core.constants import ChannelEnum, NotificationStatusEnum
+from src.models.lineage import BulkUpdateResult, EventNotifications
+
+
+def unread_decrement(group: dict) -> UpdateOne:
+    """
+    Decrements the unread counter of a user by their group of notifications
+    """
+    decrement = {"$inc": {"unread": -group["count"]}}
+    return UpdateOne({"_id": group["_id"]}, decrement)
+
+
+class EventLineageService:
+    """
+    Notifications of an event found by the (event_id, status) index.
+    Pending notifications of an event are cancelled or rescheduled with a
+    single update_many, already queued ones are skipped by the sender.
+    Unread websocket notifications leave the inbox counters, rescheduled ones
+    are counted again when the sender delivers them
+    """
+
+    def __init__(
+        self,
+        mongo_db: AsyncIOMotorDatabase,
+        notification_collection: str,
+        counter_collection: str,
+    ) -> None:
+        self.notifications = mongo_db[notification_collection]
+        self.counters = mongo_db[counter_collection]
+
+    async def ensure_indexes(self) -> None:
+        await self.notifications.create_index(
+            [("event_id", ASCENDING), ("status", ASCENDING)],
+            name="event_lineage",
+            partialFilterExpression={"event_id": {"$type": "string"}},
+        )
+
+    async def summary(self, event_id: str) -> EventNotifications:
+        groups = self.notifications.aggregate(
+            [
+                {"$match": {"event_id": event_id}},
+                {
+                    "$group": {
+                        "_id": "$status",
+                        "count": {"$sum": 1},
+                        "first_send_date": {"$min": "$send_date"},
+                        "last_send_date": {"$max": "$send_date"},
+                    }
+                },
+            ]
+        )
+        summary = EventNotifications(event_id=event_id, statuses={})
+        async for group in groups:
+            summary.statuses[group["_id"]] = group["count"]
+            if group["_id"] == NotificationStatusEnum.UNSENT:
+                summary.first_send_date = group["first_send_date"]
+                summary.last_send_date = group["last_send_date"]
+        return summary
+
+    async def cancel(self, event_id: str) -> BulkUpdateResult:
+        return await self._update_pending(
+            event_id, {"status": NotificationStatusEnum.CANCELLED}
+        )
+
+    async def reschedule(self, event_id: str, send_date: datetime) -> BulkUpdateResult:
+        # the scheduler picks the notifications up at the new send date
+        return await self._update_pending(
+            event_id,
+            {"send_date": send_date, "next_attempt_at": None, "relayed_at": None},
+        )
+
+    async def _update_pending(self, event_id: str, update: dict) -> BulkUpdateResult:
+        # updated_at tells the notifications changed by this call
+        updated_at = datetime.now(tz=timezone.utc)
+        result = await self.notifications.update_many(
+            {"event_id": event_id, "status": NotificationStatusEnum.UNSENT},
+            {"$set": {**update, "updated_at": updated_at}},
+        )
+        if result.modified_count:
+            await self._uncount(event_id, updated_at)
+        return BulkUpdateResult(
+            matched=result.matched_count, modified=result.modified_count
+        )
+
+    async def _uncount(self, event_id: str, updated_at: datetime) -> None:
+        query = {
+            "event_id": event_id,
+            "updated_at": updated_at,
+            "channel": ChannelEnum.WEBSOCKET,
+            "read_at": None,
+            "inbox_counted": {"$ne": False},
+        }
+        decrements = [
+            unread_decrement(group)
+            async for group in self.notifications.aggregate(
+                [
+                    {"$match": query},
+                    {"$group": {"_id": "$user_id", "count": {"$sum": 1}}},
+                ]
+            )
+        ]
+        if not decrements:
+            return
+        await self.counters.bulk_write(decrements, ordered=False)
+        await self.notifications.update_many(query, {"$set": {"inbox_counted": False}})
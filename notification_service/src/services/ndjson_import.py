@@ -0,0 +1,180 @@
+import asyncio
+from collections.abc import AsyncIterator
+from functools import partial
+from logging import getLogger
+
+from pydantic import ValidationError
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from src.core.config import ImportSettings, settings
+from src.db.rabbitmq import send_raw_to_rabbitmq
+from src.models.batch import ImportLineError, ImportReport
+from src.models.event import Event
+from src.services.admission import TokenBucket
+from src.services.notification import format_errors
+from src.utils.codec import JSONCodec
+
+logger = getLogger()
+
+
+class LineSplitter:
+    """
+    Splits a stream of chunks into lines. A line longer than max_line_size
+    isn't kept in memory, it is returned as None once its end arrives
+    """
+
+    def __init__(self, max_line_size: int) -> None:
+        self.max_line_size = max_line_size
+        self.buffer = bytearray()
+        self.too_long = False
+
+    def feed(self, chunk: bytes) -> list[bytes | None]:
+        """
+        Lines completed by the chunk
+        """
+        *completed, rest = chunk.split(b"\n")
+        lines: list[bytes | None] = []
+        for part in completed:
+            self._append(part)
+            lines.append(self._take())
+        self._append(rest)
+        return lines
+
+    def finish(self) -> list[bytes | None]:
+        """
+        The last line of a stream that doesn't end with a newline
+        """
+        if self.buffer or self.too_long:
+            return [self._take()]
+        return []
+
+    def _append(self, part: bytes) -> None:
+        if self.too_long:
+            return
+        if len(self.buffer) + len(part) > self.max_line_size:
+            self.too_long = True
+            self.buffer.clear()
+        else:
+            self.buffer += part
+
+    def _take(self) -> bytes | None:
+        line = None if self.too_long else bytes(self.buffer)
+        self.buffer.clear()
+        self.too_long = False
+        return line
+
+
+class NDJSONImporter:
+    """
+    Imports events from an NDJSON stream, one event per line.
+    Lines are parsed as chunks arrive and forwarded to the queue as is.
+    At most inflight_window events wait for the broker confirm; when the
+    window is full the stream isn't read, so the upload slows down to the
+    broker speed and memory stays constant. Every event takes a token of the
+    service rate limit, waiting for it slows the upload down the same way
+    """
+
+    def __init__(
+        self,
+        headers: dict[str, str],
+        rate_limit: TokenBucket,
+        options: ImportSettings,
+    ) -> None:
+        self.headers = headers
+        self.rate_limit = rate_limit
+        self.options = options
+        self.report = ImportReport()
+        self._line_number = 0
+        self._inflight: set[asyncio.Task] = set()
+
+    async def run(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[ImportReport]:
+        """
+        Progress reports every progress_interval lines and the final report
+        once all events are confirmed
+        """
+        splitter = LineSplitter(settings.raw_event_max_size)
+        async for chunk in chunks:
+            for line in splitter.feed(chunk):
+                await self._process_line(line)
+                if self._line_number % self.options.progress_interval == 0:
+                    yield self.report.model_copy(deep=True)
+        for last_line in splitter.finish():
+            await self._process_line(last_line)
+        if self._inflight:
+            await asyncio.wait(self._inflight)
+
+        accepted = self.report.accepted
+        rejected = self.report.rejected
+        logger.info(f"Import finished: {accepted} accepted, {rejected} rejected")
+        self.report.finished = True
+        yield self.report
+
+    async def _process_line(self, line: bytes | None) -> None:
+        self._line_number += 1
+        if line is None:
+            self._reject(self._line_number, "Line is too long")
+            return
+        line = line.strip()
+        if not line:
+            return
+        try:
+            event = Event.model_validate_json(line)
+        except ValidationError as error:
+            self._reject(self._line_number, format_errors(error))
+            return
+
+        while len(self._inflight) >= self.options.inflight_window:
+            await asyncio.wait(self._inflight, return_when=asyncio.FIRST_COMPLETED)
+        await self.rate_limit.acquire()
+
+        publish = asyncio.create_task(
+            send_raw_to_rabbitmq(
+                settings.rabbitmq_queue_events,
+                line,
+                JSONCodec.content_type,
+                {**self.headers, "x-event-type": event.type.value},
+            )
+        )
+        self._inflight.add(publish)
+        publish.add_done_callback(partial(self._on_published, self._line_number))
+
+    def _on_published(self, line_number: int, publish: asyncio.Task) -> None:
+        self._inflight.discard(publish)
+        if publish.cancelled() or publish.exception() is not None:
+            self._reject(line_number, "Failed to publish event")
+            return
+        self.report.lines += 1
+        self.report.accepted += 1
+
+    def _reject(self, line_number: int, error: str) -> None:
+        self.report.lines += 1
+        self.report.rejected += 1
+        if len(self.report.errors) < self.options.max_errors:
+            self.report.errors.append(ImportLineError(line=line_number, error=error))
+        else:
+            self.report.errors_truncated = True
+
+
+async def encode_reports(reports: AsyncIterator[ImportReport]) -> AsyncIterator[str]:
+    """
+    Reports as NDJSON records
+    """
+    async for report in reports:
+        yield f"{report.model_dump_json()}\n"
+
+
+class ImportResponse(StreamingResponse):
+    """
+    Streams import reports while the importer is still reading the request.
+    StreamingResponse listens for the client disconnect on the receive
+    channel and would take body chunks away from the importer, so it isn't
+    listened here: a disconnect during the upload ends request.stream()
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
@@ -1,25 +1,295 @@
-import json
+import asyncio
+import math
+import re
+from collections.abc import Awaitable, Callable
+from functools import partial
+from http import HTTPStatus
+from logging import getLogger
+from typing import NamedTuple
 
-from fastapi import Request
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from pydantic_core import ErrorDetails
 from starlette.responses import JSONResponse
 
 from src.core.config import settings
-from src.db.rabbitmq import send_to_rabbitmq
+from src.core.constants import EventsEnum
+from src.db.rabbitmq import send_raw_to_rabbitmq, send_to_rabbitmq
+from src.models.batch import BatchItemResult, BatchResult
+from src.models.event import Event
+from src.services import idempotency
+from src.services.idempotency import ClaimResult
+from src.utils.codec import JSONCodec
+
+logger = getLogger()
+
+# the first "type" key is taken, the event worker validates the whole event anyway
+EVENT_TYPE_PATTERN = re.compile(rb'"type"\s*:\s*"([a-z_]+)"')
+EVENT_TYPES = frozenset(event_type.encode() for event_type in EventsEnum)
+
+
+class BatchEvent(NamedTuple):
+    """
+    Valid event of a batch with its idempotency key
+    """
+
+    index: int
+    event: dict
+    key: str | None
+
+
+def get_request_id(request: Request) -> str | None:
+    return request.headers.get("X-Request-Id") or request.cookies.get("X-Request-ID")
+
+
+def format_error(error: ErrorDetails) -> str:
+    location = ".".join(map(str, error["loc"]))
+    return f"{location}: {error['msg']}"
+
+
+def format_errors(error: ValidationError) -> str:
+    return "; ".join(map(format_error, error.errors()))
+
+
+def get_idempotency_key(
+    request: Request, service_name: str, fingerprint: Callable[[], str]
+) -> str | None:
+    """
+    Key of the event in the idempotency store, scoped by the producer service
+    """
+    if idempotency_key := request.headers.get("Idempotency-Key"):
+        return f"{service_name}:key:{idempotency_key}"
+    if settings.idempotency_fingerprint:
+        return f"{service_name}:event:{fingerprint()}"
+    return None
+
+
+def duplicate_response() -> JSONResponse:
+    return JSONResponse(
+        {"message": "Данные для уведомления уже были приняты"},
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def retry_response(claim: ClaimResult) -> JSONResponse:
+    """
+    Response to a retry of a claimed event. While the first request is
+    publishing the event its outcome is unknown, so the retry has to come later
+    """
+    if claim == ClaimResult.DUPLICATE:
+        return duplicate_response()
+    raise HTTPException(
+        status_code=HTTPStatus.CONFLICT,
+        detail="Event with this key is being accepted",
+        headers={"Retry-After": str(math.ceil(settings.spool.publish_timeout))},
+    )
+
+
+def retry_item_result(index: int, claim: ClaimResult) -> BatchItemResult:
+    if claim == ClaimResult.DUPLICATE:
+        return BatchItemResult(index=index, accepted=True, duplicate=True)
+    return BatchItemResult(
+        index=index, accepted=False, error="Event with this key is being accepted"
+    )
 
 
 class NotificationService:
     async def send_event(
-        self, data: dict | list[dict], request: Request
+        self, data: dict | list[dict], request: Request, service_name: str
     ) -> JSONResponse:
         """
-        The function of sending a notification to a queue
+        The function of sending a notification to a queue.
+        Retries of an accepted event are acknowledged without publishing
         """
+        key = get_idempotency_key(
+            request, service_name, lambda: idempotency.event_fingerprint(data)
+        )
+        data["request_id"] = get_request_id(request)
+        return await self._publish_once(
+            key, partial(send_to_rabbitmq, settings.rabbitmq_queue_events, data)
+        )
 
-        request_id = request.cookies.get("X-Request-ID")
-        data["request_id"] = request_id
+    async def send_events_batch(
+        self, items: list[dict], request: Request, service_name: str
+    ) -> BatchResult:
+        """
+        Validates all events and publishes the valid ones concurrently,
+        so the broker confirms them as one pipeline.
+        With an Idempotency-Key header the key of an item is the header
+        followed by the item index
+        """
+        results, valid = self._validate_batch(items, request, service_name)
+        claimed, retried = await self._claim_batch(valid)
+        request_id = get_request_id(request)
+        for event in claimed:
+            event.event["request_id"] = request_id
+        results += retried
+        results += await self._publish_batch(claimed)
 
-        json_string = json.dumps(data)
-        bytes_body = json_string.encode("utf-8")
+        results.sort(key=lambda result: result.index)
+        accepted_count = sum(result.accepted for result in results)
+        return BatchResult(
+            accepted=accepted_count,
+            rejected=len(results) - accepted_count,
+            items=results,
+        )
 
-        await send_to_rabbitmq(settings.rabbitmq_queue_events, bytes_body)
+    async def send_raw_event(
+        self, request: Request, service_name: str
+    ) -> JSONResponse:
+        """
+        Forwards the request body to the queue as is. Request metadata goes
+        to the message headers, the body is only checked to look like an event
+        """
+        body = await self._read_body(request)
+        if body.lstrip()[:1] != b"{":
+            raise HTTPException(
+                status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                detail="Event must be a JSON object",
+            )
+        match = EVENT_TYPE_PATTERN.search(body)
+        if match is None or match.group(1) not in EVENT_TYPES:
+            raise HTTPException(
+                status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                detail="Unknown event type",
+            )
+
+        key = get_idempotency_key(
+            request, service_name, partial(idempotency.fingerprint, body)
+        )
+        headers = {
+            "x-event-type": match.group(1).decode(),
+            "x-service-name": service_name,
+        }
+        if request_id := get_request_id(request):
+            headers["x-request-id"] = request_id
+        return await self._publish_once(
+            key,
+            partial(
+                send_raw_to_rabbitmq,
+                settings.rabbitmq_queue_events,
+                body,
+                JSONCodec.content_type,
+                headers,
+            ),
+        )
+
+    async def _publish_once(
+        self, key: str | None, publish: Callable[[], Awaitable[None]]
+    ) -> JSONResponse:
+        """
+        Publishes an event unless the idempotency key was claimed before
+        """
+        if key is not None:
+            claim = await idempotency.idempotency_store.claim(key)
+            if claim != ClaimResult.CLAIMED:
+                return retry_response(claim)
+
+        try:
+            await publish()
+        except Exception:
+            if key is not None:
+                await idempotency.idempotency_store.release([key])
+            raise
+        if key is not None:
+            await idempotency.idempotency_store.complete([key])
         return JSONResponse({"message": "Данные для уведомления успешно приняты"})
+
+    def _validate_batch(
+        self, items: list[dict], request: Request, service_name: str
+    ) -> tuple[list[BatchItemResult], list[BatchEvent]]:
+        """
+        Results of invalid events and valid events with their keys
+        """
+        rejected: list[BatchItemResult] = []
+        valid: list[BatchEvent] = []
+        with_header = bool(request.headers.get("Idempotency-Key"))
+        for index, item in enumerate(items):
+            try:
+                Event.model_validate(item)
+            except ValidationError as error:
+                rejected.append(
+                    BatchItemResult(
+                        index=index, accepted=False, error=format_errors(error)
+                    )
+                )
+                continue
+            key = get_idempotency_key(
+                request, service_name, partial(idempotency.event_fingerprint, item)
+            )
+            if key is not None and with_header:
+                key = f"{key}:{index}"
+            valid.append(BatchEvent(index, item, key))
+        return rejected, valid
+
+    async def _claim_batch(
+        self, events: list[BatchEvent]
+    ) -> tuple[list[BatchEvent], list[BatchItemResult]]:
+        """
+        Events to publish and results of retried events
+        """
+        claims = iter(
+            await idempotency.idempotency_store.claim_many(
+                [event.key for event in events if event.key is not None]
+            )
+        )
+        claimed: list[BatchEvent] = []
+        retried: list[BatchItemResult] = []
+        for event in events:
+            claim = ClaimResult.CLAIMED if event.key is None else next(claims)
+            if claim == ClaimResult.CLAIMED:
+                claimed.append(event)
+            else:
+                retried.append(retry_item_result(event.index, claim))
+        return claimed, retried
+
+    async def _publish_batch(self, events: list[BatchEvent]) -> list[BatchItemResult]:
+        outcomes = await asyncio.gather(
+            *(
+                send_to_rabbitmq(settings.rabbitmq_queue_events, event.event)
+                for event in events
+            ),
+            return_exceptions=True,
+        )
+        results: list[BatchItemResult] = []
+        failed_keys: list[str] = []
+        published_keys: list[str] = []
+        for (index, _, key), outcome in zip(events, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"Failed to publish event {index} of batch: {outcome}")
+                results.append(
+                    BatchItemResult(
+                        index=index, accepted=False, error="Failed to publish event"
+                    )
+                )
+                keys = failed_keys
+            else:
+                results.append(BatchItemResult(index=index, accepted=True))
+                keys = published_keys
+            if key is not None:
+                keys.append(key)
+        await idempotency.idempotency_store.release(failed_keys)
+        await idempotency.idempotency_store.complete(published_keys)
+        return results
+
+    async def _read_body(self, request: Request) -> bytes:
+        """
+        Reads the body up to raw_event_max_size bytes
+        """
+        content_length = request.headers.get("Content-Length", "0")
+        if content_length.isdigit() and int(content_length) > settings.raw_event_max_size:
+            raise HTTPException(
+                status_code=HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                detail="Event is too large",
+            )
+
+        # chunked requests have no Content-Length
+        body = bytearray()
+        async for chunk in request.stream():
+            body += chunk
+            if len(body) > settings.raw_event_max_size:
+                raise HTTPException(
+                    status_code=HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                    detail="Event is too large",
+                )
+        return bytes(body)
@@ -0,0 +1,229 @@
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta, timezone
+from logging import getLogger
+from typing import Any, Mapping
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+from src.core.constants import NotificationStatusEnum
+from src.event_worker.settings import OutboxRelaySettings, settings
+from src.models.notification import NotificationQueue
+
+logger = getLogger()
+
+Publisher = Callable[[NotificationQueue], Awaitable[None]]
+
+# $changeStream is only supported on replica sets
+CHANGE_STREAM_UNSUPPORTED = {40573, 40324}
+STATE_ID = "notifications"
+
+
+def pending_filter() -> dict:
+    """
+    Saved for immediate sending, not relayed yet and still leased to the relay.
+    After the lease runs out the notification belongs to the scheduler
+    """
+    return {
+        "status": NotificationStatusEnum.UNSENT.value,
+        "send_date": None,
+        "relayed_at": None,
+        "next_attempt_at": {"$gt": datetime.now(tz=timezone.utc)},
+    }
+
+
+def queue_message(document: Mapping[str, Any]) -> NotificationQueue:
+    return NotificationQueue(
+        message=document.get("message"),
+        channel=document["channel"],
+        data=document["data"],
+        notification_id=str(document["_id"]),
+        retry_count=document.get("retry_count", 0),
+        personalized=document.get("personalized", True),
+        template=document.get("template"),
+        context=document.get("context"),
+        shared_context_id=document.get("shared_context_id"),
+    )
+
+
+class OutboxRelay:
+    """
+    Publishes notifications saved for immediate sending.
+    The relay follows inserts into the notifications collection through a
+    change stream or, when Mongo runs without a replica set, by polling
+    new documents in _id order. Notifications are published in batches
+    with broker confirms, then marked as relayed and leased, so neither
+    the relay nor the scheduler publishes them again. The stream position
+    is saved after each batch and the relay resumes from it after a restart.
+    Notifications that failed to publish are left to the scheduler, which
+    picks them up once the lease set by the event worker runs out.
+    Delivery is at least once: a crash between the publish and the update
+    republishes the batch
+    """
+
+    def __init__(
+        self,
+        mongo_db: AsyncIOMotorDatabase,
+        publisher: Publisher,
+        options: OutboxRelaySettings,
+    ) -> None:
+        self.notifications = mongo_db[settings.mongo.notification_collection]
+        self.state = mongo_db[settings.mongo.outbox_state_collection]
+        self.publisher = publisher
+        self.options = options
+        self.lease = timedelta(seconds=settings.dispatch_lease_seconds)
+        self.settle_interval = timedelta(seconds=options.settle_seconds)
+        self.running = True
+
+    async def ensure_indexes(self) -> None:
+        await self.notifications.create_index(
+            [("relayed_at", ASCENDING), ("_id", ASCENDING)],
+            partialFilterExpression={"status": NotificationStatusEnum.UNSENT.value},
+        )
+
+    async def run(self) -> None:
+        try:
+            await self._follow_change_stream()
+        except OperationFailure as error:
+            if error.code not in CHANGE_STREAM_UNSUPPORTED:
+                raise
+            logger.warning(
+                "Change streams are not supported by Mongo, polling new notifications"
+            )
+            await self._poll()
+
+    def stop(self) -> None:
+        self.running = False
+
+    async def relay(self, documents: list[Mapping[str, Any]]) -> int:
+        """
+        Publishes the notifications that are still pending,
+        returns the number of failed ones
+        """
+        if not documents:
+            return 0
+        # the stream replays notifications relayed before a restart
+        ids = [document["_id"] for document in documents]
+        query = {**pending_filter(), "_id": {"$in": ids}}
+        found = self.notifications.find(query, projection={"_id": 1})
+        pending = {document["_id"] async for document in found}
+        documents = [document for document in documents if document["_id"] in pending]
+
+        results = await asyncio.gather(
+            *(self.publisher(queue_message(document)) for document in documents),
+            return_exceptions=True,
+        )
+        published = []
+        for document, result in zip(documents, results):
+            notification_id = document["_id"]
+            if isinstance(result, Exception):
+                logger.error(
+                    f"Failed to relay notification {notification_id}: {result!r}"
+                )
+            else:
+                published.append(notification_id)
+
+        if published:
+            await self._mark_relayed(published)
+        return len(documents) - len(published)
+
+    async def save_state(self, state: dict) -> None:
+        await self.state.update_one({"_id": STATE_ID}, {"$set": state}, upsert=True)
+
+    async def _follow_change_stream(self) -> None:
+        state = await self.state.find_one({"_id": STATE_ID}) or {}
+        pipeline = [
+            {
+                "$match": {
+                    "operationType": "insert",
+                    "fullDocument.status": NotificationStatusEnum.UNSENT.value,
+                    "fullDocument.send_date": None,
+                }
+            }
+        ]
+        async with self.notifications.watch(
+            pipeline,
+            resume_after=state.get("resume_token"),
+            max_await_time_ms=int(self.options.batch_interval * 1000),
+        ) as stream:
+            logger.info("Following notifications change stream")
+            while self.running:
+                batch = await self._collect(stream)
+                if batch:
+                    await self.relay(batch)
+                if stream.resume_token is not None:
+                    await self.save_state({"resume_token": stream.resume_token})
+
+    async def _collect(self, stream) -> list[Mapping[str, Any]]:
+        """
+        Collects up to batch_size inserts or what arrives within batch_interval
+        """
+        batch = []
+        deadline = time.monotonic() + self.options.batch_interval
+        while len(batch) < self.options.batch_size:
+            change = await stream.try_next()
+            if change is not None:
+                batch.append(change["fullDocument"])
+            elif batch or time.monotonic() >= deadline:
+                break
+        return batch
+
+    async def _poll(self) -> None:
+        """
+        Fallback tail over _id. Event workers insert concurrently, so ids
+        may become visible out of order: every pass looks settle_interval
+        back from the last relayed id and relies on relayed_at to skip
+        notifications published earlier. Passes with failed notifications
+        back off, the failed ones are queried again until their lease runs out
+        """
+        state = await self.state.find_one({"_id": STATE_ID}) or {}
+        last_id: ObjectId | None = state.get("last_id")
+        backoff: float = 0
+        while self.running:
+            batch = await self._find_pending(last_id)
+            failed = await self.relay(batch)
+            if batch:
+                last_id = await self._advance(last_id, batch)
+            backoff = self.next_backoff(backoff) if failed else 0
+            if backoff:
+                await asyncio.sleep(backoff)
+            elif len(batch) < self.options.batch_size:
+                await asyncio.sleep(self.options.poll_interval)
+
+    def next_backoff(self, backoff: float) -> float:
+        """
+        Pause after a pass with failed notifications, doubled while they fail
+        """
+        doubled = max(backoff * 2, self.options.poll_interval)
+        return min(doubled, self.options.max_backoff)
+
+    async def _find_pending(
+        self, last_id: ObjectId | None
+    ) -> list[Mapping[str, Any]]:
+        query = pending_filter()
+        if last_id is not None:
+            settled = last_id.generation_time - self.settle_interval
+            query["_id"] = {"$gte": ObjectId.from_datetime(settled)}
+        cursor = self.notifications.find(query).sort("_id", ASCENDING)
+        return await cursor.to_list(length=self.options.batch_size)
+
+    async def _advance(
+        self, last_id: ObjectId | None, batch: list[Mapping[str, Any]]
+    ) -> ObjectId:
+        newest_id = batch[-1]["_id"]
+        last_id = newest_id if last_id is None else max(last_id, newest_id)
+        await self.save_state({"last_id": last_id})
+        return last_id
+
+    async def _mark_relayed(self, ids: list[ObjectId]) -> None:
+        now = datetime.now(tz=timezone.utc)
+        await self.notifications.update_many(
+            {"_id": {"$in": ids}},
+            {"$set": {"relayed_at": now, "next_attempt_at": now + self.lease}},
+        )
+        count = len(ids)
+        logger.info(f"Relayed {count} notifications")
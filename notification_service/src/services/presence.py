@@ -0,0 +1,33 @@
+from datetime import datetime, timezone
+from uuid import UUID
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+
+class PresenceService:
+    """
+    Reads users connected to the websocket gateway from the presence collection
+    """
+
+    # keeps $in queries for large audiences within reasonable size
+    chunk_size = 1000
+
+    def __init__(self, mongo_db: AsyncIOMotorDatabase, presence_collection: str) -> None:
+        self.presence = mongo_db[presence_collection]
+
+    async def online_users(self, user_ids: list[UUID | str]) -> set[str]:
+        """
+        Returns ids of the users with at least one live connection
+        """
+        now = datetime.now(tz=timezone.utc)
+        user_ids = [str(user_id) for user_id in user_ids]
+        online: set[str] = set()
+        for start in range(0, len(user_ids), self.chunk_size):
+            chunk = user_ids[start:start + self.chunk_size]
+            online.update(
+                await self.presence.distinct(
+                    "user_id",
+                    {"user_id": {"$in": chunk}, "expires_at": {"$gt": now}},
+                )
+            )
+        return online
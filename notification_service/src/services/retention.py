@@ -0,0 +1,257 @@
+import gzip
+import os
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
+from logging import getLogger
+from pathlib import Path
+
+from bson import json_util
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import ASCENDING
+from pydantic import BaseModel
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from src.core.constants import ChannelEnum, NotificationStatusEnum
+
+logger = getLogger()
+
+TERMINAL_STATUSES = [
+    NotificationStatusEnum.SUCCESS,
+    NotificationStatusEnum.FAILED,
+    NotificationStatusEnum.CANCELLED,
+]
+# index with the same name exists with other options
+INDEX_OPTIONS_CONFLICT = 85
+DUPLICATE_KEY = 11000
+
+
+class RetentionPolicy(BaseModel):
+    """
+    Which documents of a collection leave the hot tier and when
+    """
+
+    collection: str
+    time_field: str
+    archive_after: timedelta
+    ttl: timedelta | None
+    archive_filter: dict
+    ttl_filter: dict
+
+
+def notification_policy(
+    collection: str, archive_after: timedelta, ttl: timedelta | None
+) -> RetentionPolicy:
+    """
+    Sent, failed and cancelled notifications. Unread websocket notifications stay
+    in the inbox: the unread counters would disagree with the history
+    """
+    return RetentionPolicy(
+        collection=collection,
+        time_field="updated_at",
+        archive_after=archive_after,
+        ttl=ttl,
+        archive_filter={
+            "status": {"$in": [status.value for status in TERMINAL_STATUSES]},
+            "$or": [
+                {"channel": {"$ne": ChannelEnum.WEBSOCKET.value}},
+                {"read_at": {"$ne": None}},
+            ],
+        },
+        # partial indexes don't support $ne, only email notifications expire
+        ttl_filter={
+            "status": {"$in": [status.value for status in TERMINAL_STATUSES]},
+            "channel": ChannelEnum.EMAIL.value,
+        },
+    )
+
+
+def event_policy(
+    collection: str, archive_after: timedelta, ttl: timedelta | None
+) -> RetentionPolicy:
+    return RetentionPolicy(
+        collection=collection,
+        time_field="event_date",
+        archive_after=archive_after,
+        ttl=ttl,
+        archive_filter={},
+        ttl_filter={},
+    )
+
+
+class RetentionService:
+    """
+    Keeps the events and notifications collections small.
+    The archival job exports documents older than archive_after into one
+    gzipped NDJSON file per collection and day, then deletes the exported
+    documents in batches. TTL indexes are a safety net for the case the job
+    doesn't run and should be longer than archive_after. Archives are
+    written in MongoDB extended JSON and restored with the same types
+    """
+
+    def __init__(
+        self, mongo_db: AsyncIOMotorDatabase, archive_dir: Path, batch_size: int
+    ) -> None:
+        self.mongo = mongo_db
+        self.archive_dir = archive_dir
+        self.batch_size = batch_size
+
+    async def ensure_ttl_index(self, policy: RetentionPolicy) -> None:
+        if policy.ttl is None:
+            return
+        collection = self.mongo[policy.collection]
+        name = f"{policy.time_field}_ttl"
+        expire_after = int(policy.ttl.total_seconds())
+        options = {"name": name, "expireAfterSeconds": expire_after}
+        if policy.ttl_filter:
+            options["partialFilterExpression"] = policy.ttl_filter
+        try:
+            await collection.create_index([(policy.time_field, ASCENDING)], **options)
+        except OperationFailure as error:
+            if error.code != INDEX_OPTIONS_CONFLICT:
+                raise
+            # TTL of an existing index is changed in place
+            await self.mongo.command(
+                "collMod",
+                policy.collection,
+                index={"name": name, "expireAfterSeconds": expire_after},
+            )
+
+    async def archive(
+        self, policy: RetentionPolicy, now: datetime | None = None
+    ) -> dict[str, int]:
+        """
+        Archives whole days before the cutoff, oldest first.
+        Returns archived documents per day
+        """
+        collection = self.mongo[policy.collection]
+        now = now or datetime.now(tz=timezone.utc)
+        cutoff = (now - policy.archive_after).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        oldest = await collection.find_one(
+            {**policy.archive_filter, policy.time_field: {"$lt": cutoff}},
+            sort=[(policy.time_field, ASCENDING)],
+            projection={policy.time_field: 1},
+        )
+        if oldest is None:
+            return {}
+
+        archived = {}
+        day = oldest[policy.time_field].replace(
+            hour=0, minute=0, second=0, microsecond=0, tzinfo=timezone.utc
+        )
+        while day < cutoff:
+            count = await self._archive_day(collection, policy, day)
+            if count:
+                archived[day.date().isoformat()] = count
+            day += timedelta(days=1)
+        return archived
+
+    async def restore(self, collection_name: str, path: Path) -> int:
+        """
+        Inserts archived documents back, already present ones are skipped
+        """
+        collection = self.mongo[collection_name]
+        restored = 0
+        batch = []
+        for document in read_archive(path):
+            batch.append(document)
+            if len(batch) >= self.batch_size:
+                restored += await insert_missing(collection, batch)
+                batch = []
+        if batch:
+            restored += await insert_missing(collection, batch)
+        return restored
+
+    def archive_path(self, collection: str, day: datetime) -> Path:
+        # runs of the same day don't overwrite each other
+        run = datetime.now(tz=timezone.utc).strftime("%H%M%S")
+        return (
+            self.archive_dir
+            / collection
+            / f"{day:%Y}"
+            / f"{day:%m}"
+            / f"{collection}-{day:%Y-%m-%d}-{run}.ndjson.gz"
+        )
+
+    async def _archive_day(
+        self,
+        collection: AsyncIOMotorCollection,
+        policy: RetentionPolicy,
+        day: datetime,
+    ) -> int:
+        query = {
+            **policy.archive_filter,
+            policy.time_field: {"$gte": day, "$lt": day + timedelta(days=1)},
+        }
+        path = self.archive_path(policy.collection, day)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = path.with_name(f"{path.name}.tmp")
+
+        count = 0
+        with gzip.open(temporary_path, "wt", encoding="utf-8") as archive:
+            async for document in collection.find(query, batch_size=self.batch_size):
+                archive.write(
+                    json_util.dumps(
+                        document, json_options=json_util.CANONICAL_JSON_OPTIONS
+                    )
+                )
+                archive.write("\n")
+                count += 1
+        if not count:
+            temporary_path.unlink()
+            return 0
+
+        # documents are deleted only once the archive is on disk
+        with open(temporary_path, "rb") as archive_file:
+            os.fsync(archive_file.fileno())
+        temporary_path.replace(path)
+
+        deleted = 0
+        ids = []
+        for archived_document in read_archive(path):
+            ids.append(archived_document["_id"])
+            if len(ids) >= self.batch_size:
+                deleted += await self._delete(collection, policy, ids)
+                ids = []
+        if ids:
+            deleted += await self._delete(collection, policy, ids)
+
+        logger.info(
+            f"Archived {count} documents of {policy.collection} "
+            f"for {day:%Y-%m-%d} to {path}, deleted {deleted}"
+        )
+        return count
+
+    async def _delete(
+        self,
+        collection: AsyncIOMotorCollection,
+        policy: RetentionPolicy,
+        ids: list,
+    ) -> int:
+        # documents changed after the export no longer match and stay
+        result = await collection.delete_many(
+            {**policy.archive_filter, "_id": {"$in": ids}}
+        )
+        return result.deleted_count
+
+
+async def insert_missing(collection: AsyncIOMotorCollection, documents: list) -> int:
+    """
+    Inserts documents, ones with existing ids are skipped
+    """
+    try:
+        result = await collection.insert_many(documents, ordered=False)
+    except BulkWriteError as error:
+        codes = {write_error["code"] for write_error in error.details["writeErrors"]}
+        if codes != {DUPLICATE_KEY}:
+            raise
+        return error.details["nInserted"]
+    return len(result.inserted_ids)
+
+
+def read_archive(path: Path) -> Iterator[dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as archive:
+        for line in archive:
+            if line.strip():
+                yield json_util.loads(line)
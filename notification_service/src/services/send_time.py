@@ -0,0 +1,136 @@
+import hashlib
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from logging import getLogger
+from uuid import UUID
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+
+from src.event_worker.settings import ReleaseSettings
+
+logger = getLogger()
+
+# Release slots are only needed until the notifications are sent
+RELEASE_SLOT_TTL = timedelta(days=2)
+JITTER_DIGEST_SIZE = 8
+
+# minute and the number of notifications released in it
+ReleasePoint = tuple[datetime, int]
+
+
+class SendTimeShaper:
+    """
+    Spreads notifications deferred by quiet hours over a release window
+    """
+
+    def __init__(
+        self,
+        mongo_db: AsyncIOMotorDatabase,
+        slot_collection: str,
+        options: ReleaseSettings,
+    ) -> None:
+        self.mongo = mongo_db
+        self.slot_collection = slot_collection
+        self.spread_seconds = options.spread_minutes * 60
+        self.minute_capacity = options.minute_capacity
+        self.max_shift_minutes = options.max_shift_minutes
+        # minutes known to be full, past minutes are dropped once a minute
+        self.full_minutes: set[datetime] = set()
+        self._pruned_at: datetime | None = None
+
+    async def ensure_indexes(self) -> None:
+        await self.mongo[self.slot_collection].create_index(
+            [("minute", ASCENDING)],
+            expireAfterSeconds=int(RELEASE_SLOT_TTL.total_seconds()),
+        )
+
+    def jitter(self, user_id: UUID | str) -> timedelta:
+        """
+        Deterministic per-user offset inside the spread window,
+        the same user always lands on the same second of the window
+        """
+        if self.spread_seconds <= 0:
+            return timedelta()
+
+        user_key = str(user_id).encode("utf-8")
+        digest = hashlib.blake2b(user_key, digest_size=JITTER_DIGEST_SIZE).digest()
+        return timedelta(seconds=int.from_bytes(digest, "big") % self.spread_seconds)
+
+    async def reserve(self, release_date: datetime, user_timezone: str) -> datetime:
+        """
+        Books a release slot for the notification.
+        If the minute is over its capacity the notification is moved to the next
+        minute with spare capacity; minutes only fill up, so later notifications
+        of the same user never overtake earlier ones
+        """
+        release_date = release_date.astimezone(tz=timezone.utc)
+        minute = release_date.replace(second=0, microsecond=0)
+        self._forget_past_minutes()
+
+        for shift in range(self.max_shift_minutes):
+            candidate = minute + timedelta(minutes=shift)
+            if candidate in self.full_minutes:
+                continue
+            if await self._book_slot(candidate, user_timezone, limited=True):
+                return release_date + timedelta(minutes=shift)
+            self.full_minutes.add(candidate)
+
+        max_shift = timedelta(minutes=self.max_shift_minutes)
+        logger.warning(
+            f"No release capacity within {max_shift} after {minute}, overbooking"
+        )
+        await self._book_slot(minute + max_shift, user_timezone, limited=False)
+        return release_date + max_shift
+
+    async def release_curve(
+        self, since: datetime | None = None
+    ) -> dict[str, list[ReleasePoint]]:
+        """
+        Projected number of released notifications per minute for every timezone
+        """
+        if since is None:
+            since = datetime.now(tz=timezone.utc)
+
+        curve: dict[str, list[ReleasePoint]] = defaultdict(list)
+        slots = self.mongo[self.slot_collection]
+        cursor = slots.find({"minute": {"$gte": since}}).sort("minute", ASCENDING)
+        async for slot in cursor:
+            for tz_key, count in slot.get("timezones", {}).items():
+                user_timezone = tz_key.replace(":", ".")
+                curve[user_timezone].append((slot["minute"], count))
+
+        return dict(curve)
+
+    def _forget_past_minutes(self) -> None:
+        current_minute = datetime.now(tz=timezone.utc).replace(second=0, microsecond=0)
+        if current_minute == self._pruned_at:
+            return
+        self._pruned_at = current_minute
+        self.full_minutes = {
+            minute for minute in self.full_minutes if minute >= current_minute
+        }
+
+    async def _book_slot(
+        self, minute: datetime, user_timezone: str, limited: bool
+    ) -> bool:
+        slot_filter: dict = {"_id": minute}
+        if limited and self.minute_capacity > 0:
+            slot_filter["count"] = {"$lt": self.minute_capacity}
+
+        # dots are not allowed in field names
+        tz_key = user_timezone.replace(".", ":")
+        try:
+            await self.mongo[self.slot_collection].update_one(
+                slot_filter,
+                {
+                    "$inc": {"count": 1, f"timezones.{tz_key}": 1},
+                    "$setOnInsert": {"minute": minute},
+                },
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # the slot exists and is already full
+            return False
+        return True
@@ -1,16 +1,95 @@
+import hashlib
+from datetime import datetime, timezone
 from os import PathLike
+from typing import NamedTuple
 
 from jinja2 import Environment, FileSystemLoader, Template
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from src.core.constants import ChannelEnum, EventsEnum
+from src.models.notification import TemplateRef
+
+# hex digits of the source hash kept as the template version
+VERSION_LENGTH = 16
+
+
+class SharedContext(NamedTuple):
+    """
+    Context shared by all recipients of an event and its id in the store,
+    when it was stored for lazy rendering
+    """
+
+    context: dict
+    context_id: str | None = None
 
 
 class TemplateService:
     def __init__(self, template_path: str | PathLike[str]) -> None:
         self.loader = FileSystemLoader(template_path)
         self.env = Environment(loader=self.loader)
+        self._sources: dict[str, str] = {}
 
     def get_template(self, event_type: EventsEnum, channel: ChannelEnum) -> Template:
         return self.env.get_template(f"{event_type}__{channel}.jinja")
 
     def render_template(self, template: Template, context: dict) -> str:
         return template.render(context)
+
+    def get_source(self, template: Template) -> str:
+        """
+        Template source, read once per process like the compiled templates
+        """
+        if template.name not in self._sources:
+            source, _, _ = self.loader.get_source(self.env, template.name)
+            self._sources[template.name] = source
+        return self._sources[template.name]
+
+
+class TemplateStore:
+    """
+    Template sources stored in Mongo for rendering in the sender.
+    A version is the hash of the source, so an edited template gets
+    a new version and queued notifications keep rendering with the old one
+    """
+
+    def __init__(
+        self,
+        mongo_db: AsyncIOMotorDatabase,
+        template_collection: str,
+        shared_context_collection: str,
+    ) -> None:
+        self.templates = mongo_db[template_collection]
+        self.shared_contexts = mongo_db[shared_context_collection]
+        self._published: set[str] = set()
+
+    async def publish(self, name: str, source: str) -> TemplateRef:
+        """
+        Stores the template version once per process
+        """
+        ref = TemplateRef(
+            name=name, version=hashlib.sha256(source.encode()).hexdigest()[:VERSION_LENGTH]
+        )
+        key = f"{ref.name}@{ref.version}"
+        if key not in self._published:
+            await self.templates.update_one(
+                {"_id": key},
+                {
+                    "$setOnInsert": {
+                        "name": ref.name,
+                        "version": ref.version,
+                        "source": source,
+                        "created_at": datetime.now(tz=timezone.utc),
+                    }
+                },
+                upsert=True,
+            )
+            self._published.add(key)
+        return ref
+
+    async def save_shared_context(self, context: dict) -> str:
+        """
+        Context shared by all recipients of an event, stored once
+        """
+        result = await self.shared_contexts.insert_one(
+            {"context": context, "created_at": datetime.now(tz=timezone.utc)}
+        )
+        return str(result.inserted_id)
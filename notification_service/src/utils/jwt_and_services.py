@@ -11,6 +11,11 @@ from pydantic import BaseModel, ValidationError
 from src.core.config import settings
 from src.core.logger import notification_logger
 from src.utils.services_constant import ServiceEnum
+from src.utils.token_cache import VerifiedTokenCache
+
+LEEWAY = 30
+
+token_cache = VerifiedTokenCache(max_size=settings.jwt_cache_size, leeway=LEEWAY)
 
 
 class TokenType(str, Enum):
@@ -29,6 +34,10 @@ class AccessTokenPayload(TokenPayload):
     service_name: str
 
 
+class UserAccessTokenPayload(TokenPayload):
+    user_id: str
+
+
 cookie_scheme = APIKeyCookie(name="access_token")
 
 
@@ -54,14 +63,40 @@ async def verify_access_token_dep(
     return access_token
 
 
-async def validate_token(token: str) -> dict:
+async def verify_user_token_dep(
+    jwt_token: Annotated[str, Depends(cookie_scheme)],
+) -> UserAccessTokenPayload:
     """
-    Validates JWT
+    Checks user token presence and validates it
     """
-    leeway = 30
+    if not jwt_token:
+        raise HTTPException(
+            status_code=HTTPStatus.UNAUTHORIZED,
+            detail="Access token is missing",
+        )
+    decoded_token = await validate_token(jwt_token)
     try:
-        decoded_token: dict[str, str] = jwt.decode(
-            jwt=token, key=settings.public_key, algorithms=["RS256"], leeway=leeway
+        access_token = UserAccessTokenPayload(**decoded_token)
+    except ValidationError:
+        raise HTTPException(
+            status_code=HTTPStatus.UNAUTHORIZED,
+            detail="Access token is invalid",
+        )
+    if access_token.type != TokenType.ACCESS:
+        raise HTTPException(
+            status_code=HTTPStatus.UNAUTHORIZED,
+            detail="Access token is invalid",
+        )
+    return access_token
+
+
+def decode_token(token: str) -> dict:
+    """
+    Verifies the JWT signature and expiration
+    """
+    try:
+        return jwt.decode(
+            jwt=token, key=settings.public_key, algorithms=["RS256"], leeway=LEEWAY
         )
     except jwt.exceptions.DecodeError as decode_error:
         notification_logger.error(f"Error while JWT decoding: {decode_error}")
@@ -82,6 +117,24 @@ async def validate_token(token: str) -> dict:
             detail="Access token is invalid",
         )
 
+
+async def validate_token(token: str) -> dict:
+    """
+    Validates JWT, tokens verified before are taken from the cache
+    """
+    if (decoded_token := token_cache.get(token)) is not None:
+        return decoded_token
+
+    decoded_token = decode_token(token)
+    # a token revoked before its first use is never cached
+    if token_cache.is_revoked(decoded_token):
+        notification_logger.error("Token is revoked")
+        raise HTTPException(
+            status_code=HTTPStatus.UNAUTHORIZED,
+            detail="Access token is revoked",
+        )
+
+    token_cache.put(token, decoded_token)
     return decoded_token
 
 
@@ -95,9 +148,10 @@ class CheckService:
     async def __call__(
         self,
         access_token: AccessTokenPayload = Depends(verify_access_token_dep),
-    ) -> None:
+    ) -> AccessTokenPayload:
         if access_token.service_name not in self.services:
             raise HTTPException(
                 status_code=HTTPStatus.FORBIDDEN,
                 detail="Service doesn't have required permissions",
             )
+        return access_token
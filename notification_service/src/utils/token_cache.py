@@ -0,0 +1,63 @@
+import hashlib
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+
+RevocationHook = Callable[[dict], bool]
+
+
+def token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+class VerifiedTokenCache:
+    """
+    LRU cache of decoded payloads of tokens whose signature was verified.
+    Tokens are keyed by SHA-256 digest, so the cache doesn't keep the tokens
+    themselves. An entry is dropped once the token expires (with the same
+    leeway as the verification) or any revocation hook rejects its payload
+    """
+
+    def __init__(self, max_size: int, leeway: int) -> None:
+        self.max_size = max_size
+        self.leeway = leeway
+        self._payloads: OrderedDict[bytes, dict] = OrderedDict()
+        self._revocation_hooks: list[RevocationHook] = []
+
+    def get(self, token: str) -> dict | None:
+        key = token_digest(token)
+        payload = self._payloads.get(key)
+        if payload is None:
+            return None
+        if self._is_expired(payload) or self.is_revoked(payload):
+            self._payloads.pop(key)
+            return None
+        self._payloads.move_to_end(key)
+        return payload
+
+    def put(self, token: str, payload: dict) -> None:
+        # tokens without expiration are verified every time
+        expires_at = payload.get("exp")
+        if self.max_size <= 0 or not isinstance(expires_at, int | float):
+            return
+        self._payloads[token_digest(token)] = payload
+        while len(self._payloads) > self.max_size:
+            self._payloads.popitem(last=False)
+
+    def add_revocation_hook(self, hook: RevocationHook) -> None:
+        """
+        hook(payload) returns True if the token must not be accepted anymore
+        """
+        self._revocation_hooks.append(hook)
+
+    def revoke(self, token: str) -> None:
+        self._payloads.pop(token_digest(token), None)
+
+    def clear(self) -> None:
+        self._payloads.clear()
+
+    def is_revoked(self, payload: dict) -> bool:
+        return any(hook(payload) for hook in self._revocation_hooks)
+
+    def _is_expired(self, payload: dict) -> bool:
+        return payload["exp"] + self.leeway < time.time()
@@ -0,0 +1,32 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+# settings without defaults, the tests don't connect to the broker
+TEST_ENVIRONMENT = {
+    "NOTIFICATION_API_URL": "http://localhost:8000/api/v1/notification/",
+    "PRIVATE_KEY": "",
+    "PUBLIC_KEY": "",
+    "RABBITMQ_USERNAME": "guest",
+    "RABBITMQ_PASSWORD": "guest",
+    "RABBITMQ_QUEUE_EVENTS": "events",
+    "RABBITMQ_QUEUE_NOTIFICATIONS": "notifications",
+    "RABBITMQ_DELIVERY_MODE": "2",
+    "RABBITMQ_HOST": "localhost",
+    "RABBITMQ_PORT": "5672",
+}
+
+# the services are imported as the src package, like in the containers
+sys.path.insert(0, str(SERVICE_DIR))
+for name, env_value in TEST_ENVIRONMENT.items():
+    os.environ.setdefault(name, env_value)
+
+
+@pytest.fixture
+def mongo_db():
+    return AsyncMongoMockClient()["notifications"]
@@ -0,0 +1,75 @@
+import asyncio
+from http import HTTPStatus
+
+import pytest
+from fastapi import HTTPException
+
+from src.core.config import ServiceLimits
+from src.services.admission import ServiceAdmission, TokenBucket
+
+BURST = 5
+RATE = 10
+COSTLY_REQUEST = 20
+# the debt of the costly request plus a token, at RATE tokens per second
+DEBT_WAIT = (COSTLY_REQUEST - BURST + 1) / RATE
+# three tokens at 100 per second, the first one is in the bucket
+MIN_ACQUIRE_TIME = 0.015
+
+
+def charge_error(admission: ServiceAdmission, events: int) -> HTTPException:
+    try:
+        admission.charge(events)
+    except HTTPException as error:
+        return error
+    raise AssertionError("The request was admitted")
+
+
+def test_bucket_takes_tokens_per_event():
+    bucket = TokenBucket(rate=1, burst=10)
+
+    assert bucket.take(6) == 0
+    assert bucket.take(4) == 0
+    assert bucket.take(1) > 0
+
+
+def test_costly_request_leaves_debt():
+    bucket = TokenBucket(rate=RATE, burst=BURST)
+
+    # admitted with a full bucket
+    assert bucket.take(COSTLY_REQUEST) == 0
+    assert bucket.tokens < BURST - COSTLY_REQUEST + 1
+    assert bucket.take(1) == pytest.approx(DEBT_WAIT, rel=0.1)
+
+
+def test_charge_rejects_with_retry_after():
+    admission = ServiceAdmission(ServiceLimits(rate=1, burst=BURST, max_concurrency=1))
+    admission.charge(BURST)
+
+    error = charge_error(admission, 3)
+
+    assert error.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    assert error.headers == {"Retry-After": "3"}
+    assert admission.rejected_rate == 1
+
+
+def test_admission_counts_requests_in_flight():
+    admission = ServiceAdmission(ServiceLimits())
+
+    with admission:
+        assert admission.in_flight == 1
+
+    assert admission.in_flight == 0
+    assert admission.admitted == 1
+
+
+@pytest.mark.asyncio
+async def test_acquire_waits_for_tokens():
+    bucket = TokenBucket(rate=100, burst=1)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    for _ in range(3):
+        await bucket.acquire()
+
+    elapsed = loop.time() - started
+    assert elapsed >= MIN_ACQUIRE_TIME
@@ -0,0 +1,157 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pymongo.errors import PyMongoError
+
+from src.services.idempotency import (
+    ClaimResult,
+    IdempotencyStore,
+    KeyState,
+    event_fingerprint,
+)
+
+KEYS_TTL = 3600
+PENDING_TIMEOUT = 30
+STALE = timedelta(minutes=1)
+
+
+class FailingCollection:
+    """
+    Collection whose deletes fail, like with Mongo being unreachable
+    """
+
+    async def delete_many(self, query: dict) -> None:
+        raise PyMongoError("connection refused")
+
+
+def make_store(collection) -> IdempotencyStore:
+    return IdempotencyStore(
+        collection,
+        cache_size=2,
+        ttl=KEYS_TTL,
+        pending_timeout=PENDING_TIMEOUT,
+    )
+
+
+def stale_key(key: str, **fields) -> dict:
+    created_at = datetime.now(tz=timezone.utc) - STALE
+    return {"_id": key, "created_at": created_at, **fields}
+
+
+@pytest.fixture
+def store(mongo_db):
+    return make_store(mongo_db["idempotency_keys"])
+
+
+def test_fingerprint_ignores_key_order():
+    ordered = {"a": 1, "b": {"c": 2, "d": 3}}
+    shuffled = {"b": {"d": 3, "c": 2}, "a": 1}
+
+    assert event_fingerprint(ordered) == event_fingerprint(shuffled)
+
+
+@pytest.mark.asyncio
+async def test_key_is_claimed_once(store):
+    assert await store.claim("new") == ClaimResult.CLAIMED
+
+    document = await store.collection.find_one({"_id": "new"})
+    assert document["state"] == KeyState.PENDING
+
+
+@pytest.mark.asyncio
+async def test_pending_key_is_in_progress(store):
+    await store.claim("pending")
+
+    assert await store.claim("pending") == ClaimResult.IN_PROGRESS
+
+
+@pytest.mark.asyncio
+async def test_done_key_is_duplicate(store):
+    await store.claim("done")
+    await store.complete(["done"])
+
+    # the second store has no cache, so the key is read from the collection
+    fresh_store = make_store(store.collection)
+    assert await fresh_store.claim("done") == ClaimResult.DUPLICATE
+
+
+@pytest.mark.asyncio
+async def test_claim_many_reports_each_key(store):
+    await store.claim_many(["done", "pending"])
+    await store.complete(["done"])
+
+    claims = await store.claim_many(["new", "done", "pending"])
+
+    assert claims == [
+        ClaimResult.CLAIMED,
+        ClaimResult.DUPLICATE,
+        ClaimResult.IN_PROGRESS,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_released_key_is_claimed_again(store):
+    await store.claim("released")
+
+    await store.release(["released"])
+
+    assert await store.claim("released") == ClaimResult.CLAIMED
+
+
+@pytest.mark.asyncio
+async def test_failed_release_is_suppressed():
+    failing_store = make_store(FailingCollection())
+
+    # doesn't raise, the key stays pending until it is taken over
+    await failing_store.release(["released"])
+
+
+@pytest.mark.asyncio
+async def test_completed_key_is_answered_from_cache(store):
+    await store.claim("completed")
+
+    await store.complete(["completed"])
+
+    document = await store.collection.find_one({"_id": "completed"})
+    assert document["state"] == KeyState.DONE
+    await store.collection.delete_many({})
+    assert await store.claim("completed") == ClaimResult.DUPLICATE
+
+
+@pytest.mark.asyncio
+async def test_cache_keeps_latest_keys(store):
+    keys = ["first", "second", "third"]
+    await store.claim_many(keys)
+    await store.complete(keys)
+    await store.collection.delete_many({})
+
+    claims = await store.claim_many(keys)
+
+    assert claims == [
+        ClaimResult.CLAIMED,
+        ClaimResult.DUPLICATE,
+        ClaimResult.DUPLICATE,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_stale_pending_key_is_taken_over(store):
+    await store.collection.insert_one(stale_key("stale", state=KeyState.PENDING))
+
+    assert await store.claim("stale") == ClaimResult.CLAIMED
+    assert await store.claim("stale") == ClaimResult.IN_PROGRESS
+
+
+@pytest.mark.asyncio
+async def test_stale_done_key_is_not_taken_over(store):
+    await store.collection.insert_many(
+        [
+            stale_key("done", state=KeyState.DONE),
+            # stored before states were introduced
+            stale_key("legacy"),
+        ]
+    )
+
+    claims = await store.claim_many(["done", "legacy"])
+
+    assert claims == [ClaimResult.DUPLICATE, ClaimResult.DUPLICATE]
@@ -0,0 +1,175 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+from src.core.constants import ChannelEnum, NotificationStatusEnum
+from src.services.inbox import (
+    InboxService,
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+)
+
+USER_ID = "user"
+
+
+@pytest.fixture
+def inbox(mongo_db):
+    return InboxService(mongo_db, "notifications", "inbox_counters")
+
+
+def notification(created_at: datetime, **fields) -> dict:
+    return {
+        "_id": ObjectId(),
+        "user_id": USER_ID,
+        "channel": ChannelEnum.WEBSOCKET,
+        "status": NotificationStatusEnum.SUCCESS,
+        "message": "message",
+        "created_at": created_at,
+        "send_date": None,
+        "read_at": None,
+        "inbox_counted": True,
+        **fields,
+    }
+
+
+def test_cursor_round_trip():
+    created_at = datetime.fromisoformat("2024-05-01T12:30:15.123456+00:00")
+    notification_id = ObjectId()
+
+    decoded = decode_cursor(encode_cursor(created_at, notification_id))
+
+    # Mongo keeps milliseconds only
+    in_milliseconds = datetime.fromisoformat("2024-05-01T12:30:15.123+00:00")
+    assert decoded == (in_milliseconds, notification_id)
+
+
+def test_cursor_of_naive_date_is_utc():
+    created_at = datetime.fromisoformat("2024-05-01T12:30:00")
+    notification_id = ObjectId()
+
+    decoded, _ = decode_cursor(encode_cursor(created_at, notification_id))
+
+    assert decoded == created_at.replace(tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "WzEsImJhZCJd", "e30"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+@pytest.mark.asyncio
+async def test_pages_follow_keyset_order(inbox):
+    start = datetime.fromisoformat("2024-05-01T00:00:00+00:00")
+    # notifications created at the same time are ordered by _id
+    documents = [
+        notification(start + timedelta(minutes=index // 2)) for index in range(5)
+    ]
+    await inbox.notifications.insert_many(documents)
+
+    seen = []
+    cursor = None
+    while True:
+        page = await inbox.get_page(USER_ID, cursor, limit=2)
+        seen.extend(item.id for item in page.items)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    expected = sorted(
+        documents, key=lambda document: (document["created_at"], document["_id"])
+    )
+    assert seen == [str(document["_id"]) for document in reversed(expected)]
+
+
+@pytest.mark.asyncio
+async def test_last_full_page_has_cursor_to_empty_page(inbox):
+    now = datetime.now(tz=timezone.utc)
+    await inbox.notifications.insert_many([notification(now), notification(now)])
+
+    page = await inbox.get_page(USER_ID, None, limit=2)
+    last_page = await inbox.get_page(USER_ID, page.next_cursor, limit=2)
+
+    assert len(page.items) == 2
+    assert not last_page.items
+    assert last_page.next_cursor is None
+
+
+@pytest.mark.asyncio
+async def test_page_hides_cancelled_and_deferred(inbox):
+    now = datetime.now(tz=timezone.utc)
+    visible = notification(now, send_date=now - timedelta(minutes=1))
+    await inbox.notifications.insert_many(
+        [
+            visible,
+            notification(now, status=NotificationStatusEnum.CANCELLED),
+            notification(
+                now,
+                status=NotificationStatusEnum.UNSENT,
+                send_date=now + timedelta(hours=1),
+                inbox_counted=False,
+            ),
+            notification(now, channel=ChannelEnum.EMAIL),
+            notification(now, user_id="other user"),
+        ]
+    )
+
+    page = await inbox.get_page(USER_ID, None, limit=10)
+
+    assert [item.id for item in page.items] == [str(visible["_id"])]
+
+
+@pytest.mark.asyncio
+async def test_mark_read_decrements_counter_once(inbox):
+    document = notification(datetime.now(tz=timezone.utc))
+    await inbox.notifications.insert_one(document)
+    await inbox.increment_unread(USER_ID)
+
+    assert await inbox.mark_read(USER_ID, str(document["_id"]))
+    assert await inbox.mark_read(USER_ID, str(document["_id"]))
+    assert await inbox.unread_count(USER_ID) == 0
+
+
+@pytest.mark.asyncio
+async def test_mark_read_skips_uncounted_notification(inbox):
+    document = notification(datetime.now(tz=timezone.utc), inbox_counted=False)
+    await inbox.notifications.insert_one(document)
+
+    assert await inbox.mark_read(USER_ID, str(document["_id"]))
+    assert await inbox.unread_count(USER_ID) == 0
+    stored = await inbox.notifications.find_one({"_id": document["_id"]})
+    assert stored["read_at"] is None
+
+
+@pytest.mark.asyncio
+async def test_mark_read_of_foreign_notification(inbox):
+    document = notification(datetime.now(tz=timezone.utc), user_id="other user")
+    await inbox.notifications.insert_one(document)
+
+    assert not await inbox.mark_read(USER_ID, str(document["_id"]))
+    assert not await inbox.mark_read(USER_ID, "not an id")
+
+
+@pytest.mark.asyncio
+async def test_mark_all_read_counts_only_counted(inbox):
+    now = datetime.now(tz=timezone.utc)
+    await inbox.notifications.insert_many(
+        [
+            notification(now),
+            notification(now),
+            notification(now, inbox_counted=False),
+            # stored before inbox_counted existed
+            {
+                key: value
+                for key, value in notification(now).items()
+                if key != "inbox_counted"
+            },
+        ]
+    )
+    for _ in range(3):
+        await inbox.increment_unread(USER_ID)
+
+    assert await inbox.mark_all_read(USER_ID) == 0
+    assert await inbox.unread_count(USER_ID) == 0
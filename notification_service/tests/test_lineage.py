@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+from src.core.constants import ChannelEnum, NotificationStatusEnum
+from src.services.inbox import InboxService
+from src.services.lineage import EventLineageService
+
+EVENT_ID = "event"
+
+
+@pytest.fixture
+def lineage(mongo_db):
+    return EventLineageService(mongo_db, "notifications", "inbox_counters")
+
+
+@pytest.fixture
+def inbox(mongo_db):
+    return InboxService(mongo_db, "notifications", "inbox_counters")
+
+
+def notification(user_id: str, **fields) -> dict:
+    return {
+        "_id": ObjectId(),
+        "event_id": EVENT_ID,
+        "user_id": user_id,
+        "channel": ChannelEnum.WEBSOCKET,
+        "status": NotificationStatusEnum.UNSENT,
+        "message": "message",
+        "created_at": datetime.now(tz=timezone.utc),
+        "send_date": None,
+        "read_at": None,
+        "inbox_counted": True,
+        **fields,
+    }
+
+
+async def insert_unread(lineage, inbox) -> None:
+    await lineage.notifications.insert_many(
+        [
+            notification("first"),
+            notification("first"),
+            notification("first", read_at=datetime.now(tz=timezone.utc)),
+            notification("second"),
+            # deferred, not counted yet
+            notification("second", inbox_counted=False),
+            notification("second", status=NotificationStatusEnum.SUCCESS),
+            notification("second", channel=ChannelEnum.EMAIL),
+        ]
+    )
+    for user_id in ("first", "first", "second", "second"):
+        await inbox.increment_unread(user_id)
+
+
+@pytest.mark.asyncio
+async def test_cancel_uncounts_unread_notifications(lineage, inbox):
+    await insert_unread(lineage, inbox)
+
+    result = await lineage.cancel(EVENT_ID)
+
+    assert (result.matched, result.modified) == (6, 6)
+    assert await inbox.unread_count("first") == 0
+    # the delivered notification stays counted
+    assert await inbox.unread_count("second") == 1
+    page = await inbox.get_page("first", None, limit=10)
+    assert not page.items
+
+
+@pytest.mark.asyncio
+async def test_cancelled_notifications_stay_uncounted(lineage, inbox):
+    await insert_unread(lineage, inbox)
+    await lineage.cancel(EVENT_ID)
+
+    # cancelled notifications are not counted twice
+    await lineage.cancel(EVENT_ID)
+    await inbox.mark_all_read("first")
+
+    assert await inbox.unread_count("first") == 0
+    counted = await lineage.notifications.count_documents(
+        {
+            "status": NotificationStatusEnum.CANCELLED,
+            "channel": ChannelEnum.WEBSOCKET,
+            "read_at": None,
+            "inbox_counted": True,
+        }
+    )
+    assert not counted
+
+
+@pytest.mark.asyncio
+async def test_reschedule_hides_until_delivery(lineage, inbox):
+    await lineage.notifications.insert_one(notification("user"))
+    await inbox.increment_unread("user")
+
+    await lineage.reschedule(
+        EVENT_ID, datetime.now(tz=timezone.utc) + timedelta(hours=1)
+    )
+
+    assert await inbox.unread_count("user") == 0
+    page = await inbox.get_page("user", None, limit=10)
+    assert not page.items
+    stored = await lineage.notifications.find_one()
+    assert stored["inbox_counted"] is False
+    assert stored["relayed_at"] is None
+
+
+@pytest.mark.asyncio
+async def test_summary(lineage):
+    send_date = datetime.fromisoformat("2024-05-01T00:00:00+00:00")
+    last_send_date = send_date + timedelta(hours=1)
+    await lineage.notifications.insert_many(
+        [
+            notification("first", send_date=send_date),
+            notification("second", send_date=last_send_date),
+            notification("third", status=NotificationStatusEnum.SUCCESS),
+        ]
+    )
+
+    summary = await lineage.summary(EVENT_ID)
+
+    assert summary.statuses == {
+        NotificationStatusEnum.UNSENT: 2,
+        NotificationStatusEnum.SUCCESS: 1,
+    }
+    assert summary.first_send_date.replace(tzinfo=timezone.utc) == send_date
+    assert summary.last_send_date.replace(tzinfo=timezone.utc) == last_send_date
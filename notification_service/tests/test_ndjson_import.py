@@ -0,0 +1,195 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from src.core.config import ImportSettings, ServiceLimits, settings
+from src.models.batch import ImportReport
+from src.services import ndjson_import
+from src.services.admission import ServiceAdmission, TokenBucket
+from src.services.ndjson_import import (
+    ImportResponse,
+    LineSplitter,
+    NDJSONImporter,
+    encode_reports,
+)
+
+EVENT = b'{"type": "new_user", "data": {}, "event_date": "2024-01-01T00:00:00"}'
+EVENT_LINE = b"".join((EVENT, b"\n"))
+HEADERS = {"x-service-name": "ugc", "x-event-type": "new_user"}
+# enough tokens to import without waiting
+RATE = 1000
+MAX_LINE_SIZE = 8
+
+
+class Broker:
+    """
+    Holds publishes until they are confirmed
+    """
+
+    def __init__(self) -> None:
+        self.messages: list[tuple[bytes, dict]] = []
+        self.confirmed = asyncio.Event()
+        self.waiting = 0
+        self.max_waiting = 0
+
+    async def __call__(
+        self, queue: str, body: bytes, content_type: str, headers: dict
+    ) -> None:
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        await self.confirmed.wait()
+        self.waiting -= 1
+        self.messages.append((body, headers))
+
+
+class Client:
+    """
+    ASGI channels of a client uploading the body in chunks
+    """
+
+    def __init__(self, *chunks: bytes) -> None:
+        self.messages = [
+            {"type": "http.request", "body": chunk, "more_body": True}
+            for chunk in chunks
+        ]
+        self.messages.append({"type": "http.request", "body": b""})
+        self.response = b""
+
+    async def receive(self) -> dict:
+        await asyncio.sleep(0)
+        if not self.messages:
+            # stays connected until the response is sent
+            await asyncio.Event().wait()
+        return self.messages.pop(0)
+
+    async def send(self, message: dict) -> None:
+        if message["type"] == "http.response.body":
+            self.response += message["body"]
+
+
+async def stream(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+        # lets the broker confirm
+        await asyncio.sleep(0)
+
+
+def make_importer(**options) -> NDJSONImporter:
+    return NDJSONImporter(
+        {"x-service-name": "ugc"},
+        TokenBucket(rate=RATE, burst=RATE),
+        ImportSettings(**options),
+    )
+
+
+async def import_reports(importer: NDJSONImporter, *chunks: bytes) -> list:
+    return [report async for report in importer.run(stream(*chunks))]
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    events_broker = Broker()
+    events_broker.confirmed.set()
+    monkeypatch.setattr(ndjson_import, "send_raw_to_rabbitmq", events_broker)
+    return events_broker
+
+
+def test_lines_are_split_across_chunks():
+    splitter = LineSplitter(max_line_size=MAX_LINE_SIZE)
+
+    lines = splitter.feed(b"first\nsec") + splitter.feed(b"ond\n\nla")
+
+    assert lines == [b"first", b"second", b""]
+    assert splitter.finish() == [b"la"]
+
+
+def test_too_long_line_is_skipped():
+    splitter = LineSplitter(max_line_size=MAX_LINE_SIZE)
+
+    lines = splitter.feed(b"too long ") + splitter.feed(b"line\nshort\n")
+
+    assert lines == [None, b"short"]
+    assert not splitter.finish()
+
+
+@pytest.mark.asyncio
+async def test_events_are_published_with_type(broker):
+    reports = await import_reports(make_importer(), EVENT_LINE, EVENT)
+
+    assert reports[-1].accepted == 2
+    assert reports[-1].finished
+    assert broker.messages == [(EVENT, HEADERS), (EVENT, HEADERS)]
+
+
+@pytest.mark.asyncio
+async def test_line_errors_are_capped(broker):
+    importer = make_importer(max_errors=1)
+    too_long = b" " * (settings.raw_event_max_size + 1)
+
+    reports = await import_reports(importer, b"{}\n", too_long, b"\n", EVENT)
+
+    report = reports[-1]
+    assert (report.accepted, report.rejected) == (1, 2)
+    assert [error.line for error in report.errors] == [1]
+    assert report.errors_truncated
+
+
+@pytest.mark.asyncio
+async def test_progress_is_reported(broker):
+    importer = make_importer(progress_interval=2)
+
+    reports = await import_reports(importer, EVENT_LINE * 3)
+
+    assert [report.finished for report in reports] == [False, True]
+    assert reports[-1].accepted == 3
+
+
+@pytest.mark.asyncio
+async def test_inflight_events_are_limited(broker):
+    broker.confirmed.clear()
+    importer = make_importer(inflight_window=2)
+    imported = asyncio.create_task(
+        import_reports(importer, EVENT_LINE * 3)
+    )
+    await asyncio.sleep(0.1)
+    waiting = broker.waiting
+
+    broker.confirmed.set()
+    reports = await imported
+
+    assert waiting == 2
+    assert broker.max_waiting == 2
+    assert reports[-1].accepted == 3
+
+
+@pytest.mark.asyncio
+async def test_response_leaves_request_body_to_importer(broker):
+    client = Client(EVENT_LINE, EVENT_LINE, EVENT)
+    scope = {"type": "http", "method": "POST", "headers": []}
+    request = Request(scope, client.receive)
+    response = ImportResponse(encode_reports(make_importer().run(request.stream())))
+
+    await response(scope, client.receive, client.send)
+
+    report = ImportReport.model_validate_json(client.response.splitlines()[-1])
+    assert report.accepted == 3
+
+
+@pytest.mark.asyncio
+async def test_import_is_held_while_streamed(broker):
+    admission = ServiceAdmission(ServiceLimits())
+    client = Client(EVENT_LINE)
+    scope = {"type": "http", "method": "POST", "headers": []}
+    request = Request(scope, client.receive)
+    reports = encode_reports(make_importer().run(request.stream()))
+    in_flight = []
+
+    async def send(message: dict) -> None:
+        if message.get("body"):
+            in_flight.append(admission.in_flight)
+
+    await ImportResponse(admission.hold(reports))(scope, client.receive, send)
+
+    assert in_flight == [1]
+    assert admission.in_flight == 0
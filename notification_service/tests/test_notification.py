@@ -0,0 +1,243 @@
+from http import HTTPStatus
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from src.core.config import settings
+from src.services import idempotency, notification
+from src.services.idempotency import ClaimResult, IdempotencyStore
+from src.services.notification import NotificationService
+
+SERVICE_NAME = "ugc"
+KEYS_TTL = 3600
+PENDING_TIMEOUT = 30
+RAW_EVENT = b'{"type": "new_user", "user_id": 1}'
+EVENT_DATE = "2024-01-01T00:00:00+00:00"
+
+
+class Publisher:
+    """
+    Records published events instead of sending them to the broker
+    """
+
+    def __init__(self) -> None:
+        self.events: list[dict] = []
+        # ids of events the broker doesn't confirm
+        self.failing: set[str] = set()
+
+    async def __call__(self, queue: str, event: dict) -> None:
+        if event.get("id") in self.failing:
+            raise ConnectionError("broker is down")
+        self.events.append(event)
+
+
+class RawPublisher:
+    """
+    Records raw messages with their headers
+    """
+
+    def __init__(self) -> None:
+        self.messages: list[tuple[bytes, dict]] = []
+
+    async def __call__(
+        self, queue: str, body: bytes, content_type: str, headers: dict
+    ) -> None:
+        self.messages.append((body, headers))
+
+
+def make_event(event_id: str) -> dict:
+    return {"id": event_id, "type": "new_user", "data": {}, "event_date": EVENT_DATE}
+
+
+def make_request(headers: dict[str, str], chunks: tuple[bytes, ...] = ()) -> Request:
+    """
+    Request with the body streamed in chunks, like a chunked upload
+    """
+    raw_headers = [
+        (name.lower().encode(), header.encode())
+        for name, header in headers.items()
+    ]
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": True}
+        for chunk in chunks
+    ]
+    messages.append({"type": "http.request", "body": b"", "more_body": False})
+
+    async def receive() -> dict:
+        return messages.pop(0)
+
+    scope = {"type": "http", "method": "POST", "headers": raw_headers}
+    return Request(scope, receive)
+
+
+async def send_error(data: dict, request: Request) -> HTTPException:
+    try:
+        await NotificationService().send_event(data, request, SERVICE_NAME)
+    except HTTPException as error:
+        return error
+    raise AssertionError("The event was accepted")
+
+
+async def send_raw_error(request: Request) -> HTTPException:
+    try:
+        await NotificationService().send_raw_event(request, SERVICE_NAME)
+    except HTTPException as error:
+        return error
+    raise AssertionError("The raw event was accepted")
+
+
+@pytest.fixture
+def store(mongo_db, monkeypatch):
+    keys_store = IdempotencyStore(
+        mongo_db["idempotency_keys"],
+        cache_size=2,
+        ttl=KEYS_TTL,
+        pending_timeout=PENDING_TIMEOUT,
+    )
+    monkeypatch.setattr(idempotency, "idempotency_store", keys_store)
+    return keys_store
+
+
+@pytest.fixture
+def publisher(monkeypatch):
+    events_publisher = Publisher()
+    monkeypatch.setattr(notification, "send_to_rabbitmq", events_publisher)
+    return events_publisher
+
+
+@pytest.fixture
+def raw_publisher(monkeypatch):
+    messages_publisher = RawPublisher()
+    monkeypatch.setattr(notification, "send_raw_to_rabbitmq", messages_publisher)
+    return messages_publisher
+
+
+@pytest.mark.asyncio
+async def test_retry_of_accepted_event_is_replayed(store, publisher):
+    request = make_request({"Idempotency-Key": "done"})
+    await NotificationService().send_event({}, request, SERVICE_NAME)
+
+    response = await NotificationService().send_event({}, request, SERVICE_NAME)
+
+    assert response.headers["Idempotent-Replayed"] == "true"
+    assert len(publisher.events) == 1
+
+
+@pytest.mark.asyncio
+async def test_retry_of_pending_event_is_conflict(store, publisher):
+    await store.claim(f"{SERVICE_NAME}:key:pending")
+
+    error = await send_error({}, make_request({"Idempotency-Key": "pending"}))
+
+    assert error.status_code == HTTPStatus.CONFLICT
+    assert int(error.headers["Retry-After"]) > 0
+    assert not publisher.events
+
+
+@pytest.mark.asyncio
+async def test_events_without_key_are_not_deduplicated(store, publisher):
+    request = make_request({})
+
+    await NotificationService().send_event({}, request, SERVICE_NAME)
+    await NotificationService().send_event({}, request, SERVICE_NAME)
+
+    assert len(publisher.events) == 2
+
+
+@pytest.mark.asyncio
+async def test_raw_event_is_forwarded_as_is(store, raw_publisher):
+    request = make_request({"X-Request-Id": "request"}, (RAW_EVENT,))
+
+    await NotificationService().send_raw_event(request, SERVICE_NAME)
+
+    assert raw_publisher.messages == [
+        (
+            RAW_EVENT,
+            {
+                "x-event-type": "new_user",
+                "x-service-name": SERVICE_NAME,
+                "x-request-id": "request",
+            },
+        )
+    ]
+
+
+@pytest.mark.asyncio
+async def test_raw_event_must_be_object(store, raw_publisher):
+    error = await send_raw_error(make_request({}, (b'["new_user"]',)))
+
+    assert error.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert not raw_publisher.messages
+
+
+@pytest.mark.asyncio
+async def test_raw_event_of_unknown_type(store, raw_publisher):
+    error = await send_raw_error(make_request({}, (b'{"type": "unknown"}',)))
+
+    assert error.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert not raw_publisher.messages
+
+
+@pytest.mark.asyncio
+async def test_raw_event_declared_too_large(store, raw_publisher):
+    headers = {"Content-Length": str(settings.raw_event_max_size + 1)}
+
+    error = await send_raw_error(make_request(headers, (RAW_EVENT,)))
+
+    assert error.status_code == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+
+
+@pytest.mark.asyncio
+async def test_chunked_raw_event_too_large(store, raw_publisher):
+    # two chunks pass the size limit only together
+    chunk = b" " * (settings.raw_event_max_size // 2 + 1)
+
+    error = await send_raw_error(make_request({}, (RAW_EVENT, chunk, chunk)))
+
+    assert error.status_code == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+    assert not raw_publisher.messages
+
+
+@pytest.mark.asyncio
+async def test_batch_reports_each_event(store, publisher):
+    items = [make_event("first"), {"type": "new_user"}, make_event("third")]
+
+    batch = await NotificationService().send_events_batch(
+        items, make_request({}), SERVICE_NAME
+    )
+
+    assert [item.accepted for item in batch.items] == [True, False, True]
+    assert "event_date" in batch.items[1].error
+    assert (batch.accepted, batch.rejected) == (2, 1)
+    assert [event["id"] for event in publisher.events] == ["first", "third"]
+
+
+@pytest.mark.asyncio
+async def test_batch_with_failed_publish(store, publisher):
+    publisher.failing.add("failed")
+    items = [make_event("published"), make_event("failed")]
+    request = make_request({"Idempotency-Key": "batch"})
+
+    batch = await NotificationService().send_events_batch(
+        items, request, SERVICE_NAME
+    )
+
+    assert [item.accepted for item in batch.items] == [True, False]
+    assert batch.items[1].error == "Failed to publish event"
+    # the failed event is released for the retry of the batch
+    assert await store.claim(f"{SERVICE_NAME}:key:batch:1") == ClaimResult.CLAIMED
+
+
+@pytest.mark.asyncio
+async def test_batch_retry_skips_published_events(store, publisher):
+    items = [make_event("published")]
+    request = make_request({"Idempotency-Key": "retried"})
+    await NotificationService().send_events_batch(items, request, SERVICE_NAME)
+
+    batch = await NotificationService().send_events_batch(
+        items, request, SERVICE_NAME
+    )
+
+    assert batch.items[0].duplicate
+    assert len(publisher.events) == 1
@@ -0,0 +1,170 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from src.core.constants import ChannelEnum, NotificationStatusEnum
+from src.event_worker.settings import OutboxRelaySettings
+from src.models.notification import NotificationQueue
+from src.services import outbox
+from src.services.outbox import CHANGE_STREAM_UNSUPPORTED, OutboxRelay
+
+POLL_INTERVAL = 0.5
+MAX_BACKOFF = 3
+# the event worker leases the notification to the relay for a while
+RELAY_LEASE_SECONDS = 30
+
+
+class Publisher:
+    def __init__(self, failing: set[str] = frozenset()) -> None:
+        self.failing = failing
+        self.published: list[NotificationQueue] = []
+
+    async def __call__(self, notification: NotificationQueue) -> None:
+        if notification.notification_id in self.failing:
+            raise ConnectionError("broker is down")
+        self.published.append(notification)
+
+
+class Sleeps:
+    """
+    Records pauses of the relay and stops it after a few of them
+    """
+
+    def __init__(self, relay: OutboxRelay, limit: int) -> None:
+        self.relay = relay
+        self.limit = limit
+        self.delays: list[float] = []
+
+    async def __call__(self, delay: float) -> None:
+        self.delays.append(delay)
+        if len(self.delays) >= self.limit:
+            self.relay.stop()
+
+
+def make_relay(mongo_db, publisher: Publisher) -> OutboxRelay:
+    return OutboxRelay(
+        mongo_db,
+        publisher=publisher,
+        options=OutboxRelaySettings(
+            batch_size=10,
+            batch_interval=0.1,
+            poll_interval=POLL_INTERVAL,
+            max_backoff=MAX_BACKOFF,
+        ),
+    )
+
+
+def leased_until() -> datetime:
+    return datetime.now(tz=timezone.utc) + timedelta(seconds=RELAY_LEASE_SECONDS)
+
+
+def notification(**fields) -> dict:
+    return {
+        "_id": ObjectId(),
+        "message": "message",
+        "channel": ChannelEnum.EMAIL,
+        "data": {"email": "user@example.com", "subject": "subject"},
+        "status": NotificationStatusEnum.UNSENT,
+        "send_date": None,
+        "relayed_at": None,
+        "next_attempt_at": leased_until(),
+        **fields,
+    }
+
+
+def published_ids(publisher: Publisher) -> list[str]:
+    return [item.notification_id for item in publisher.published]
+
+
+def without_change_streams(pipeline, **options):
+    raise OperationFailure("not a replica set", code=min(CHANGE_STREAM_UNSUPPORTED))
+
+
+@pytest.mark.asyncio
+async def test_relay_publishes_and_leases_notifications(mongo_db):
+    publisher = Publisher()
+    relay = make_relay(mongo_db, publisher)
+    documents = [notification(), notification(personalized=False, retry_count=2)]
+    await relay.notifications.insert_many(documents)
+
+    assert not await relay.relay(documents)
+
+    assert published_ids(publisher) == [str(document["_id"]) for document in documents]
+    assert not publisher.published[1].personalized
+    assert publisher.published[1].retry_count == 2
+    async for stored in relay.notifications.find():
+        assert stored["next_attempt_at"] - stored["relayed_at"] == relay.lease
+
+
+@pytest.mark.asyncio
+async def test_relay_skips_no_longer_pending(mongo_db):
+    publisher = Publisher()
+    relay = make_relay(mongo_db, publisher)
+    now = datetime.now(tz=timezone.utc)
+    pending = notification()
+    documents = [
+        pending,
+        notification(relayed_at=now),
+        notification(status=NotificationStatusEnum.CANCELLED),
+        # the lease ran out, the scheduler publishes it
+        notification(next_attempt_at=now - timedelta(seconds=1)),
+    ]
+    await relay.notifications.insert_many(documents)
+
+    await relay.relay(documents)
+    await relay.relay(documents)
+
+    assert published_ids(publisher) == [str(pending["_id"])]
+
+
+@pytest.mark.asyncio
+async def test_failed_notifications_stay_unrelayed(mongo_db):
+    failed = notification()
+    publisher = Publisher(failing={str(failed["_id"])})
+    relay = make_relay(mongo_db, publisher)
+    relayed = notification()
+    await relay.notifications.insert_many([failed, relayed])
+
+    assert await relay.relay([failed, relayed]) == 1
+
+    stored = await relay.notifications.find_one({"_id": failed["_id"]})
+    assert stored["relayed_at"] is None
+    stored = await relay.notifications.find_one({"_id": relayed["_id"]})
+    assert stored["relayed_at"] is not None
+
+
+@pytest.mark.asyncio
+async def test_state_is_saved(mongo_db):
+    relay = make_relay(mongo_db, Publisher())
+    last_id = ObjectId()
+
+    await relay.save_state({"last_id": last_id})
+    await relay.save_state({"last_id": last_id})
+
+    states = await relay.state.find().to_list(length=None)
+    assert states == [{"_id": "notifications", "last_id": last_id}]
+
+
+def test_backoff_doubles_up_to_the_limit(mongo_db):
+    relay = make_relay(mongo_db, Publisher())
+    delays = [relay.next_backoff(0)]
+    while len(delays) < 5:
+        delays.append(relay.next_backoff(delays[-1]))
+
+    assert delays == [POLL_INTERVAL, 1, 2, MAX_BACKOFF, MAX_BACKOFF]
+
+
+@pytest.mark.asyncio
+async def test_polling_backs_off_while_publishing_fails(mongo_db, monkeypatch):
+    failed = notification()
+    relay = make_relay(mongo_db, Publisher(failing={str(failed["_id"])}))
+    await relay.notifications.insert_one(failed)
+    sleeps = Sleeps(relay, limit=3)
+    monkeypatch.setattr(outbox.asyncio, "sleep", sleeps)
+    monkeypatch.setattr(relay.notifications, "watch", without_change_streams)
+
+    await relay.run()
+
+    assert sleeps.delays == [POLL_INTERVAL, 1, 2]
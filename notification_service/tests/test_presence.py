@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+
+from src.services.presence import PresenceService
+
+TTL = timedelta(minutes=1)
+
+
+def presence(user_id: str, node: str, expires_in: timedelta) -> dict:
+    return {
+        "_id": f"{node}:{user_id}",
+        "user_id": user_id,
+        "node": node,
+        "expires_at": datetime.now(tz=timezone.utc) + expires_in,
+    }
+
+
+@pytest.fixture
+def service(mongo_db):
+    presence_service = PresenceService(mongo_db, "presence")
+    # a few users take several chunks
+    presence_service.chunk_size = 2
+    return presence_service
+
+
+@pytest.mark.asyncio
+async def test_online_users_are_read_in_chunks(service):
+    user_ids = [uuid4() for _ in range(5)]
+    # online users in different chunks
+    online_ids = {str(user_id) for user_id in user_ids[::3]}
+    await service.presence.insert_many(
+        [presence(user_id, "node-1", TTL) for user_id in online_ids]
+    )
+
+    assert await service.online_users(user_ids) == online_ids
+
+
+@pytest.mark.asyncio
+async def test_expired_presence_is_offline(service):
+    await service.presence.insert_many(
+        [
+            presence("expired", "node-1", -TTL),
+            presence("reconnected", "node-1", -TTL),
+            presence("reconnected", "node-2", TTL),
+        ]
+    )
+
+    online = await service.online_users(["expired", "reconnected", "unknown"])
+
+    assert online == {"reconnected"}
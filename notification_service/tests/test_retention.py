@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from src.core.constants import ChannelEnum, NotificationStatusEnum
+from src.services.retention import (
+    RetentionService,
+    notification_policy,
+    read_archive,
+)
+
+NOW = datetime.fromisoformat("2024-05-10T12:00:00+00:00")
+
+
+@pytest.fixture
+def retention(mongo_db, tmp_path):
+    return RetentionService(mongo_db, tmp_path, batch_size=2)
+
+
+@pytest.fixture
+def policy():
+    return notification_policy(
+        "notifications", archive_after=timedelta(days=7), ttl=None
+    )
+
+
+def notification(updated_at: datetime, **fields) -> dict:
+    return {
+        "_id": ObjectId(),
+        "channel": ChannelEnum.EMAIL,
+        "status": NotificationStatusEnum.SUCCESS,
+        "updated_at": updated_at,
+        "read_at": None,
+        **fields,
+    }
+
+
+@pytest.mark.asyncio
+async def test_archive_exports_and_deletes_old_days(retention, policy):
+    first_day = NOW - timedelta(days=10)
+    archived = [
+        notification(first_day),
+        notification(first_day + timedelta(hours=1)),
+        notification(first_day + timedelta(hours=2)),
+        notification(first_day + timedelta(days=1)),
+    ]
+    kept = [
+        notification(NOW - timedelta(days=1)),
+        notification(first_day, status=NotificationStatusEnum.UNSENT),
+        # unread notifications stay in the inbox
+        notification(first_day, channel=ChannelEnum.WEBSOCKET),
+    ]
+    collection = retention.mongo[policy.collection]
+    await collection.insert_many(archived + kept)
+
+    result = await retention.archive(policy, now=NOW)
+
+    assert result == {"2024-04-30": 3, "2024-05-01": 1}
+    remaining = await collection.find().to_list(length=None)
+    assert {document["_id"] for document in remaining} == {
+        document["_id"] for document in kept
+    }
+    paths = sorted(retention.archive_dir.rglob("*.ndjson.gz"))
+    assert [path.name.startswith("notifications-2024-04-30") for path in paths] == [
+        True,
+        False,
+    ]
+    assert not list(retention.archive_dir.rglob("*.tmp"))
+
+
+@pytest.mark.asyncio
+async def test_archive_without_old_documents(retention, policy):
+    collection = retention.mongo[policy.collection]
+    await collection.insert_one(notification(NOW))
+
+    assert not await retention.archive(policy, now=NOW)
+    assert await collection.count_documents({}) == 1
+
+
+@pytest.mark.asyncio
+async def test_restore_skips_present_documents(retention, policy):
+    documents = [
+        notification(NOW - timedelta(days=10), data={"count": 1})
+        for _ in range(3)
+    ]
+    collection = retention.mongo[policy.collection]
+    await collection.insert_many(documents)
+    await retention.archive(policy, now=NOW)
+    path = next(retention.archive_dir.rglob("*.ndjson.gz"))
+    await collection.insert_one(documents[0])
+
+    restored = await retention.restore(policy.collection, path)
+
+    assert restored == 2
+    assert await collection.count_documents({}) == 3
+    archived = list(read_archive(path))
+    assert [document["_id"] for document in archived] == [
+        document["_id"] for document in documents
+    ]
+    assert isinstance(archived[0]["_id"], ObjectId)
+    assert archived[0]["updated_at"] == documents[0]["updated_at"].replace(
+        tzinfo=None
+    )
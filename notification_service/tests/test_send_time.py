@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.event_worker.settings import ReleaseSettings
+from src.services.send_time import SendTimeShaper
+
+SPREAD_MINUTES = 30
+MINUTE_CAPACITY = 2
+MAX_SHIFT_MINUTES = 3
+
+
+def shifted(release_date: datetime, minutes: int) -> datetime:
+    return release_date + timedelta(minutes=minutes)
+
+
+@pytest.fixture
+def shaper(mongo_db):
+    return SendTimeShaper(
+        mongo_db,
+        "release_slots",
+        ReleaseSettings(
+            spread_minutes=SPREAD_MINUTES,
+            minute_capacity=MINUTE_CAPACITY,
+            max_shift_minutes=MAX_SHIFT_MINUTES,
+        ),
+    )
+
+
+def test_jitter_is_stable_and_inside_the_window(shaper):
+    jitter = shaper.jitter("user")
+
+    assert jitter == shaper.jitter("user")
+    assert timedelta() <= jitter < timedelta(minutes=SPREAD_MINUTES)
+
+
+@pytest.mark.asyncio
+async def test_full_minutes_move_notifications_later(mongo_db, shaper):
+    now = datetime.now(tz=timezone.utc).replace(microsecond=0)
+    release_date = now + timedelta(hours=1)
+    reservations = MINUTE_CAPACITY * MAX_SHIFT_MINUTES + 1
+
+    dates = [
+        await shaper.reserve(release_date, "Europe/Moscow")
+        for _ in range(reservations)
+    ]
+
+    assert dates == [
+        release_date,
+        release_date,
+        shifted(release_date, 1),
+        shifted(release_date, 1),
+        shifted(release_date, 2),
+        shifted(release_date, 2),
+        # overbooked after max_shift_minutes
+        shifted(release_date, MAX_SHIFT_MINUTES),
+    ]
+    curve = await shaper.release_curve()
+    counts = [count for _, count in curve["Europe/Moscow"]]
+    assert counts == [2, 2, 2, 1]
+
+
+@pytest.mark.asyncio
+async def test_past_full_minutes_are_forgotten(shaper):
+    past = datetime.now(tz=timezone.utc).replace(second=0, microsecond=0)
+    full_minute = past + timedelta(hours=1)
+    shaper.full_minutes = {past - timedelta(minutes=5), full_minute}
+
+    await shaper.reserve(past + timedelta(hours=2), "UTC")
+
+    assert shaper.full_minutes == {full_minute}
@@ -0,0 +1,234 @@
+import asyncio
+import os
+
+import pytest
+
+from src.core.config import SpoolSettings
+from src.core.constants import FsyncPolicy
+from src.db.spool import (
+    CORRUPT_SUFFIX,
+    RECORD_HEADER,
+    Spool,
+    SpoolFull,
+    SpoolRecord,
+    read_segment,
+)
+
+SEGMENT_NAME = "000000000001.seg"
+CONTENT_TYPE = "application/json"
+# a few records fill a segment
+SMALL_SIZE = 64
+SPOOLED_EVENTS = 5
+
+
+class Broker:
+    def __init__(self) -> None:
+        self.available = True
+        self.published: list[bytes] = []
+
+    async def publish(
+        self, routing_key: str, body: bytes, content_type: str, headers: dict | None
+    ) -> None:
+        if not self.available:
+            raise ConnectionError("broker is down")
+        self.published.append(body)
+
+    async def reconnect(self) -> None:
+        """
+        The broker is reachable as soon as it is available
+        """
+
+
+def make_spool(root, broker: Broker, **options) -> Spool:
+    spool_options = {
+        "dir": root,
+        "segment_size": 1024,
+        "max_size": 1024 * 1024,
+        "fsync": FsyncPolicy.NEVER,
+        "fsync_interval": 0.1,
+        "publish_timeout": 1,
+        "drain_interval": 1,
+        "drain_batch": 2,
+    }
+    spool_options.update(options)
+    return Spool(broker.publish, broker.reconnect, SpoolSettings(**spool_options))
+
+
+def make_record(body: bytes) -> SpoolRecord:
+    return SpoolRecord("events", CONTENT_TYPE, {"n": 1}, body)
+
+
+def write_records(path, bodies: list[bytes]) -> bytes:
+    data = b"".join(make_record(body).encode() for body in bodies)
+    path.write_bytes(data)
+    return data
+
+
+def read_bodies(segment, offset: int = 0) -> list[bytes]:
+    return [record.body for _, record in read_segment(segment, offset)]
+
+
+def corrupt(data: bytes) -> bytes:
+    corrupted = bytearray(data)
+    corrupted[len(corrupted) // 2] ^= 1
+    return bytes(corrupted)
+
+
+def test_read_segment(tmp_path):
+    segment = tmp_path / SEGMENT_NAME
+    write_records(segment, [b"first", b"second"])
+
+    records = list(read_segment(segment, 0))
+
+    first_end, first_record = records[0]
+    assert first_record.routing_key == "events"
+    assert first_record.headers == {"n": 1}
+    assert records[-1][0] == segment.stat().st_size
+    assert read_bodies(segment, first_end) == [b"second"]
+
+
+def test_read_segment_stops_at_torn_record(tmp_path):
+    segment = tmp_path / SEGMENT_NAME
+    data = write_records(segment, [b"first", b"second"])
+    segment.write_bytes(data[:-3])
+
+    assert read_bodies(segment) == [b"first"]
+
+
+def test_read_segment_stops_at_torn_header(tmp_path):
+    segment = tmp_path / SEGMENT_NAME
+    data = write_records(segment, [b"first"])
+    segment.write_bytes(data + data[: RECORD_HEADER.size - 1])
+
+    assert read_bodies(segment) == [b"first"]
+
+
+def test_read_segment_stops_at_corrupted_record(tmp_path):
+    segment = tmp_path / SEGMENT_NAME
+    data = write_records(segment, [b"first", b"second", b"third"])
+    segment.write_bytes(corrupt(data))
+
+    assert read_bodies(segment) == [b"first"]
+
+
+def test_read_empty_segment(tmp_path):
+    segment = tmp_path / SEGMENT_NAME
+    segment.write_bytes(b"")
+
+    assert not read_bodies(segment)
+
+
+@pytest.mark.asyncio
+async def test_failed_publish_spools_events(tmp_path):
+    broker = Broker()
+    spool = make_spool(tmp_path, broker, segment_size=SMALL_SIZE)
+    spool.open()
+    try:
+        await spool.publish("events", b"0", CONTENT_TYPE)
+        broker.available = False
+        await spool.publish("events", b"1", CONTENT_TYPE)
+    finally:
+        await spool.close()
+
+    assert spool.degraded
+    assert spool.size > 0
+    assert broker.published == [b"0"]
+
+
+@pytest.mark.asyncio
+async def test_drain_replays_events_in_order(tmp_path):
+    broker = Broker()
+    broker.available = False
+    spool = make_spool(tmp_path, broker, segment_size=SMALL_SIZE)
+    spool.open()
+    bodies = [str(number).encode() for number in range(SPOOLED_EVENTS)]
+    try:
+        for body in bodies:
+            await spool.publish("events", body, CONTENT_TYPE)
+        broker.available = True
+        await spool.drain()
+    finally:
+        await spool.close()
+
+    assert not spool.degraded
+    assert spool.size == 0
+    assert broker.published == bodies
+
+
+@pytest.mark.asyncio
+async def test_reopened_spool_drains_left_events(tmp_path):
+    broker = Broker()
+    broker.available = False
+    spool = make_spool(tmp_path, broker)
+    spool.open()
+    await spool.publish("events", b"left", CONTENT_TYPE)
+    await spool.close()
+
+    broker.available = True
+    spool = make_spool(tmp_path, broker)
+    spool.open()
+    try:
+        assert spool.degraded
+        await spool.drain()
+    finally:
+        await spool.close()
+
+    assert broker.published == [b"left"]
+
+
+@pytest.mark.asyncio
+async def test_corrupted_segment_is_kept(tmp_path):
+    orphan = tmp_path / "1"
+    orphan.mkdir()
+    data = write_records(orphan / SEGMENT_NAME, [b"first", b"second", b"third"])
+    (orphan / SEGMENT_NAME).write_bytes(corrupt(data))
+    broker = Broker()
+    spool = make_spool(tmp_path, broker)
+    spool.open()
+    try:
+        await spool.drain()
+    finally:
+        await spool.close()
+
+    kept = tmp_path / f"1-000000000001{CORRUPT_SUFFIX}"
+    assert broker.published == [b"first"]
+    assert kept.read_bytes() == corrupt(data)
+    assert spool.size == 0
+
+
+@pytest.mark.asyncio
+async def test_spool_size_limit(tmp_path):
+    broker = Broker()
+    spool = make_spool(tmp_path, broker, max_size=SMALL_SIZE)
+    spool.open()
+    try:
+        with pytest.raises(SpoolFull):
+            await spool.append(make_record(b"x" * SMALL_SIZE))
+    finally:
+        await spool.close()
+
+
+@pytest.mark.asyncio
+async def test_fsync_loop_survives_fsync_error(tmp_path, monkeypatch):
+    broker = Broker()
+    spool = make_spool(tmp_path, broker, fsync=FsyncPolicy.INTERVAL)
+    spool.open()
+    spool.start()
+    synced = asyncio.Event()
+    calls = []
+
+    def fsync(fd: int) -> None:
+        calls.append(fd)
+        if len(calls) == 1:
+            raise OSError("fsync failed")
+        synced.set()
+
+    monkeypatch.setattr(os, "fsync", fsync)
+    try:
+        await spool.append(make_record(b"x"))
+        await asyncio.wait_for(synced.wait(), 1)
+    finally:
+        monkeypatch.undo()
+        await spool.close()
+
+    assert len(calls) == 2
@@ -0,0 +1,119 @@
+import time
+from http import HTTPStatus
+
+import pytest
+from fastapi import HTTPException
+
+from src.utils import jwt_and_services
+from src.utils.token_cache import VerifiedTokenCache
+
+TOKEN = "header.payload.signature"
+LEEWAY = 30
+TOKEN_LIFETIME = 60
+REVOKED_USER = "revoked"
+
+
+class Decoder:
+    """
+    Counts signature verifications instead of checking RS256 signatures
+    """
+
+    def __init__(self, payload: dict) -> None:
+        self.payload = payload
+        self.calls = 0
+
+    def __call__(self, token: str) -> dict:
+        self.calls += 1
+        return dict(self.payload)
+
+
+def make_payload(expires_in: int = TOKEN_LIFETIME, user_id: str = "user") -> dict:
+    return {"exp": int(time.time()) + expires_in, "user_id": user_id}
+
+
+def is_revoked_user(payload: dict) -> bool:
+    return payload["user_id"] == REVOKED_USER
+
+
+async def validation_error(token: str) -> HTTPException:
+    try:
+        await jwt_and_services.validate_token(token)
+    except HTTPException as error:
+        return error
+    raise AssertionError("The token was accepted")
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    token_cache = VerifiedTokenCache(max_size=2, leeway=LEEWAY)
+    token_cache.add_revocation_hook(is_revoked_user)
+    monkeypatch.setattr(jwt_and_services, "token_cache", token_cache)
+    return token_cache
+
+
+@pytest.fixture
+def decoder(monkeypatch):
+    token_decoder = Decoder(make_payload())
+    monkeypatch.setattr(jwt_and_services, "decode_token", token_decoder)
+    return token_decoder
+
+
+def test_cache_miss(cache):
+    assert cache.get(TOKEN) is None
+
+
+def test_cache_hit(cache):
+    payload = make_payload()
+
+    cache.put(TOKEN, payload)
+
+    assert cache.get(TOKEN) == payload
+
+
+def test_expired_token_is_dropped(cache):
+    # still accepted within the leeway
+    cache.put("fresh", make_payload(expires_in=-LEEWAY // 2))
+    cache.put("expired", make_payload(expires_in=-LEEWAY * 2))
+
+    assert cache.get("fresh") is not None
+    assert cache.get("expired") is None
+
+
+def test_revoked_token_is_dropped(cache):
+    cache.put(TOKEN, make_payload(user_id=REVOKED_USER))
+
+    assert cache.get(TOKEN) is None
+
+
+def test_token_without_expiration_is_not_cached(cache):
+    cache.put(TOKEN, {"user_id": "user"})
+
+    assert cache.get(TOKEN) is None
+
+
+def test_cache_keeps_latest_tokens(cache):
+    for token in ("first", "second", "third"):
+        cache.put(token, make_payload())
+
+    assert cache.get("first") is None
+    assert cache.get("third") is not None
+
+
+@pytest.mark.asyncio
+async def test_token_is_verified_once(cache, decoder):
+    await jwt_and_services.validate_token(TOKEN)
+
+    payload = await jwt_and_services.validate_token(TOKEN)
+
+    assert payload == decoder.payload
+    assert decoder.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_revoked_token_is_rejected_on_cache_miss(cache, decoder):
+    decoder.payload = make_payload(user_id=REVOKED_USER)
+
+    error = await validation_error(TOKEN)
+
+    assert error.status_code == HTTPStatus.UNAUTHORIZED
+    assert cache.get(TOKEN) is None
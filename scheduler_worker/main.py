@@ -1,18 +1,20 @@
 import asyncio
+from datetime import timedelta
 
 import src.database.mongo as mongo
 from settings import scheduler_settings
 from src.database import rabbitmq
 from src.database.mongo import get_mongo_db
+from src.services.backpressure import QueueBackpressure
 from src.services.send_notification_to_queue import SendNotificationService
 from src.services.check_notification import CheckNotificationService
 
-TIME_TO_SLEEP = 10
-
 
 async def main() -> None:
     """
     A worker who picks up notifications ready to be sent and puts them in a queue.
+    The dispatch rate follows the queue depth, so a slow sender
+    makes notifications wait in Mongo and not in the broker.
     """
 
     mongo.mongo = mongo.init_mongo(
@@ -23,6 +25,15 @@ async def main() -> None:
         mongo_db,
         notification_collection=scheduler_settings.mongo.notification_collection,
     )
+    await check_notification.ensure_indexes()
+    backpressure = QueueBackpressure(
+        scheduler_settings.rabbitmq_queue_notifications,
+        target_backlog=scheduler_settings.dispatch_target_backlog,
+        batch_max=scheduler_settings.dispatch_batch_max,
+        interval_min=scheduler_settings.dispatch_interval_min,
+        interval_max=scheduler_settings.dispatch_interval_max,
+    )
+    lease = timedelta(seconds=scheduler_settings.dispatch_lease_seconds)
 
     rabbitmq.connection = await rabbitmq.create_connection()
     async with rabbitmq.connection:
@@ -33,11 +44,24 @@ async def main() -> None:
         send_notification = SendNotificationService()
 
         while True:
-            notifications = await check_notification.check_notification()
-            await send_notification.send_notification_to_queue(
-                notifications, rabbitmq.channel
-            )
-            await asyncio.sleep(TIME_TO_SLEEP)
+            stats = await backpressure.sample(rabbitmq.channel)
+            batch_size = backpressure.batch_size(stats)
+            dispatched = 0
+            if batch_size:
+                cursor = await check_notification.check_notification(limit=batch_size)
+                notifications = await cursor.to_list(length=None)
+                notification_ids = [document["_id"] for document in notifications]
+
+                await check_notification.lease(notification_ids, lease)
+                failed = await send_notification.send_notification_to_queue(
+                    notifications, rabbitmq.channel
+                )
+                await check_notification.release(failed)
+
+                dispatched = len(notifications) - len(failed)
+                backpressure.record_published(dispatched)
+
+            await asyncio.sleep(backpressure.interval(stats, dispatched, batch_size))
 
 
 if __name__ == "__main__":
@@ -3,6 +3,8 @@ from pathlib import Path
 from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from src.core.codec import PayloadStrategy
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
@@ -13,6 +15,13 @@ class MongoDBSettings(BaseModel):
     notification_collection: str = "notifications"
 
 
+class PayloadSettings(BaseModel):
+    strategy: PayloadStrategy = PayloadStrategy.INLINE
+    # bodies smaller than this are not worth compressing
+    compress_threshold: int = 4096
+    compression_level: int = 3
+
+
 class Settings(BaseSettings):
     """
     Service settings
@@ -26,6 +35,17 @@ class Settings(BaseSettings):
     rabbitmq_delivery_mode: int
     rabbitmq_host: str
     rabbitmq_port: int
+    # json or msgpack, consumers accept both
+    rabbitmq_codec: str = "json"
+    # how notification messages carry the rendered text
+    payload: PayloadSettings = PayloadSettings()
+
+    # Backpressure: notifications wait in Mongo while the queue is deep
+    dispatch_target_backlog: int = 1000
+    dispatch_batch_max: int = 5000
+    dispatch_interval_min: float = 1
+    dispatch_interval_max: float = 10
+    dispatch_lease_seconds: int = 300
 
     model_config = SettingsConfigDict(
         extra="ignore",
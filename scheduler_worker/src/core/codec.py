@@ -0,0 +1,151 @@
+from abc import ABC, abstractmethod
+from collections.abc import Mapping
+from datetime import date, datetime
+from enum import StrEnum
+from functools import cache
+from typing import Any, TypeVar
+
+import msgpack
+import orjson
+import zstandard
+from pydantic import BaseModel
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# bumped on incompatible changes of message bodies
+ENVELOPE_VERSION = 1
+ENVELOPE_VERSION_HEADER = "x-envelope-version"
+ZSTD_ENCODING = "zstd"
+
+
+class PayloadStrategy(StrEnum):
+    """
+    How notification messages carry the rendered text
+    """
+
+    INLINE = "inline"
+    # zstd above a size threshold, marked by the content encoding
+    COMPRESS = "compress"
+    # only the notification id, the sender loads the text from Mongo
+    CLAIM_CHECK = "claim_check"
+
+
+class UnsupportedMessage(Exception):
+    """
+    Message content type or envelope version is not supported
+    """
+
+
+def _default(value: Any) -> Any:
+    """
+    Types unknown to the serializer, e.g. ObjectId, are sent as strings
+    """
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+class Codec(ABC):
+    """
+    Serialization of RabbitMQ message bodies
+    """
+
+    name: str
+    content_type: str
+
+    @abstractmethod
+    def encode(self, data: Any) -> bytes:
+        """
+        Serializes plain data or a model
+        """
+
+    @abstractmethod
+    def decode(self, body: bytes) -> Any:
+        """
+        Deserializes a message body
+        """
+
+    def validate(self, model: type[ModelT], body: bytes) -> ModelT:
+        return model.model_validate(self.decode(body))
+
+
+class JSONCodec(Codec):
+    name = "json"
+    content_type = "application/json"
+
+    def encode(self, data: Any) -> bytes:
+        if isinstance(data, BaseModel):
+            return data.model_dump_json().encode()
+        return orjson.dumps(data, default=_default)
+
+    def decode(self, body: bytes) -> Any:
+        return orjson.loads(body)
+
+    def validate(self, model: type[ModelT], body: bytes) -> ModelT:
+        # parsed and validated in one pass, no intermediate dict
+        return model.model_validate_json(body)
+
+
+class MsgpackCodec(Codec):
+    name = "msgpack"
+    content_type = "application/msgpack"
+
+    def encode(self, data: Any) -> bytes:
+        if isinstance(data, BaseModel):
+            data = data.model_dump()
+        return msgpack.packb(data, default=_default)
+
+    def decode(self, body: bytes) -> Any:
+        return msgpack.unpackb(body)
+
+
+CODECS: dict[str, Codec] = {
+    codec.content_type: codec for codec in (JSONCodec(), MsgpackCodec())
+}
+
+
+def get_codec(name: str) -> Codec:
+    """
+    Codec by its name in settings
+    """
+    for codec in CODECS.values():
+        if codec.name == name:
+            return codec
+    raise ValueError(f"Unknown codec {name}")
+
+
+def envelope_headers(headers: Mapping[str, Any] | None = None) -> dict[str, Any]:
+    return {ENVELOPE_VERSION_HEADER: ENVELOPE_VERSION, **(headers or {})}
+
+
+def codec_for_message(
+    content_type: str | None, headers: Mapping[str, Any] | None
+) -> Codec:
+    """
+    Codec of an incoming message. Messages without a content type
+    come from producers that predate codecs and are JSON
+    """
+    version = (headers or {}).get(ENVELOPE_VERSION_HEADER, ENVELOPE_VERSION)
+    if not isinstance(version, int) or version > ENVELOPE_VERSION:
+        raise UnsupportedMessage(f"Unsupported envelope version {version}")
+    if not content_type:
+        return CODECS[JSONCodec.content_type]
+    try:
+        return CODECS[content_type]
+    except KeyError:
+        raise UnsupportedMessage(f"Unsupported content type {content_type}")
+
+
+@cache
+def _compressor(level: int) -> zstandard.ZstdCompressor:
+    return zstandard.ZstdCompressor(level=level)
+
+
+def compress(body: bytes, threshold: int, level: int) -> tuple[bytes, str | None]:
+    """
+    Compresses bodies of at least threshold bytes,
+    returns the body and its content encoding
+    """
+    if len(body) < threshold:
+        return body, None
+    return _compressor(level).compress(body), ZSTD_ENCODING
@@ -8,9 +8,27 @@ class ChannelEnum(StrEnum):
     WEBSOCKET = "websocket"
 
 
+class TemplateRef(BaseModel):
+    name: str
+    version: str
+
+
 class NotificationQueue(BaseModel):
-    message: str
+    # None for notifications rendered by the sender
+    message: str | None = None
     channel: ChannelEnum
     data: dict
 
     notification_id: str
+    retry_count: int = 0
+    personalized: bool = True
+
+    template: TemplateRef | None = None
+    context: dict | None = None
+    shared_context_id: str | None = None
+
+
+class QueueStats(BaseModel):
+    message_count: int
+    consumer_count: int
+    drain_rate: float
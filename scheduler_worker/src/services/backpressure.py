@@ -0,0 +1,83 @@
+import time
+
+import aio_pika
+
+from src.core.logger import scheduler_logger
+from src.models import QueueStats
+
+# Weight of the newest drain rate sample
+DRAIN_RATE_SMOOTHING = 0.3
+
+
+class QueueBackpressure:
+    """Adapts the dispatch batch size and interval to the depth of the queue,
+    so that the backlog stays around the target and the rest waits in Mongo."""
+
+    def __init__(
+        self,
+        queue_name: str,
+        target_backlog: int,
+        batch_max: int,
+        interval_min: float,
+        interval_max: float,
+    ) -> None:
+        self.queue_name = queue_name
+        self.target_backlog = target_backlog
+        self.batch_max = batch_max
+        self.interval_min = interval_min
+        self.interval_max = interval_max
+
+        self.drain_rate = 0.0
+        self._last_depth: int | None = None
+        self._last_sample_at = 0.0
+        self._published_since_sample = 0
+
+    async def sample(self, channel: aio_pika.abc.AbstractRobustChannel) -> QueueStats:
+        """Reads the queue depth with a passive declare and updates
+        the estimated consumer drain rate (messages per second)."""
+
+        queue = await channel.declare_queue(self.queue_name, passive=True, robust=False)
+        depth = queue.declaration_result.message_count
+        consumer_count = queue.declaration_result.consumer_count
+        now = time.monotonic()
+
+        if self._last_depth is not None and now > self._last_sample_at:
+            drained = self._last_depth + self._published_since_sample - depth
+            rate = max(drained, 0) / (now - self._last_sample_at)
+            self.drain_rate = (
+                DRAIN_RATE_SMOOTHING * rate
+                + (1 - DRAIN_RATE_SMOOTHING) * self.drain_rate
+            )
+
+        self._last_depth = depth
+        self._last_sample_at = now
+        self._published_since_sample = 0
+
+        stats = QueueStats(
+            message_count=depth,
+            consumer_count=consumer_count,
+            drain_rate=self.drain_rate,
+        )
+        scheduler_logger.debug(f"Notification queue stats {stats}")
+        return stats
+
+    def record_published(self, count: int) -> None:
+        self._published_since_sample += count
+
+    def batch_size(self, stats: QueueStats) -> int:
+        """How many notifications can be dispatched without exceeding the target"""
+
+        return max(0, min(self.batch_max, self.target_backlog - stats.message_count))
+
+    def interval(self, stats: QueueStats, dispatched: int, batch_size: int) -> float:
+        """Time to sleep before the next dispatch: until the backlog drains to half
+        of the target, or the maximum interval when nothing else is due."""
+
+        if batch_size and dispatched < batch_size:
+            return self.interval_max
+        if self.drain_rate <= 0:
+            return self.interval_max
+
+        backlog = stats.message_count + dispatched
+        excess = backlog - self.target_backlog / 2
+        return min(max(excess / self.drain_rate, self.interval_min), self.interval_max)
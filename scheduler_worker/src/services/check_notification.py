@@ -1,7 +1,9 @@
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Any, Mapping
 
+from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorCursor, AsyncIOMotorDatabase
+from pymongo import ASCENDING
 
 
 class CheckNotificationService:
@@ -13,20 +15,58 @@ class CheckNotificationService:
         self.mongo = mongo_db
         self.notification_collection = notification_collection
 
-    async def check_notification(self) -> AsyncIOMotorCursor[Mapping[str, Any] | Any]:
+    async def ensure_indexes(self) -> None:
+        await self.mongo[self.notification_collection].create_index(
+            [("status", ASCENDING), ("next_attempt_at", ASCENDING)]
+        )
+
+    async def check_notification(
+        self, limit: int = 0
+    ) -> AsyncIOMotorCursor[Mapping[str, Any] | Any]:
         """A function that collects notifications that are time to be sent to the queue
-        (with the status unsent and send_date less than the current time, or None)."""
+        (with the status unsent, send_date less than the current time, or None,
+        and a retry backoff that has run out)."""
 
+        now = datetime.now(timezone.utc)
         return self.mongo[self.notification_collection].find(
             {
                 "$and": [
                     {
                         "$or": [
-                            {"send_date": {"$lte": datetime.now(timezone.utc)}},
+                            {"send_date": {"$lte": now}},
                             {"send_date": None},
                         ]
                     },
+                    {
+                        "$or": [
+                            {"next_attempt_at": {"$lte": now}},
+                            {"next_attempt_at": None},
+                        ]
+                    },
                     {"status": "unsent"},
                 ]
-            }
+            },
+            limit=limit,
+        )
+
+    async def lease(self, notification_ids: list[ObjectId], lease: timedelta) -> None:
+        """Postpones the next pick up of dispatched notifications, so they are not
+        published again while waiting in the queue. Notifications lost on the way
+        to the sender are picked up again when the lease runs out."""
+
+        if not notification_ids:
+            return
+        await self.mongo[self.notification_collection].update_many(
+            {"_id": {"$in": notification_ids}},
+            {"$set": {"next_attempt_at": datetime.now(timezone.utc) + lease}},
+        )
+
+    async def release(self, notification_ids: list[ObjectId]) -> None:
+        """Returns notifications that failed to be dispatched to the next pick up"""
+
+        if not notification_ids:
+            return
+        await self.mongo[self.notification_collection].update_many(
+            {"_id": {"$in": notification_ids}},
+            {"$set": {"next_attempt_at": None}},
         )
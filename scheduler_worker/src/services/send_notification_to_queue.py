@@ -1,11 +1,11 @@
 from typing import Mapping, Any
 
 import aio_pika
-from motor.motor_asyncio import AsyncIOMotorCursor
+from bson import ObjectId
 
 from settings import scheduler_settings
 from src.core.logger import scheduler_logger
-from src.database.rabbitmq import send_message
+from src.database.rabbitmq import send_notification
 from src.models import NotificationQueue
 
 
@@ -14,27 +14,36 @@ class SendNotificationService:
 
     async def send_notification_to_queue(
         self,
-        notifications: AsyncIOMotorCursor[Mapping[str, Any] | Any],
+        notifications: list[Mapping[str, Any]],
         channel: aio_pika.abc.AbstractRobustChannel,
-    ) -> None:
-        for document in await notifications.to_list(length=None):
+    ) -> list[ObjectId]:
+        """Publishes notifications and returns ids of those that failed"""
+
+        failed = []
+        for document in notifications:
             queue_notification = NotificationQueue(
-                message=document["message"],
+                message=document.get("message"),
                 channel=document["channel"],
                 data=document["data"],
                 notification_id=str(document["_id"]),
+                retry_count=document.get("retry_count", 0),
+                personalized=document.get("personalized", True),
+                template=document.get("template"),
+                context=document.get("context"),
+                shared_context_id=document.get("shared_context_id"),
             )
-            notification_dict = queue_notification.model_dump()
             try:
-                await send_message(
-                    notification_dict,
+                await send_notification(
+                    queue_notification,
                     scheduler_settings.rabbitmq_queue_notifications,
                     channel,
                 )
                 scheduler_logger.info(
-                    f"Уведомление успешно отправлено в очередь {notification_dict}"
+                    f"Уведомление успешно отправлено в очередь {queue_notification}"
                 )
             except Exception as e:
+                failed.append(document["_id"])
                 scheduler_logger.error(
                     f"Ошибка {e} при отправке уведомления {queue_notification}"
                 )
+        return failed
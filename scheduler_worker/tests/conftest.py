@@ -0,0 +1,25 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+# settings and src are imported from the worker directory, like in the container
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# settings without defaults, the tests don't connect to the broker
+for name, value in {
+    "RABBITMQ_USERNAME": "guest",
+    "RABBITMQ_PASSWORD": "guest",
+    "RABBITMQ_QUEUE_NOTIFICATIONS": "notifications",
+    "RABBITMQ_DELIVERY_MODE": "2",
+    "RABBITMQ_HOST": "localhost",
+    "RABBITMQ_PORT": "5672",
+}.items():
+    os.environ.setdefault(name, value)
+
+
+@pytest.fixture
+def mongo_db():
+    return AsyncMongoMockClient()["notifications"]
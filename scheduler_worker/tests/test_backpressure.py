@@ -0,0 +1,101 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.models import QueueStats
+from src.services import backpressure
+from src.services.backpressure import QueueBackpressure
+
+
+class Channel:
+    """Passive declares return the queue depth set by the test"""
+
+    def __init__(self) -> None:
+        self.depth = 0
+
+    async def declare_queue(self, name: str, passive: bool, robust: bool):
+        return SimpleNamespace(
+            declaration_result=SimpleNamespace(
+                message_count=self.depth, consumer_count=1
+            )
+        )
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=100.0)
+    monkeypatch.setattr(backpressure.time, "monotonic", lambda: clock.now)
+    return clock
+
+
+def make_backpressure() -> QueueBackpressure:
+    return QueueBackpressure(
+        "notifications",
+        target_backlog=1000,
+        batch_max=5000,
+        interval_min=1,
+        interval_max=10,
+    )
+
+
+def stats(message_count: int) -> QueueStats:
+    return QueueStats(message_count=message_count, consumer_count=1, drain_rate=0)
+
+
+@pytest.mark.asyncio
+async def test_drain_rate_counts_published_messages(clock):
+    control = make_backpressure()
+    channel = Channel()
+    channel.depth = 500
+    await control.sample(channel)
+
+    # 300 published, the queue shrank by 200 within 10 seconds
+    control.record_published(300)
+    clock.now += 10
+    channel.depth = 300
+    result = await control.sample(channel)
+
+    assert result.message_count == 300
+    assert control.drain_rate == pytest.approx(0.3 * 50)
+
+
+@pytest.mark.asyncio
+async def test_drain_rate_is_smoothed(clock):
+    control = make_backpressure()
+    channel = Channel()
+    channel.depth = 1000
+    await control.sample(channel)
+    clock.now += 1
+    channel.depth = 900
+    await control.sample(channel)
+    first_rate = control.drain_rate
+
+    # a growing queue doesn't drain
+    clock.now += 1
+    channel.depth = 950
+    await control.sample(channel)
+
+    assert control.drain_rate == pytest.approx(0.7 * first_rate)
+
+
+def test_batch_size_fills_the_backlog_up_to_target():
+    control = make_backpressure()
+
+    assert control.batch_size(stats(0)) == 1000
+    assert control.batch_size(stats(400)) == 600
+    assert control.batch_size(stats(1500)) == 0
+
+
+def test_interval():
+    control = make_backpressure()
+
+    # nothing else is due
+    assert control.interval(stats(0), dispatched=10, batch_size=100) == 10
+    # the drain rate is unknown
+    assert control.interval(stats(600), dispatched=0, batch_size=0) == 10
+
+    control.drain_rate = 100
+    # until the backlog drains to half of the target
+    assert control.interval(stats(800), dispatched=200, batch_size=200) == 5
+    assert control.interval(stats(100), dispatched=400, batch_size=400) == 1
+    assert control.interval(stats(5000), dispatched=0, batch_size=0) == 10
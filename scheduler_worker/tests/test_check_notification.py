@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+from src.services.check_notification import CheckNotificationService
+
+
+@pytest.fixture
+def service(mongo_db):
+    return CheckNotificationService(mongo_db, "notifications")
+
+
+def notification(**fields) -> dict:
+    return {
+        "_id": ObjectId(),
+        "status": "unsent",
+        "send_date": None,
+        "next_attempt_at": None,
+        **fields,
+    }
+
+
+async def due_ids(service: CheckNotificationService, limit: int = 0) -> set:
+    cursor = await service.check_notification(limit)
+    return {document["_id"] async for document in cursor}
+
+
+@pytest.mark.asyncio
+async def test_due_notifications_are_picked_up(mongo_db, service):
+    now = datetime.now(tz=timezone.utc)
+    due = [
+        notification(),
+        notification(send_date=now - timedelta(minutes=1)),
+        # the retry backoff has run out
+        notification(next_attempt_at=now - timedelta(seconds=1), retry_count=1),
+    ]
+    not_due = [
+        notification(send_date=now + timedelta(hours=1)),
+        notification(next_attempt_at=now + timedelta(minutes=5), retry_count=1),
+        notification(status="success"),
+        notification(status="failed"),
+    ]
+    await mongo_db.notifications.insert_many(due + not_due)
+
+    assert await due_ids(service) == {document["_id"] for document in due}
+    assert len(await due_ids(service, limit=2)) == 2
+
+
+@pytest.mark.asyncio
+async def test_leased_notifications_are_not_picked_up_again(mongo_db, service):
+    documents = [notification(), notification()]
+    await mongo_db.notifications.insert_many(documents)
+
+    await service.lease([documents[0]["_id"]], timedelta(minutes=5))
+
+    assert await due_ids(service) == {documents[1]["_id"]}
+
+
+@pytest.mark.asyncio
+async def test_released_notifications_are_picked_up_again(mongo_db, service):
+    document = notification()
+    await mongo_db.notifications.insert_one(document)
+    await service.lease([document["_id"]], timedelta(minutes=5))
+
+    await service.release([document["_id"]])
+
+    assert await due_ids(service) == {document["_id"]}
@@ -0,0 +1,53 @@
+import pytest
+
+from src.core.codec import (
+    ENVELOPE_VERSION_HEADER,
+    JSONCodec,
+    MsgpackCodec,
+    UnsupportedMessage,
+    codec_for_message,
+    envelope_headers,
+    get_codec,
+)
+from src.models import ChannelEnum, NotificationQueue
+
+NOTIFICATION = NotificationQueue(
+    message="message",
+    channel=ChannelEnum.EMAIL,
+    data={"email": "user@example.com", "subject": "subject"},
+    notification_id="id",
+)
+
+
+@pytest.mark.parametrize("name", ["json", "msgpack"])
+def test_notification_round_trip(name):
+    codec = get_codec(name)
+
+    body = codec.encode(NOTIFICATION)
+
+    assert codec.validate(NotificationQueue, body) == NOTIFICATION
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        get_codec("xml")
+
+
+def test_codec_for_message():
+    assert isinstance(codec_for_message(None, None), JSONCodec)
+    assert isinstance(
+        codec_for_message("application/msgpack", envelope_headers()), MsgpackCodec
+    )
+
+
+@pytest.mark.parametrize(
+    "content_type, headers",
+    [
+        ("text/plain", None),
+        ("application/json", {ENVELOPE_VERSION_HEADER: 2}),
+        ("application/json", {ENVELOPE_VERSION_HEADER: "1"}),
+    ],
+)
+def test_unsupported_message(content_type, headers):
+    with pytest.raises(UnsupportedMessage):
+        codec_for_message(content_type, headers)
@@ -0,0 +1,88 @@
+import pytest
+import zstandard
+
+from settings import scheduler_settings
+from src.core.codec import ZSTD_ENCODING, PayloadStrategy
+from src.database import rabbitmq
+from src.models import ChannelEnum, NotificationQueue
+
+
+class Exchange:
+    def __init__(self) -> None:
+        self.messages = []
+
+    async def publish(self, message, routing_key: str) -> None:
+        self.messages.append(message)
+
+
+class Channel:
+    def __init__(self) -> None:
+        self.default_exchange = Exchange()
+
+
+def notification(message: str) -> NotificationQueue:
+    return NotificationQueue(
+        message=message,
+        channel=ChannelEnum.EMAIL,
+        data={"email": "user@example.com", "subject": "subject"},
+        notification_id="id",
+    )
+
+
+async def publish(notification: NotificationQueue, monkeypatch, **payload):
+    for name, value in payload.items():
+        monkeypatch.setattr(scheduler_settings.payload, name, value)
+    channel = Channel()
+    await rabbitmq.send_notification(notification, "notifications", channel)
+    message, = channel.default_exchange.messages
+    return message
+
+
+@pytest.mark.asyncio
+async def test_inline_payload(monkeypatch):
+    message = await publish(
+        notification("message"), monkeypatch, strategy=PayloadStrategy.INLINE
+    )
+
+    assert message.content_encoding is None
+    assert rabbitmq.codec.validate(NotificationQueue, message.body) == notification(
+        "message"
+    )
+
+
+@pytest.mark.asyncio
+async def test_large_payload_is_compressed(monkeypatch):
+    text = "message " * 1000
+    message = await publish(
+        notification(text),
+        monkeypatch,
+        strategy=PayloadStrategy.COMPRESS,
+        compress_threshold=4096,
+    )
+
+    assert message.content_encoding == ZSTD_ENCODING
+    body = zstandard.ZstdDecompressor().decompress(message.body)
+    assert rabbitmq.codec.validate(NotificationQueue, body).message == text
+
+
+@pytest.mark.asyncio
+async def test_small_payload_is_not_compressed(monkeypatch):
+    message = await publish(
+        notification("message"),
+        monkeypatch,
+        strategy=PayloadStrategy.COMPRESS,
+        compress_threshold=4096,
+    )
+
+    assert message.content_encoding is None
+
+
+@pytest.mark.asyncio
+async def test_claim_check_payload_has_no_text(monkeypatch):
+    message = await publish(
+        notification("message"), monkeypatch, strategy=PayloadStrategy.CLAIM_CHECK
+    )
+
+    decoded = rabbitmq.codec.validate(NotificationQueue, message.body)
+    assert decoded.message is None
+    assert decoded.notification_id == "id"
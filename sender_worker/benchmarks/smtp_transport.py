@@ -0,0 +1,132 @@
+"""
+Сравнение SMTP транспортов отправщика: smtplib в пуле потоков и нативный asyncio.
+
+Поднимает локальный SMTP сервер-заглушку с задержкой ответа (имитация сетевой
+задержки до почтового сервера) и отправляет через каждый транспорт одинаковое
+количество писем с заданной конкурентностью.
+
+    python benchmarks/smtp_transport.py --messages 5000 --concurrency 200 --latency-ms 5
+"""
+import argparse
+import asyncio
+import sys
+import time
+from email.message import EmailMessage
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from aiosmtp import AsyncSMTPConnection  # noqa: E402
+from smtp_connection import BaseSMTPConnection, ThreadedSMTPConnection  # noqa: E402
+
+TRANSPORTS: dict[str, type[BaseSMTPConnection]] = {
+    "thread": ThreadedSMTPConnection,
+    "asyncio": AsyncSMTPConnection,
+}
+
+
+class SinkServer:
+    """SMTP сервер, который принимает и выбрасывает письма"""
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.received = 0
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        loop = asyncio.get_running_loop()
+
+        def reply(line: bytes) -> None:
+            # ответ отправляется через latency после получения команды,
+            # поэтому команды, пришедшие одним пакетом, ждут задержку один раз
+            loop.call_later(self.latency, writer.write, line)
+
+        writer.write(b"220 sink ESMTP\r\n")
+        in_data = False
+        while line := await reader.readline():
+            if in_data:
+                if line == b".\r\n":
+                    in_data = False
+                    self.received += 1
+                    reply(b"250 OK\r\n")
+                continue
+
+            command = line[:4].upper()
+            if command == b"EHLO":
+                reply(b"250-sink\r\n250-PIPELINING\r\n250 AUTH PLAIN\r\n")
+            elif command == b"AUTH":
+                reply(b"235 Authentication successful\r\n")
+            elif command == b"DATA":
+                in_data = True
+                reply(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+            elif command == b"QUIT":
+                writer.write(b"221 Bye\r\n")
+                break
+            else:
+                reply(b"250 OK\r\n")
+        writer.close()
+
+
+def build_message() -> str:
+    msg = EmailMessage()
+    msg["From"] = "online_cinema@email.com"
+    msg["To"] = "user@example.com"
+    msg["Subject"] = "Online Cinema: вышла новая серия!"
+    msg.add_alternative("<p>Новая серия уже доступна</p>" * 20, subtype="html")
+    return msg.as_string()
+
+
+async def run_transport(
+    name: str, port: int, messages: int, concurrency: int
+) -> float:
+    msg = build_message()
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for number in range(messages):
+        queue.put_nowait(number)
+
+    async def worker() -> None:
+        connection = TRANSPORTS[name](
+            host="127.0.0.1",
+            port=port,
+            username="test",
+            password="test",
+            timeout=30,
+        )
+        await connection.connect()
+        while not queue.empty():
+            queue.get_nowait()
+            await connection.sendmail(
+                "online_cinema@email.com", ["user@example.com"], msg
+            )
+        await connection.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    sink = SinkServer(latency=args.latency_ms / 1000)
+    server = await asyncio.start_server(sink.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    async with server:
+        for name in TRANSPORTS:
+            elapsed = await run_transport(
+                name, port, args.messages, args.concurrency
+            )
+            print(
+                f"{name:>8}: {args.messages} messages in {elapsed:.2f}s, "
+                f"{args.messages / elapsed:.0f} msg/s"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
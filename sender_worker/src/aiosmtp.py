@@ -0,0 +1,233 @@
+import asyncio
+import base64
+import re
+import smtplib
+import socket
+import ssl
+from contextlib import suppress
+from typing import Awaitable, TypeVar
+
+from smtp_connection import BaseSMTPConnection
+
+T = TypeVar("T")
+
+CRLF = b"\r\n"
+# все варианты перевода строки приводятся к CRLF, как в smtplib
+LINE_ENDINGS = re.compile(rb"\r\n|\r|\n")
+
+
+def prepare_data(msg: str) -> bytes:
+    """CRLF переводы строк, экранирование точек и завершающая точка DATA"""
+    data = LINE_ENDINGS.sub(CRLF, msg.encode("utf-8"))
+    data = re.sub(rb"(?m)^\.", b"..", data)
+    if not data.endswith(CRLF):
+        data += CRLF
+    return data + b"." + CRLF
+
+
+class AsyncSMTPConnection(BaseSMTPConnection):
+    """
+    Нативный asyncio SMTP клиент: не занимает потоки, поддерживает
+    STARTTLS, AUTH PLAIN/LOGIN и PIPELINING (RFC 2920) - MAIL, RCPT и DATA
+    отправляются одним пакетом. Ошибки совпадают с исключениями smtplib
+    """
+
+    reader: asyncio.StreamReader | None = None
+    writer: asyncio.StreamWriter | None = None
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.extensions: dict[str, str] = {}
+
+    async def connect(self) -> None:
+        self.reader, self.writer = await self._wait(
+            asyncio.open_connection(self.host, self.port)
+        )
+        try:
+            await self._handshake()
+        except BaseException:
+            # соединение открыто, закрываем его при любой ошибке EHLO, TLS или AUTH
+            await self.close()
+            raise
+
+    async def noop(self) -> bool:
+        code, _ = await self._command(b"NOOP")
+        return code == 250
+
+    async def sendmail(
+        self, from_addr: str, to_addrs: list[str], msg: str
+    ) -> dict[str, tuple[int, bytes]]:
+        data = prepare_data(msg)
+        commands = [f"MAIL FROM:<{from_addr}>".encode()]
+        commands.extend(f"RCPT TO:<{to_addr}>".encode() for to_addr in to_addrs)
+        commands.append(b"DATA")
+
+        self.data_started = False
+        if "pipelining" in self.extensions:
+            replies = await self._pipeline(commands)
+        else:
+            replies = await self._send_envelope(commands)
+
+        mail_code, mail_reply = replies[0]
+        if mail_code != 250:
+            await self._rset()
+            raise smtplib.SMTPSenderRefused(mail_code, mail_reply, from_addr)
+
+        refused = {
+            to_addr: reply
+            for to_addr, reply in zip(to_addrs, replies[1:])
+            if reply[0] not in {250, 251}
+        }
+        if len(refused) == len(to_addrs):
+            if len(replies) == len(commands) and replies[-1][0] == 354:
+                # сервер принял DATA без получателей, завершаем пустое письмо
+                await self._command(b".")
+            await self._rset()
+            raise smtplib.SMTPRecipientsRefused(refused)
+        data_code, data_reply = replies[-1]
+        if data_code != 354:
+            await self._rset()
+            raise smtplib.SMTPDataError(data_code, data_reply)
+
+        self.data_started = True
+        self.writer.write(data)
+        await self._wait(self.writer.drain())
+        code, reply = await self._read_reply()
+        if code != 250:
+            await self._rset()
+            raise smtplib.SMTPDataError(code, reply)
+        return refused
+
+    async def close(self) -> None:
+        if self.writer is None:
+            return
+        with suppress(smtplib.SMTPException, OSError):
+            await self._command(b"QUIT")
+        self.writer.close()
+        with suppress(OSError):
+            await self.writer.wait_closed()
+        self.writer = None
+
+    async def _handshake(self) -> None:
+        code, reply = await self._read_reply()
+        if code != 220:
+            raise smtplib.SMTPConnectError(code, reply)
+
+        await self._ehlo()
+        if self.starttls:
+            await self._starttls()
+        if self.username:
+            await self._login()
+
+    async def _pipeline(self, commands: list[bytes]) -> list[tuple[int, bytes]]:
+        """Команды конверта и DATA одним пакетом, ответы читаются по порядку"""
+        self.writer.write(CRLF.join(commands) + CRLF)
+        await self._wait(self.writer.drain())
+        return [await self._read_reply() for _ in commands]
+
+    async def _send_envelope(
+        self, commands: list[bytes]
+    ) -> list[tuple[int, bytes]]:
+        """
+        Команды конверта по одной. После отказа MAIL или всех RCPT
+        DATA не отправляется
+        """
+        replies = [await self._command(commands[0])]
+        if replies[0][0] != 250:
+            return replies
+        for command in commands[1:-1]:
+            replies.append(await self._command(command))
+        if any(code in {250, 251} for code, _ in replies[1:]):
+            replies.append(await self._command(commands[-1]))
+        return replies
+
+    async def _ehlo(self) -> None:
+        code, reply = await self._command(f"EHLO {socket.getfqdn()}".encode())
+        if code != 250:
+            code, reply = await self._command(f"HELO {socket.getfqdn()}".encode())
+            if code != 250:
+                raise smtplib.SMTPHeloError(code, reply)
+            self.extensions = {}
+            return
+
+        self.extensions = {}
+        for line in reply.decode("latin-1").splitlines()[1:]:
+            keyword, _, params = line.partition(" ")
+            self.extensions[keyword.lower()] = params.strip()
+
+    async def _starttls(self) -> None:
+        if "starttls" not in self.extensions:
+            raise smtplib.SMTPNotSupportedError(
+                "STARTTLS extension not supported by server."
+            )
+        code, reply = await self._command(b"STARTTLS")
+        if code != 220:
+            raise smtplib.SMTPResponseException(code, reply)
+        await self._wait(
+            self.writer.start_tls(
+                ssl.create_default_context(), server_hostname=self.host
+            )
+        )
+        # после STARTTLS список расширений запрашивается заново
+        await self._ehlo()
+
+    async def _login(self) -> None:
+        methods = self.extensions.get("auth", "").upper().split()
+        if "PLAIN" in methods:
+            token = f"\0{self.username}\0{self.password}".encode()
+            code, reply = await self._command(b"AUTH PLAIN " + base64.b64encode(token))
+        elif "LOGIN" in methods:
+            code, reply = await self._command(b"AUTH LOGIN")
+            if code == 334:
+                code, reply = await self._command(
+                    base64.b64encode(self.username.encode())
+                )
+            if code == 334:
+                code, reply = await self._command(
+                    base64.b64encode(self.password.encode())
+                )
+        else:
+            raise smtplib.SMTPException("No suitable authentication method found.")
+
+        if code not in {235, 503}:
+            raise smtplib.SMTPAuthenticationError(code, reply)
+
+    async def _rset(self) -> None:
+        with suppress(smtplib.SMTPServerDisconnected):
+            await self._command(b"RSET")
+
+    async def _command(self, command: bytes) -> tuple[int, bytes]:
+        if self.writer is None:
+            raise smtplib.SMTPServerDisconnected("please run connect() first")
+        self.writer.write(command + CRLF)
+        await self._wait(self.writer.drain())
+        return await self._read_reply()
+
+    async def _wait(self, awaitable: Awaitable[T]) -> T:
+        """
+        Ждет операцию не дольше timeout. Таймаут считается разрывом
+        подключения: asyncio.TimeoutError до Python 3.11 не наследует OSError
+        и не обрабатывался бы как ошибка отправки
+        """
+        try:
+            return await asyncio.wait_for(awaitable, self.timeout)
+        except asyncio.TimeoutError:
+            raise smtplib.SMTPServerDisconnected(
+                f"Timed out after {self.timeout} seconds"
+            )
+
+    async def _read_reply(self) -> tuple[int, bytes]:
+        lines = []
+        while True:
+            line = await self._wait(self.reader.readline())
+            if not line:
+                raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+            lines.append(line[4:].rstrip(b"\r\n"))
+            # последняя строка ответа имеет вид "250 text", остальные "250-text"
+            if line[3:4] != b"-":
+                break
+        try:
+            code = int(line[:3])
+        except ValueError:
+            code = -1
+        return code, b"\n".join(lines)
@@ -0,0 +1,160 @@
+import asyncio
+from collections import defaultdict
+from logging import getLogger
+
+import aio_pika
+from pydantic import ValidationError
+
+import codec
+import mongo
+import status_buffer
+from config import settings
+from models import NotificationQueue
+from sender import NOTIFICATION_SENDER_REGISTRY
+
+logger = getLogger()
+
+Delivery = tuple[aio_pika.abc.AbstractIncomingMessage, NotificationQueue]
+
+
+class BatchConsumer:
+    """
+    Потребитель очереди нотификаций пачками: сообщения копятся до batch_size
+    штук или batch_interval секунд, группируются по каналу и обрабатываются
+    одним отправщиком на группу. Статусы всей пачки записываются одним
+    bulk_write, а сообщения подтверждаются одним ack с multiple=True.
+    Пачки обрабатываются параллельно, поэтому multiple ack отправляется,
+    только если до последнего сообщения пачки нет неподтвержденных сообщений
+    других пачек. Размер пачки не должен превышать prefetch канала
+    """
+
+    def __init__(self, batch_size: int, batch_interval: float) -> None:
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+
+        self._pending: list[Delivery] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._batches: set[asyncio.Task] = set()
+        # delivery tag сообщений, полученных и еще не подтвержденных
+        self._unacked: set[int] = set()
+
+    async def on_message(self, message: aio_pika.abc.AbstractIncomingMessage) -> None:
+        logger.debug(" [x] Received message %r" % message)
+        try:
+            notification = codec.codec_for_message(
+                message.content_type, message.headers
+            ).validate(
+                NotificationQueue,
+                codec.decompress(message.body, message.content_encoding),
+            )
+        except (codec.UnsupportedMessage, ValidationError, ValueError):
+            logger.exception(
+                f"invalid message in the notification queue: {message.body}"
+            )
+            await message.reject()
+            return
+
+        self._unacked.add(message.delivery_tag)
+        self._pending.append((message, notification))
+        if len(self._pending) >= self.batch_size:
+            self._start_batch()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.batch_interval, self._start_batch
+            )
+
+    async def flush(self) -> None:
+        """Обрабатывает накопленные сообщения и ждет завершения всех пачек"""
+        self._start_batch()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+
+    def _start_batch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.create_task(self._process(batch))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+
+    async def _process(self, batch: list[Delivery]) -> None:
+        try:
+            failed = await self._send(batch)
+        except Exception:
+            logger.exception(f"failed to process batch of {len(batch)} notifications")
+            await self._reject(batch)
+            return
+        finally:
+            # иначе ack с multiple=True больше никогда не отправится
+            self._unacked.difference_update(
+                message.delivery_tag for message, _ in batch
+            )
+        await self._acknowledge(batch, failed)
+
+    async def _send(self, batch: list[Delivery]) -> set[int]:
+        """Отправляет пачку, возвращает delivery tag неотправленных сообщений"""
+        groups: dict[str, list[Delivery]] = defaultdict(list)
+        for delivery in batch:
+            groups[delivery[1].channel].append(delivery)
+
+        mongo_db = mongo.get_mongo_db(settings.mongo.db_name)
+        failed: set[int] = set()
+        status_updates: list[tuple[str, dict]] = []
+
+        async def process_group(channel: str, group: list[Delivery]) -> None:
+            processor_cls = NOTIFICATION_SENDER_REGISTRY.get(channel)
+            if processor_cls is None:
+                logger.error("обработчик события не зарегистрирован")
+                return
+            processor = processor_cls(
+                mongo_db=mongo_db,
+                event_collection=settings.mongo.event_collection,
+                notification_collection=settings.mongo.notification_collection,
+            )
+            errors = await processor.process_batch(
+                [notification for _, notification in group]
+            )
+            for (message, notification), error in zip(group, errors):
+                if error is not None:
+                    logger.error(
+                        f"failed to process notification "
+                        f"{notification.notification_id}: {error!r}"
+                    )
+                    failed.add(message.delivery_tag)
+            status_updates.extend(processor.status_updates)
+
+        await asyncio.gather(
+            *(process_group(channel, group) for channel, group in groups.items())
+        )
+        await status_buffer.status_buffer.write(status_updates)
+        logger.info(
+            f"processed batch of {len(batch)} notifications, {len(failed)} failed"
+        )
+        return failed
+
+    async def _acknowledge(self, batch: list[Delivery], failed: set[int]) -> None:
+        last_message = max(batch, key=lambda delivery: delivery[0].delivery_tag)[0]
+        if not failed and all(tag > last_message.delivery_tag for tag in self._unacked):
+            await last_message.ack(multiple=True)
+            return
+
+        for message, _ in batch:
+            if message.delivery_tag in failed:
+                await message.reject()
+            else:
+                await message.ack()
+
+    @staticmethod
+    async def _reject(batch: list[Delivery]) -> None:
+        for message, _ in batch:
+            try:
+                await message.reject()
+            except Exception:
+                logger.exception(f"failed to reject message {message.delivery_tag}")
+
+
+batch_consumer: BatchConsumer | None = None
@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+import smtplib
+from email.message import EmailMessage
+from functools import partial
+from logging import getLogger
+
+import delivery
+import smtp_pool
+from config import settings
+from models import EmailData
+
+logger = getLogger()
+
+
+class BulkBatch:
+    """Получатели одного и того же письма в одном домене"""
+
+    def __init__(self, subject: str, message: str, domain: str) -> None:
+        self.subject = subject
+        self.message = message
+        self.domain = domain
+        self.recipients: list[tuple[str, asyncio.Future]] = []
+        self.timer: asyncio.TimerHandle | None = None
+
+
+class BulkEmailBatcher:
+    """
+    Массовая отправка неперсонализированных писем: получатели письма
+    с одинаковыми темой и текстом собираются в одну SMTP транзакцию с
+    несколькими RCPT TO (адреса не попадают в заголовки, как при BCC).
+    Транзакция отправляется при наборе max_recipients или через linger секунд
+    """
+
+    def __init__(self, max_recipients: int, linger: float) -> None:
+        self.max_recipients = max_recipients
+        self.linger = linger
+        self._batches: dict[tuple[str, str], BulkBatch] = {}
+        self._sends: set[asyncio.Task] = set()
+
+    async def send(self, message: str, email_data: EmailData) -> None:
+        """Ждет отправки транзакции, в которую попал получатель"""
+        domain = delivery.get_domain(email_data.email)
+        digest = hashlib.sha256(
+            f"{email_data.subject}\0{message}".encode("utf-8")
+        ).hexdigest()
+        key = (digest, domain)
+
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = BulkBatch(email_data.subject, message, domain)
+            batch.timer = asyncio.get_running_loop().call_later(
+                self.linger, self._start_send, key
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        batch.recipients.append((email_data.email, future))
+        if len(batch.recipients) >= self.max_recipients:
+            self._start_send(key)
+        await future
+
+    def _start_send(self, key: tuple[str, str]) -> None:
+        batch = self._batches.pop(key, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        send = asyncio.create_task(self._send(batch))
+        self._sends.add(send)
+        send.add_done_callback(self._sends.discard)
+
+    async def _send(self, batch: BulkBatch) -> None:
+        msg = EmailMessage()
+        msg["From"] = settings.email.sender_address
+        msg["To"] = "undisclosed-recipients:;"
+        msg["Subject"] = batch.subject
+        msg.add_alternative(batch.message, subtype="html")
+        to_addrs = list(dict.fromkeys(email for email, _ in batch.recipients))
+
+        try:
+            refused = await delivery.delivery_scheduler.submit(
+                batch.domain,
+                partial(
+                    smtp_pool.smtp_pool.sendmail,
+                    settings.email.sender_address,
+                    to_addrs,
+                    msg.as_string(),
+                ),
+            )
+        except Exception as error:
+            for _, future in batch.recipients:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        logger.info(
+            f"bulk message sent to {len(to_addrs) - len(refused)} recipients "
+            f"in {batch.domain}"
+        )
+        for email, future in batch.recipients:
+            if future.done():
+                continue
+            if email in refused:
+                future.set_exception(
+                    smtplib.SMTPRecipientsRefused({email: refused[email]})
+                )
+            else:
+                future.set_result(None)
+
+
+bulk_batcher: BulkEmailBatcher | None = None
+
+
+def init_bulk_batcher() -> BulkEmailBatcher:
+    return BulkEmailBatcher(
+        max_recipients=settings.email.bulk_max_recipients,
+        linger=settings.email.bulk_linger,
+    )
@@ -0,0 +1,100 @@
+import asyncio
+from logging import getLogger
+
+from bson.objectid import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from config import settings
+
+logger = getLogger()
+
+
+class MessageLoader:
+    """
+    Загрузка текстов и статусов нотификаций из базы: текстов нотификаций,
+    отправленных в очередь без текста (claim check), и статусов для пропуска
+    отмененных. Запросы собираются в один find по _id, который выполняется
+    при наборе batch_size запросов или через flush_interval секунд
+    """
+
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection,
+        batch_size: int,
+        flush_interval: float,
+    ) -> None:
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._pending: dict[str, list[asyncio.Future]] = {}
+        # текст загружается, только если он нужен хотя бы одному запросу пачки
+        self._with_message = False
+        self._timer: asyncio.TimerHandle | None = None
+        self._loads: set[asyncio.Task] = set()
+
+    async def load(
+        self, notification_id: str, with_message: bool = True
+    ) -> dict | None:
+        """Текст, статус и время отправки нотификации или None, если ее нет в базе"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(notification_id, []).append(future)
+        self._with_message |= with_message
+        if len(self._pending) >= self.batch_size:
+            self._start_load()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.flush_interval, self._start_load
+            )
+        return await future
+
+    def _start_load(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        with_message, self._with_message = self._with_message, False
+        if not batch:
+            return
+
+        load = asyncio.create_task(self._load(batch, with_message))
+        self._loads.add(load)
+        load.add_done_callback(self._loads.discard)
+
+    async def _load(
+        self, batch: dict[str, list[asyncio.Future]], with_message: bool
+    ) -> None:
+        projection = {"status": 1, "send_date": 1}
+        if with_message:
+            projection["message"] = 1
+        try:
+            documents = {
+                str(document["_id"]): document
+                async for document in self.collection.find(
+                    {"_id": {"$in": [ObjectId(id_) for id_ in batch]}},
+                    projection=projection,
+                )
+            }
+        except Exception as error:
+            logger.exception(f"failed to load {len(batch)} notification messages")
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(error)
+            return
+
+        for notification_id, futures in batch.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(documents.get(notification_id))
+
+
+message_loader: MessageLoader | None = None
+
+
+def init_message_loader(collection: AsyncIOMotorCollection) -> MessageLoader:
+    return MessageLoader(
+        collection,
+        batch_size=settings.claim_check_batch_size,
+        flush_interval=settings.claim_check_flush_interval,
+    )
@@ -0,0 +1,125 @@
+from abc import ABC, abstractmethod
+from collections.abc import Mapping
+from datetime import date, datetime
+from typing import Any, TypeVar
+
+import msgpack
+import orjson
+import zstandard
+from pydantic import BaseModel
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# увеличивается при несовместимых изменениях тела сообщений
+ENVELOPE_VERSION = 1
+ENVELOPE_VERSION_HEADER = "x-envelope-version"
+ZSTD_ENCODING = "zstd"
+
+
+class UnsupportedMessage(Exception):
+    """Формат или версия конверта сообщения не поддерживаются"""
+
+
+def _default(value: Any) -> Any:
+    """Неизвестные сериализатору типы, например ObjectId, передаются строками"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+class Codec(ABC):
+    """Сериализация тела сообщений RabbitMQ"""
+
+    name: str
+    content_type: str
+
+    @abstractmethod
+    def encode(self, data: Any) -> bytes:
+        """Сериализует данные или модель"""
+
+    @abstractmethod
+    def decode(self, body: bytes) -> Any:
+        """Десериализует тело сообщения"""
+
+    def validate(self, model: type[ModelT], body: bytes) -> ModelT:
+        return model.model_validate(self.decode(body))
+
+
+class JSONCodec(Codec):
+    name = "json"
+    content_type = "application/json"
+
+    def encode(self, data: Any) -> bytes:
+        if isinstance(data, BaseModel):
+            return data.model_dump_json().encode()
+        return orjson.dumps(data, default=_default)
+
+    def decode(self, body: bytes) -> Any:
+        return orjson.loads(body)
+
+    def validate(self, model: type[ModelT], body: bytes) -> ModelT:
+        # разбор и валидация за один проход, без промежуточного словаря
+        return model.model_validate_json(body)
+
+
+class MsgpackCodec(Codec):
+    name = "msgpack"
+    content_type = "application/msgpack"
+
+    def encode(self, data: Any) -> bytes:
+        if isinstance(data, BaseModel):
+            data = data.model_dump()
+        return msgpack.packb(data, default=_default)
+
+    def decode(self, body: bytes) -> Any:
+        return msgpack.unpackb(body)
+
+
+CODECS: dict[str, Codec] = {
+    codec.content_type: codec for codec in (JSONCodec(), MsgpackCodec())
+}
+
+
+def get_codec(name: str) -> Codec:
+    """Кодек по его имени в настройках"""
+    for codec in CODECS.values():
+        if codec.name == name:
+            return codec
+    raise ValueError(f"Unknown codec {name}")
+
+
+def envelope_headers(headers: Mapping[str, Any] | None = None) -> dict[str, Any]:
+    return {ENVELOPE_VERSION_HEADER: ENVELOPE_VERSION, **(headers or {})}
+
+
+def codec_for_message(
+    content_type: str | None, headers: Mapping[str, Any] | None
+) -> Codec:
+    """
+    Кодек входящего сообщения. Сообщения без content type отправлены
+    старыми версиями сервисов и содержат JSON
+    """
+    version = (headers or {}).get(ENVELOPE_VERSION_HEADER, ENVELOPE_VERSION)
+    if not isinstance(version, int) or version > ENVELOPE_VERSION:
+        raise UnsupportedMessage(f"Unsupported envelope version {version}")
+    if not content_type:
+        return CODECS[JSONCodec.content_type]
+    try:
+        return CODECS[content_type]
+    except KeyError:
+        raise UnsupportedMessage(f"Unsupported content type {content_type}")
+
+
+_decompressor = zstandard.ZstdDecompressor()
+
+
+def decompress(body: bytes, content_encoding: str | None) -> bytes:
+    """Распаковывает тело по content encoding сообщения"""
+    if not content_encoding:
+        return body
+    if content_encoding != ZSTD_ENCODING:
+        raise UnsupportedMessage(f"Unsupported content encoding {content_encoding}")
+    try:
+        return _decompressor.decompress(body)
+    except zstandard.ZstdError as error:
+        raise UnsupportedMessage(f"Corrupted compressed message: {error}")
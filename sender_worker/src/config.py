@@ -1,6 +1,7 @@
 from pathlib import Path
+from typing import Literal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -12,6 +13,9 @@ class MongoDBSettings(BaseModel):
     db_name: str = "notifications"
     event_collection: str = "events"
     notification_collection: str = "notifications"
+    template_collection: str = "templates"
+    shared_context_collection: str = "shared_contexts"
+    inbox_counter_collection: str = "inbox_counters"
 
 
 class EmailSettings(BaseModel):
@@ -20,6 +24,42 @@ class EmailSettings(BaseModel):
     username: str = "test_loging"
     password: str = "test_password"
     sender_address: str = "online_cinema@email.com"
+    timeout: float = 30
+    # thread - smtplib в пуле потоков, asyncio - нативный asyncio клиент
+    transport: Literal["thread", "asyncio"] = "thread"
+    # mailhog не поддерживает TLS
+    starttls: bool = False
+
+    # пул долгоживущих подключений
+    pool_size: int = 10
+    keepalive_interval: float = 30
+    max_messages_per_connection: int = 1000
+
+    # массовая отправка неперсонализированных писем, 1 - отключена
+    bulk_max_recipients: int = 100
+    bulk_linger: float = 0.5
+
+
+class DomainDeliveryLimits(BaseModel):
+    rate: float = 20
+    burst: int = 20
+    initial_concurrency: int = 4
+    min_concurrency: int = 1
+    max_concurrency: int = 50
+
+
+class DeliverySettings(BaseModel):
+    default: DomainDeliveryLimits = DomainDeliveryLimits()
+    # лимиты для отдельных доменов, например {"gmail.com": {"rate": 10}}
+    domains: dict[str, DomainDeliveryLimits] = {}
+    latency_threshold: float = 5
+    # очередь домена держит неподтвержденные сообщения канала,
+    # поэтому должна быть заметно меньше rabbitmq_prefetch_count
+    queue_size: int = 20
+    # seconds, отправка откладывается, если очередь домена не успеет
+    # разойтись за это время при наблюдаемой скорости отправки
+    max_drain_time: float = 10
+    idle_timeout: float = 60
 
 
 class Settings(BaseSettings):
@@ -29,13 +69,18 @@ class Settings(BaseSettings):
 
     mongo: MongoDBSettings = MongoDBSettings()
     email: EmailSettings = EmailSettings()
+    delivery: DeliverySettings = DeliverySettings()
 
     rabbitmq_username: str
     rabbitmq_password: str
     rabbitmq_queue_notifications: str
+    rabbitmq_exchange_websocket: str = "websocket_notifications"
     rabbitmq_delivery_mode: int
     rabbitmq_host: str
     rabbitmq_port: int
+    # json или msgpack, принимаются оба
+    rabbitmq_codec: str = "json"
+    rabbitmq_prefetch_count: int = 100
 
     model_config = SettingsConfigDict(
         extra="ignore",
@@ -45,6 +90,32 @@ class Settings(BaseSettings):
     )
 
     notification_retry_limit: int = 3
+    # статусы записываются пачками, размер пачки ограничен prefetch
+    status_write_batch_size: int = 100
+    status_write_flush_interval: float = 0.05
+    # потребление пачками, 1 - каждое сообщение отдельно.
+    # Пачка не больше rabbitmq_prefetch_count
+    consumer_batch_size: int = 1
+    consumer_batch_interval: float = 0.05
+    # тексты нотификаций без текста в очереди загружаются пачками
+    claim_check_batch_size: int = 100
+    claim_check_flush_interval: float = 0.01
+    # скомпилированные шаблоны, общие контексты и тексты рассылок
+    render_cache_size: int = 1000
+    # статус нотификаций проверяется перед отправкой, отмененные пропускаются
+    skip_cancelled: bool = True
+    # seconds, the delay doubles with every retry up to the maximum
+    notification_retry_backoff_base: float = 30
+    notification_retry_backoff_max: float = 3600
+
+    @model_validator(mode="after")
+    def check_delivery_queue_size(self) -> "Settings":
+        # иначе один медленный домен занимает весь prefetch и останавливает остальные
+        if self.delivery.queue_size >= self.rabbitmq_prefetch_count:
+            raise ValueError(
+                "delivery.queue_size must be less than rabbitmq_prefetch_count"
+            )
+        return self
 
 
 settings = Settings()
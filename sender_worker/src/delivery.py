@@ -0,0 +1,220 @@
+import asyncio
+import smtplib
+import time
+from logging import getLogger
+from typing import Any, Awaitable, Callable
+
+from config import DomainDeliveryLimits, settings
+
+logger = getLogger()
+
+DeliveryJob = Callable[[], Awaitable[Any]]
+
+
+class DomainBusy(Exception):
+    """Очередь домена переполнена, отправку нужно отложить"""
+
+    def __init__(self, domain: str, retry_after: float) -> None:
+        super().__init__(f"delivery queue for {domain} is full")
+        self.domain = domain
+        self.retry_after = retry_after
+
+
+def is_throttled(error: BaseException) -> bool:
+    """Временный отказ 4xx: сервер просит отправлять медленнее"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return any(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return False
+
+
+class TokenBucket:
+    """Ограничение частоты отправки писем в домен"""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+
+    def take(self) -> float:
+        """Забирает токен, возвращает 0 или сколько секунд ждать до следующего"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class AIMDLimit:
+    """
+    Адаптивный лимит одновременных отправок: растет на единицу за каждое
+    окно успешных отправок и уменьшается вдвое при ответах 4xx
+    или при задержке выше порога
+    """
+
+    decrease_factor = 0.5
+
+    def __init__(
+        self, initial: int, minimum: int, maximum: int, latency_threshold: float
+    ) -> None:
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_threshold = latency_threshold
+        self._decreased_at = 0.0
+
+    @property
+    def value(self) -> int:
+        return int(self.limit)
+
+    def on_success(self, latency: float) -> None:
+        if latency > self.latency_threshold:
+            self.on_congestion()
+            return
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def on_congestion(self) -> None:
+        # отправки, начатые до снижения, не должны снижать лимит повторно
+        now = time.monotonic()
+        if now - self._decreased_at < self.latency_threshold:
+            return
+        self._decreased_at = now
+        self.limit = max(self.minimum, self.limit * self.decrease_factor)
+
+
+class DomainLane:
+    """Очередь отправок в один домен со своим лимитом частоты и конкурентности"""
+
+    latency_weight = 0.2
+
+    def __init__(
+        self,
+        domain: str,
+        limits: DomainDeliveryLimits,
+        on_idle: Callable[[str], None],
+    ) -> None:
+        self.domain = domain
+        self.bucket = TokenBucket(limits.rate, limits.burst)
+        self.limit = AIMDLimit(
+            initial=limits.initial_concurrency,
+            minimum=limits.min_concurrency,
+            maximum=limits.max_concurrency,
+            latency_threshold=settings.delivery.latency_threshold,
+        )
+        self.queue: asyncio.Queue[tuple[DeliveryJob, asyncio.Future]] = asyncio.Queue(
+            settings.delivery.queue_size
+        )
+        self.in_flight = 0
+        # сглаженная задержка отправки, по ней оценивается скорость домена
+        self.latency: float | None = None
+        self._runs: set[asyncio.Task] = set()
+        self._released = asyncio.Event()
+        self._on_idle = on_idle
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    @property
+    def throughput(self) -> float:
+        """Писем в секунду: меньшее из лимита частоты и лимит / задержка"""
+        if not self.latency:
+            return self.bucket.rate
+        return min(self.bucket.rate, self.limit.value / self.latency)
+
+    def drain_time(self) -> float:
+        """За сколько секунд разойдется очередь домена вместе с новой отправкой"""
+        return (self.queue.qsize() + 1) / self.throughput
+
+    def submit(self, job: DeliveryJob) -> asyncio.Future:
+        drain_time = self.drain_time()
+        if drain_time > settings.delivery.max_drain_time:
+            raise DomainBusy(self.domain, drain_time)
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((job, future))
+        except asyncio.QueueFull:
+            raise DomainBusy(self.domain, drain_time)
+        return future
+
+    async def _dispatch(self) -> None:
+        while True:
+            try:
+                job, future = await asyncio.wait_for(
+                    self.queue.get(), settings.delivery.idle_timeout
+                )
+            except asyncio.TimeoutError:
+                if self.in_flight == 0 and self.queue.empty():
+                    self._on_idle(self.domain)
+                    return
+                continue
+
+            while self.in_flight >= self.limit.value:
+                self._released.clear()
+                await self._released.wait()
+            while wait := self.bucket.take():
+                await asyncio.sleep(wait)
+
+            self.in_flight += 1
+            run = asyncio.create_task(self._run(job, future))
+            self._runs.add(run)
+            run.add_done_callback(self._runs.discard)
+
+    async def _run(self, job: DeliveryJob, future: asyncio.Future) -> None:
+        started = time.monotonic()
+        try:
+            result = await job()
+        except Exception as error:
+            if is_throttled(error):
+                self.limit.on_congestion()
+                logger.info(
+                    f"{self.domain} throttles delivery, "
+                    f"concurrency limit {self.limit.value}"
+                )
+            if not future.done():
+                future.set_exception(error)
+        else:
+            latency = time.monotonic() - started
+            self.limit.on_success(latency)
+            self.latency = (
+                latency
+                if self.latency is None
+                else self.latency + self.latency_weight * (latency - self.latency)
+            )
+            if not future.done():
+                future.set_result(result)
+        finally:
+            self.in_flight -= 1
+            self._released.set()
+
+
+class DeliveryScheduler:
+    """
+    Планировщик отправки писем по доменам получателей. У каждого домена своя
+    очередь, token bucket и AIMD лимит конкурентности, поэтому медленный или
+    ограничивающий домен не задерживает отправку в остальные. Если очередь
+    домена переполнена или не разойдется за max_drain_time при наблюдаемой
+    скорости, выбрасывается DomainBusy и отправка откладывается, а сообщение
+    подтверждается и не занимает prefetch канала
+    """
+
+    def __init__(self) -> None:
+        self._lanes: dict[str, DomainLane] = {}
+
+    async def submit(self, domain: str, job: DeliveryJob) -> Any:
+        lane = self._lanes.get(domain)
+        if lane is None:
+            limits = settings.delivery.domains.get(domain, settings.delivery.default)
+            lane = self._lanes[domain] = DomainLane(domain, limits, self._remove_lane)
+        return await lane.submit(job)
+
+    def _remove_lane(self, domain: str) -> None:
+        self._lanes.pop(domain, None)
+
+
+delivery_scheduler: DeliveryScheduler | None = None
+
+
+def get_domain(email: str) -> str:
+    return email.rpartition("@")[2].lower()
@@ -1,12 +1,19 @@
 import asyncio
-import json
 from logging import config, getLogger
 
 import aio_pika
 from pydantic import ValidationError
 
+import batch_consumer
+import bulk
+import claim_check
+import codec
+import delivery
 import mongo
 import rabbitmq
+import render
+import smtp_pool
+import status_buffer
 from config import settings
 from logger import LOGGING
 from models import NotificationQueue
@@ -22,10 +29,14 @@ async def process_events(message: aio_pika.abc.AbstractIncomingMessage) -> None:
         mongo_db = mongo.get_mongo_db(settings.mongo.db_name)
         logger.debug(" [x] Received message %r" % message)
         logger.info("Message body is: %r" % message.body)
-        raw_notification = json.loads(message.body.decode(encoding="utf-8"))
         try:
-            notification = NotificationQueue.model_validate(raw_notification)
-        except ValidationError:
+            notification = codec.codec_for_message(
+                message.content_type, message.headers
+            ).validate(
+                NotificationQueue,
+                codec.decompress(message.body, message.content_encoding),
+            )
+        except (codec.UnsupportedMessage, ValidationError, ValueError):
             logger.exception(
                 f"invalid message in the notification queue: {message.body}"
             )
@@ -42,16 +53,53 @@ async def process_events(message: aio_pika.abc.AbstractIncomingMessage) -> None:
 
 async def main() -> None:
     mongo.mongo = mongo.init_mongo(host=settings.mongo.host, port=settings.mongo.port)
+    status_buffer.status_buffer = status_buffer.init_status_buffer(
+        mongo.get_mongo_db(settings.mongo.db_name)[
+            settings.mongo.notification_collection
+        ]
+    )
+    claim_check.message_loader = claim_check.init_message_loader(
+        mongo.get_mongo_db(settings.mongo.db_name)[
+            settings.mongo.notification_collection
+        ]
+    )
+    render.template_renderer = render.init_template_renderer(
+        mongo.get_mongo_db(settings.mongo.db_name)
+    )
+    delivery.delivery_scheduler = delivery.DeliveryScheduler()
+    bulk.bulk_batcher = bulk.init_bulk_batcher()
+    smtp_pool.smtp_pool = smtp_pool.init_smtp_pool()
+    await smtp_pool.smtp_pool.start()
     rabbitmq.connection = await rabbitmq.create_connection()
-    async with rabbitmq.connection:
-        rabbitmq.channel = await rabbitmq.create_channel(rabbitmq.connection)
-        notification_queue = await rabbitmq.channel.declare_queue(
-            settings.rabbitmq_queue_notifications, durable=True
-        )
-        await notification_queue.consume(process_events)
-
-        logger.info(" [*] Waiting for messages. To exit press CTRL+C")
-        await asyncio.Future()
+    try:
+        async with rabbitmq.connection:
+            rabbitmq.channel = await rabbitmq.create_channel(rabbitmq.connection)
+            await rabbitmq.declare_websocket_exchange(rabbitmq.channel)
+            notification_queue = await rabbitmq.channel.declare_queue(
+                settings.rabbitmq_queue_notifications, durable=True
+            )
+            if settings.consumer_batch_size > 1:
+                batch_consumer.batch_consumer = batch_consumer.BatchConsumer(
+                    batch_size=settings.consumer_batch_size,
+                    batch_interval=settings.consumer_batch_interval,
+                )
+                consumer_tag = await notification_queue.consume(
+                    batch_consumer.batch_consumer.on_message
+                )
+            else:
+                consumer_tag = await notification_queue.consume(process_events)
+
+            logger.info(" [*] Waiting for messages. To exit press CTRL+C")
+            try:
+                await asyncio.Future()
+            finally:
+                # накопленные пачки подтверждаются, пока канал открыт
+                await notification_queue.cancel(consumer_tag)
+                if batch_consumer.batch_consumer is not None:
+                    await batch_consumer.batch_consumer.flush()
+    finally:
+        await status_buffer.status_buffer.flush()
+        await smtp_pool.smtp_pool.close()
 
 
 if __name__ == "__main__":
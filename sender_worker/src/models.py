@@ -21,6 +21,8 @@ class NotificationStatusEnum(StrEnum):
     UNSENT = "unsent"
     SUCCESS = "success"
     FAILED = "failed"
+    STORED = "stored"
+    CANCELLED = "cancelled"
 
 
 class Event(BaseModel):
@@ -39,14 +41,33 @@ class NewUserEventData(BaseModel):
     url: str
 
 
+class TemplateRef(BaseModel):
+    name: str
+    version: str
+
+
 class NotificationDB(BaseModel):
-    message: str
+    # None, если текст рендерится отправщиком
+    message: str | None = None
     channel: ChannelEnum
     send_date: datetime | None = None
     updated_at: datetime | None = None
 
     status: NotificationStatusEnum = NotificationStatusEnum.UNSENT
     retry_count: int = 0
+    next_attempt_at: datetime | None = None
+    personalized: bool = True
+
+    user_id: str | None = None
+    event_id: str | None = None
+    created_at: datetime | None = None
+    read_at: datetime | None = None
+    # учтена в счетчике непрочитанных
+    inbox_counted: bool = False
+
+    template: TemplateRef | None = None
+    context: dict | None = None
+    shared_context_id: str | None = None
 
 
 class EmailData(BaseModel):
@@ -55,12 +76,20 @@ class EmailData(BaseModel):
 
 
 class WebsocketData(BaseModel):
-    recipients: str
+    user_id: str
 
 
 class NotificationQueue(BaseModel):
-    message: str
+    # None, если текст не передается в очереди и загружается из базы
+    message: str | None = None
     channel: ChannelEnum
     data: dict
 
     notification_id: str
+    retry_count: int = 0
+    personalized: bool = True
+
+    # ленивый рендеринг: шаблон, контекст получателя и общий контекст
+    template: TemplateRef | None = None
+    context: dict | None = None
+    shared_context_id: str | None = None
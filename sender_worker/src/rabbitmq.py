@@ -1,12 +1,12 @@
-import json
-
 import aio_pika
-from aio_pika import DeliveryMode, Message
+from aio_pika import DeliveryMode, ExchangeType, Message
 
+from codec import envelope_headers, get_codec
 from config import settings
 
 connection: aio_pika.abc.AbstractRobustConnection | None = None
 channel: aio_pika.abc.AbstractRobustChannel | None = None
+codec = get_codec(settings.rabbitmq_codec)
 
 
 async def create_connection() -> aio_pika.abc.AbstractRobustConnection:
@@ -22,15 +22,24 @@ async def create_channel(
     connection: aio_pika.abc.AbstractRobustConnection,
 ) -> aio_pika.abc.AbstractRobustChannel:
     channel = await connection.channel()
-    await channel.set_qos(prefetch_count=1)
+    await channel.set_qos(prefetch_count=settings.rabbitmq_prefetch_count)
     return channel
 
 
-async def send_message(data: dict, queue_name: str) -> None:
-    message_body = json.dumps(data).encode("utf-8")
+async def declare_websocket_exchange(
+    channel: aio_pika.abc.AbstractRobustChannel,
+) -> aio_pika.abc.AbstractRobustExchange:
+    """Fanout exchange, из которого уведомления получают все узлы websocket шлюза"""
+    return await channel.declare_exchange(
+        settings.rabbitmq_exchange_websocket, ExchangeType.FANOUT, durable=True
+    )
 
+
+async def send_message(data: dict, queue_name: str) -> None:
     message = Message(
-        message_body,
+        codec.encode(data),
+        content_type=codec.content_type,
+        headers=envelope_headers(),
         delivery_mode=DeliveryMode.PERSISTENT,
     )
 
@@ -38,3 +47,16 @@ async def send_message(data: dict, queue_name: str) -> None:
         message,
         routing_key=queue_name,
     )
+
+
+async def publish_to_exchange(data: dict, exchange_name: str) -> None:
+    # уведомление нужно только подключенным сейчас клиентам, на диск не пишем
+    message = Message(
+        codec.encode(data),
+        content_type=codec.content_type,
+        headers=envelope_headers(),
+        delivery_mode=DeliveryMode.NOT_PERSISTENT,
+    )
+
+    exchange = await channel.get_exchange(exchange_name, ensure=False)
+    await exchange.publish(message, routing_key="")
@@ -0,0 +1,134 @@
+import asyncio
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from logging import getLogger
+from typing import Any
+
+import orjson
+from bson.objectid import ObjectId
+from jinja2 import Environment, Template
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from config import settings
+from models import NotificationQueue, TemplateRef
+
+logger = getLogger()
+
+
+class RenderSourceNotFound(Exception):
+    """Шаблон или общий контекст нотификации не найден в базе"""
+
+
+class LRUCache:
+    """
+    LRU кэш с загрузкой отсутствующих значений. Одновременные запросы
+    одного ключа ждут одну загрузку
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._values: OrderedDict[Any, Any] = OrderedDict()
+        self._loading: dict[Any, asyncio.Task] = {}
+
+    def get(self, key: Any) -> Any | None:
+        value = self._values.get(key)
+        if value is not None:
+            self._values.move_to_end(key)
+        return value
+
+    def put(self, key: Any, value: Any) -> None:
+        self._values[key] = value
+        self._values.move_to_end(key)
+        if len(self._values) > self.max_size:
+            self._values.popitem(last=False)
+
+    async def get_or_load(self, key: Any, load: Callable[[], Awaitable[Any]]) -> Any:
+        value = self.get(key)
+        if value is not None:
+            return value
+        task = self._loading.get(key)
+        if task is None:
+            task = self._loading[key] = asyncio.create_task(load())
+            task.add_done_callback(lambda _: self._loading.pop(key, None))
+        value = await task
+        self.put(key, value)
+        return value
+
+
+class TemplateRenderer:
+    """
+    Рендеринг нотификаций, сохраненных шаблоном и контекстом получателя.
+    Версии шаблонов неизменяемы, поэтому скомпилированные шаблоны и общие
+    контексты рассылок кэшируются без сроков. Тексты неперсонализированных
+    нотификаций одинаковы для всех получателей и тоже кэшируются
+    """
+
+    def __init__(
+        self,
+        mongo_db: AsyncIOMotorDatabase,
+        template_collection: str,
+        shared_context_collection: str,
+        cache_size: int,
+    ) -> None:
+        self.templates = mongo_db[template_collection]
+        self.shared_contexts = mongo_db[shared_context_collection]
+        self.env = Environment()
+
+        self._templates = LRUCache(cache_size)
+        self._shared_contexts = LRUCache(cache_size)
+        self._rendered = LRUCache(cache_size)
+
+    async def render(self, notification: NotificationQueue) -> str:
+        render_key = None
+        if not notification.personalized:
+            render_key = (
+                notification.template.name,
+                notification.template.version,
+                notification.shared_context_id,
+                orjson.dumps(notification.context, option=orjson.OPT_SORT_KEYS),
+            )
+            if message := self._rendered.get(render_key):
+                return message
+
+        template = await self._templates.get_or_load(
+            (notification.template.name, notification.template.version),
+            lambda: self._load_template(notification.template),
+        )
+        context = {}
+        if notification.shared_context_id is not None:
+            context = await self._shared_contexts.get_or_load(
+                notification.shared_context_id,
+                lambda: self._load_shared_context(notification.shared_context_id),
+            )
+        message = template.render({**context, **(notification.context or {})})
+
+        if render_key is not None:
+            self._rendered.put(render_key, message)
+        return message
+
+    async def _load_template(self, ref: TemplateRef) -> Template:
+        document = await self.templates.find_one({"_id": f"{ref.name}@{ref.version}"})
+        if document is None:
+            raise RenderSourceNotFound(f"template {ref.name}@{ref.version}")
+        logger.info(f"loaded template {ref.name}@{ref.version}")
+        return self.env.from_string(document["source"])
+
+    async def _load_shared_context(self, shared_context_id: str) -> dict:
+        document = await self.shared_contexts.find_one(
+            {"_id": ObjectId(shared_context_id)}
+        )
+        if document is None:
+            raise RenderSourceNotFound(f"shared context {shared_context_id}")
+        return document["context"]
+
+
+template_renderer: TemplateRenderer | None = None
+
+
+def init_template_renderer(mongo_db: AsyncIOMotorDatabase) -> TemplateRenderer:
+    return TemplateRenderer(
+        mongo_db,
+        template_collection=settings.mongo.template_collection,
+        shared_context_collection=settings.mongo.shared_context_collection,
+        cache_size=settings.render_cache_size,
+    )
@@ -1,21 +1,32 @@
 import asyncio
+import random
 import smtplib
 from abc import ABC, abstractmethod
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from email.message import EmailMessage
+from functools import partial
 from logging import getLogger
 
+from aio_pika.exceptions import AMQPError
 from bson.objectid import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
 from pymongo.errors import PyMongoError
 
+import bulk
+import claim_check
+import delivery
+import rabbitmq
+import render
+import smtp_pool
+import status_buffer
 from config import settings
 from models import (
     ChannelEnum,
     EmailData,
-    NotificationDB,
     NotificationQueue,
     NotificationStatusEnum,
+    WebsocketData,
 )
 
 logger = getLogger()
@@ -37,6 +48,8 @@ class BaseSender(ABC):
         self.mongo = mongo_db
         self.event_collection = event_collection
         self.notification_collection = notification_collection
+        # обновления статусов пачки, записываются потребителем одной операцией
+        self.status_updates: list[tuple[str, dict]] | None = None
 
     @abstractmethod
     async def process(self, notification: NotificationQueue) -> None:
@@ -45,11 +58,60 @@ class BaseSender(ABC):
         перегружается конретными обработчиками
         """
 
+    async def process_batch(
+        self, notifications: list[NotificationQueue]
+    ) -> list[BaseException | None]:
+        """
+        Обрабатывает пачку нотификаций канала и возвращает ошибки по каждой.
+        Статусы не пишутся, а копятся в status_updates
+        """
+        self.status_updates = []
+        results = await asyncio.gather(
+            *(self.process(notification) for notification in notifications),
+            return_exceptions=True,
+        )
+        return [
+            result if isinstance(result, BaseException) else None
+            for result in results
+        ]
+
+    async def get_message(self, notification: NotificationQueue) -> str | None:
+        """
+        Текст нотификации из шаблона, из сообщения или из базы.
+        None, если нотификация отменена или перенесена после постановки в очередь
+        """
+        document = None
+        claim_checked = notification.template is None and notification.message is None
+        if settings.skip_cancelled or claim_checked:
+            document = await claim_check.message_loader.load(
+                notification.notification_id, with_message=claim_checked
+            )
+            if document is None:
+                raise NotificationNotFound(notification.notification_id)
+            if is_withdrawn(document):
+                logger.info(
+                    f"notification {notification.notification_id} was cancelled "
+                    "or rescheduled, skipping"
+                )
+                return None
+
+        if notification.template is not None:
+            return await render.template_renderer.render(notification)
+        if notification.message is not None:
+            return notification.message
+        return document["message"]
+
+    async def write_status(self, notification_id: str, update: dict) -> None:
+        if self.status_updates is not None:
+            self.status_updates.append((notification_id, update))
+            return
+        await status_buffer.status_buffer.update(notification_id, update)
+
     async def set_success(self, notification_id: str):
         try:
-            await self.mongo[self.notification_collection].update_one(
-                filter={"_id": ObjectId(notification_id)},
-                update={
+            await self.write_status(
+                notification_id,
+                {
                     "$set": {
                         "status": NotificationStatusEnum.SUCCESS,
                         "updated_at": datetime.now(tz=timezone.utc),
@@ -59,37 +121,127 @@ class BaseSender(ABC):
         except PyMongoError:
             logger.exception(f"failed to update notificatio status {notification_id}")
 
-    async def proccess_retry(self, notification_id: str):
+    async def proccess_retry(self, notification: NotificationQueue):
+        """
+        Увеличивает счетчик повторов в базе и по его новому значению назначает
+        следующую попытку или статус FAILED одним атомарным обновлением, чтобы
+        планировщик не увидел нотификацию с новым счетчиком и без задержки.
+        Счетчик из сообщения не используется: он устаревает при повторной
+        публикации и доставке
+        """
         try:
-            notification_dict = await self.mongo[self.notification_collection].find_one(
-                {"_id": ObjectId(notification_id)}
+            document = await self.mongo[
+                self.notification_collection
+            ].find_one_and_update(
+                {"_id": ObjectId(notification.notification_id)},
+                retry_update(datetime.now(tz=timezone.utc)),
+                projection={"retry_count": 1, "status": 1, "next_attempt_at": 1},
+                return_document=ReturnDocument.AFTER,
             )
         except PyMongoError:
-            logger.exception(f"failed to get notification from db {notification_id}")
+            logger.exception(
+                f"failed to update notification status {notification.notification_id}"
+            )
             raise
-        notification_db = NotificationDB.model_validate(notification_dict)
-        retry_count = notification_db.retry_count + 1
-        notification_db.retry_count += 1
-        notification_db.updated_at = datetime.now(tz=timezone.utc)
+        if document is None:
+            raise NotificationNotFound(notification.notification_id)
+
         logger.info(
-            f"setting retry count {retry_count} for notification {notification_db}"
+            f"setting retry count {document['retry_count']} for notification "
+            f"{notification.notification_id}, "
+            f"next attempt at {document['next_attempt_at']}"
         )
-        if retry_count >= settings.notification_retry_limit:
-            notification_db.status = NotificationStatusEnum.FAILED
+        if document["status"] == NotificationStatusEnum.FAILED:
             logger.info(
-                f"retry count for notification {notification_db} exceeded limit,"
-                "setting as {NotificationStatusEnum.FAILED}"
+                f"retry count for notification {notification.notification_id} "
+                f"exceeded limit, setting as {NotificationStatusEnum.FAILED}"
             )
+
+    async def postpone(self, notification: NotificationQueue, delay: float):
+        """Откладывает отправку без увеличения счетчика повторов"""
+        now = datetime.now(tz=timezone.utc)
         try:
-            await self.mongo[self.notification_collection].replace_one(
-                filter={"_id": ObjectId(notification_id)},
-                replacement=notification_db.model_dump(),
+            await self.write_status(
+                notification.notification_id,
+                {
+                    "$set": {
+                        "updated_at": now,
+                        "next_attempt_at": now + timedelta(seconds=delay),
+                    }
+                },
             )
         except PyMongoError:
-            logger.exception(f"failed to update notification status {notification_db}")
+            logger.exception(
+                f"failed to postpone notification {notification.notification_id}"
+            )
             raise
 
 
+def is_withdrawn(document: dict) -> bool:
+    """Нотификация отменена или перенесена на более позднее время"""
+    if document.get("status") == NotificationStatusEnum.CANCELLED:
+        return True
+    send_date = document.get("send_date")
+    if send_date is None:
+        return False
+    if send_date.tzinfo is None:
+        send_date = send_date.replace(tzinfo=timezone.utc)
+    return send_date > datetime.now(tz=timezone.utc)
+
+
+def retry_delay(retry_count: int) -> timedelta:
+    """
+    Экспоненциальная задержка перед повторной отправкой со случайным разбросом,
+    чтобы повторы не приходили на почтовый сервер одной пачкой
+    """
+    delay = min(
+        settings.notification_retry_backoff_max,
+        settings.notification_retry_backoff_base * 2 ** (retry_count - 1),
+    )
+    return timedelta(seconds=random.uniform(delay / 2, delay))
+
+
+def retry_update(now: datetime) -> list[dict]:
+    """
+    Обновление-конвейер повтора. Первая стадия увеличивает счетчик, вторая
+    по его новому значению выбирает время следующей попытки и ставит FAILED
+    при превышении лимита. Время попытки со случайным разбросом вычисляется
+    здесь для каждого значения счетчика до лимита
+    """
+    limit = settings.notification_retry_limit
+    attempts = [now + retry_delay(count) for count in range(1, max(limit, 1) + 1)]
+    return [
+        {
+            "$set": {
+                "retry_count": {"$add": [{"$ifNull": ["$retry_count", 0]}, 1]},
+                "updated_at": now,
+            }
+        },
+        {
+            "$set": {
+                "next_attempt_at": {
+                    "$arrayElemAt": [
+                        attempts,
+                        {
+                            "$min": [
+                                {"$subtract": ["$retry_count", 1]},
+                                len(attempts) - 1,
+                            ]
+                        },
+                    ]
+                },
+                "status": {
+                    "$cond": [
+                        {"$gte": ["$retry_count", limit]},
+                        NotificationStatusEnum.FAILED,
+                        "$status",
+                    ]
+                },
+            }
+        },
+    ]
+
+
 # Реестр обработчиков событий, чтобы не делать if/else
 NOTIFICATION_SENDER_REGISTRY: dict[str, type[BaseSender]] = {}
 
@@ -108,56 +260,41 @@ def register_processor(channel: ChannelEnum):
 class EmailSender(BaseSender):
     """Отправщик почты"""
 
-    def __init__(
-        self,
-        mongo_db: AsyncIOMotorDatabase,
-        event_collection: str,
-        notification_collection: str,
-    ) -> None:
-        super().__init__(mongo_db, event_collection, notification_collection)
-
-        self.smtp_host = settings.email.host
-        self.smtp_port = settings.email.port
-        self.username = settings.email.username
-        self.password = settings.email.password
-        self.smtp_server: smtplib.SMTP = self.smtp_connection()
-
-    def smtp_connection(self) -> smtplib.SMTP:
-        smtp_server = smtplib.SMTP(self.smtp_host, self.smtp_port)
-        # mailhog не поддерживает TLS
-        # smtp_server.starttls()
-        smtp_server.login(self.username, self.password)
-        return smtp_server
-
-    def send_email_sync(self, message: str, email_data: EmailData):
+    def build_message(self, message: str, email_data: EmailData) -> EmailMessage:
         msg = EmailMessage()
-        from_email = settings.email.sender_address
-        to_email = email_data.email
-
-        msg["From"] = from_email
-        msg["To"] = ",".join([to_email])
+        msg["From"] = settings.email.sender_address
+        msg["To"] = ",".join([email_data.email])
         msg["Subject"] = email_data.subject
         msg.add_alternative(message, subtype="html")
-        try:
-            self.smtp_server.sendmail(from_email, [to_email], msg.as_string())
-        except smtplib.SMTPServerDisconnected:
-            # пробуем еще раз с передполключением если долгоживующее smtp подключение
-            # было разорвано,все остальные проблемы отправки будут обработаны механизмом
-            # переотправки уведомлений в schedule_worker сервисе
-            if self.smtp_server:
-                self.smtp_server.quit()
-            self.smtp_server = self.smtp_connection()
-            self.smtp_server.sendmail(from_email, [to_email], msg.as_string())
+        return msg
 
     async def send_email(self, message: str, email_data: EmailData) -> None:
-        await asyncio.to_thread(self.send_email_sync, message, email_data)
+        msg = self.build_message(message, email_data)
+        await delivery.delivery_scheduler.submit(
+            delivery.get_domain(email_data.email),
+            partial(
+                smtp_pool.smtp_pool.sendmail,
+                settings.email.sender_address,
+                [email_data.email],
+                msg.as_string(),
+            ),
+        )
 
     async def process(self, notification: NotificationQueue) -> None:
         email_data = EmailData.model_validate(notification.data)
+        message = await self.get_message(notification)
+        if message is None:
+            return
         try:
-            await self.send_email(notification.message, email_data)
-        except smtplib.SMTPException:
-            await self.proccess_retry(notification.notification_id)
+            if notification.personalized or settings.email.bulk_max_recipients <= 1:
+                await self.send_email(message, email_data)
+            else:
+                await bulk.bulk_batcher.send(message, email_data)
+        except delivery.DomainBusy as error:
+            logger.info(f"{error}, postponing notification {notification}")
+            await self.postpone(notification, error.retry_after)
+        except (smtplib.SMTPException, OSError):
+            await self.proccess_retry(notification)
         else:
             await self.set_success(notification.notification_id)
             logger.info(f"notification {notification} succesfully sent")
@@ -165,8 +302,52 @@ class EmailSender(BaseSender):
 
 @register_processor(ChannelEnum.WEBSOCKET)
 class WebsockerSender(BaseSender):
-    """Подозрительно быстрый отправщик в вебсокеты"""
+    """
+    Отправщик в вебсокеты: публикует уведомление в fanout exchange,
+    узлы websocket шлюза доставляют его подключенным клиентам пользователя
+    """
 
     async def process(self, notification: NotificationQueue) -> None:
-        await self.set_success(notification.notification_id)
-        logger.info(f"sent message to websocket {notification.message}")
+        websocket_data = WebsocketData.model_validate(notification.data)
+        message = await self.get_message(notification)
+        if message is None:
+            return
+        try:
+            await rabbitmq.publish_to_exchange(
+                {
+                    "notification_id": notification.notification_id,
+                    "user_id": websocket_data.user_id,
+                    "message": message,
+                },
+                settings.rabbitmq_exchange_websocket,
+            )
+        except (AMQPError, ConnectionError):
+            logger.exception(
+                f"failed to publish notification {notification.notification_id}"
+            )
+            await self.proccess_retry(notification)
+        else:
+            await self.set_success(notification.notification_id)
+            await self.count_in_inbox(
+                notification.notification_id, websocket_data.user_id
+            )
+            logger.info(f"notification {notification} sent to websocket gateway")
+
+    async def count_in_inbox(self, notification_id: str, user_id: str) -> None:
+        """
+        Отложенные нотификации попадают в счетчик непрочитанных при доставке.
+        Нотификации, учтенные при сохранении, повторно не считаются
+        """
+        try:
+            result = await self.mongo[self.notification_collection].update_one(
+                {"_id": ObjectId(notification_id), "inbox_counted": False},
+                {"$set": {"inbox_counted": True}},
+            )
+            if result.modified_count:
+                await self.mongo[settings.mongo.inbox_counter_collection].update_one(
+                    {"_id": user_id}, {"$inc": {"unread": 1}}, upsert=True
+                )
+        except PyMongoError:
+            logger.exception(
+                f"failed to count notification {notification_id} in the inbox"
+            )
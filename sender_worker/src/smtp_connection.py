@@ -0,0 +1,105 @@
+import asyncio
+import smtplib
+import time
+from abc import ABC, abstractmethod
+
+
+class BaseSMTPConnection(ABC):
+    """Базовый класс SMTP подключения из пула"""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: str,
+        timeout: float,
+        starttls: bool = False,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.starttls = starttls
+
+        self.sent_count = 0
+        self.last_used = time.monotonic()
+        # начата передача текста письма: после разрыва подключения сервер мог
+        # письмо принять, и повторная отправка привела бы к дублю
+        self.data_started = False
+
+    @abstractmethod
+    async def connect(self) -> None:
+        """Подключение, STARTTLS и авторизация"""
+
+    @abstractmethod
+    async def noop(self) -> bool:
+        """Проверка подключения"""
+
+    @abstractmethod
+    async def sendmail(
+        self, from_addr: str, to_addrs: list[str], msg: str
+    ) -> dict[str, tuple[int, bytes]]:
+        """
+        Отправка письма, возвращает отклоненных получателей
+        как smtplib.SMTP.sendmail
+        """
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Закрытие подключения"""
+
+
+class TrackedSMTP(smtplib.SMTP):
+    """smtplib.SMTP, запоминающий начало передачи текста письма"""
+
+    data_started = False
+
+    def data(self, msg: bytes | str) -> tuple[int, bytes]:
+        self.data_started = True
+        return super().data(msg)
+
+
+class ThreadedSMTPConnection(BaseSMTPConnection):
+    """Подключение smtplib, блокирующие вызовы выполняются в пуле потоков"""
+
+    smtp: TrackedSMTP | None = None
+
+    def _connect_sync(self) -> None:
+        smtp = TrackedSMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            # mailhog не поддерживает TLS
+            if self.starttls:
+                smtp.starttls()
+            smtp.login(self.username, self.password)
+        except BaseException:
+            smtp.close()
+            raise
+        self.smtp = smtp
+
+    async def connect(self) -> None:
+        await asyncio.to_thread(self._connect_sync)
+
+    async def noop(self) -> bool:
+        code, _ = await asyncio.to_thread(self.smtp.noop)
+        return code == 250
+
+    async def sendmail(
+        self, from_addr: str, to_addrs: list[str], msg: str
+    ) -> dict[str, tuple[int, bytes]]:
+        self.smtp.data_started = False
+        try:
+            return await asyncio.to_thread(
+                self.smtp.sendmail, from_addr, to_addrs, msg
+            )
+        finally:
+            self.data_started = self.smtp.data_started
+
+    async def close(self) -> None:
+        if self.smtp is None:
+            return
+        try:
+            await asyncio.to_thread(self.smtp.quit)
+        except (smtplib.SMTPException, OSError):
+            self.smtp.close()
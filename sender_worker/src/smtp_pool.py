@@ -0,0 +1,183 @@
+import asyncio
+import smtplib
+import time
+from collections import deque
+from contextlib import asynccontextmanager, suppress
+from logging import getLogger
+from typing import AsyncIterator, Callable
+
+from aiosmtp import AsyncSMTPConnection
+from config import settings
+from smtp_connection import BaseSMTPConnection, ThreadedSMTPConnection
+
+logger = getLogger()
+
+SMTPConnectionFactory = Callable[[], BaseSMTPConnection]
+
+
+class SMTPConnectionPool:
+    """
+    Пул долгоживущих SMTP подключений процесса.
+    Простаивающие подключения проверяются NOOP, разорванные переоткрываются,
+    после max_messages отправок подключение закрывается и заменяется новым.
+    Каждое используемое подключение, в том числе проверяемое keepalive,
+    занимает слот, поэтому открытых подключений не больше size
+    """
+
+    def __init__(
+        self,
+        connection_factory: SMTPConnectionFactory,
+        size: int,
+        keepalive_interval: float,
+        max_messages: int,
+    ) -> None:
+        self.connection_factory = connection_factory
+        self.size = size
+        self.keepalive_interval = keepalive_interval
+        self.max_messages = max_messages
+
+        self._slots = asyncio.Semaphore(size)
+        # от давно простаивающих к недавно освобожденным
+        self._idle: deque[BaseSMTPConnection] = deque()
+        self._keepalive_task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._keepalive_task = asyncio.create_task(self._keepalive())
+
+    async def close(self) -> None:
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._keepalive_task
+        while self._idle:
+            await self._idle.pop().close()
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[BaseSMTPConnection]:
+        async with self._slots:
+            connection = await self._get_connection()
+            try:
+                yield connection
+            except (smtplib.SMTPServerDisconnected, OSError):
+                await connection.close()
+                raise
+            except BaseException:
+                await self._release(connection)
+                raise
+            else:
+                await self._release(connection)
+
+    async def sendmail(
+        self, from_addr: str, to_addrs: list[str], msg: str
+    ) -> dict[str, tuple[int, bytes]]:
+        """
+        Отправка письма через подключение из пула. Если долгоживущее подключение
+        было разорвано сервером до передачи текста письма, пробуем еще раз
+        через новое, все остальные проблемы отправки обрабатываются механизмом
+        переотправки уведомлений
+        """
+        connection: BaseSMTPConnection | None = None
+        try:
+            async with self.acquire() as connection:
+                return await self._send(connection, from_addr, to_addrs, msg)
+        except smtplib.SMTPServerDisconnected:
+            if connection is not None and connection.data_started:
+                raise
+            logger.info("smtp connection was closed by server, reconnecting")
+        async with self.acquire() as connection:
+            return await self._send(connection, from_addr, to_addrs, msg)
+
+    async def _send(
+        self,
+        connection: BaseSMTPConnection,
+        from_addr: str,
+        to_addrs: list[str],
+        msg: str,
+    ) -> dict[str, tuple[int, bytes]]:
+        connection.sent_count += 1
+        connection.last_used = time.monotonic()
+        return await connection.sendmail(from_addr, to_addrs, msg)
+
+    async def _get_connection(self) -> BaseSMTPConnection:
+        while self._idle:
+            connection = self._idle.pop()
+            if not self._is_stale(connection) or await self._is_alive(connection):
+                return connection
+
+        connection = self.connection_factory()
+        try:
+            await connection.connect()
+        except BaseException:
+            # подключение могло открыться до ошибки STARTTLS или авторизации
+            await connection.close()
+            raise
+        logger.info(f"opened smtp connection to {connection.host}:{connection.port}")
+        return connection
+
+    async def _release(self, connection: BaseSMTPConnection) -> None:
+        if connection.sent_count >= self.max_messages or len(self._idle) >= self.size:
+            await connection.close()
+            return
+        self._idle.append(connection)
+
+    def _is_stale(self, connection: BaseSMTPConnection) -> bool:
+        return time.monotonic() - connection.last_used >= self.keepalive_interval
+
+    async def _is_alive(self, connection: BaseSMTPConnection) -> bool:
+        try:
+            alive = await connection.noop()
+        except (smtplib.SMTPException, OSError):
+            alive = False
+        if alive:
+            connection.last_used = time.monotonic()
+        else:
+            await connection.close()
+        return alive
+
+    async def check_idle(self) -> None:
+        """
+        Проверяет NOOP подключения, простаивающие дольше keepalive_interval,
+        начиная с самого давнего. Проверка занимает слот, как отправка
+        """
+        while self._idle and self._is_stale(self._idle[0]):
+            async with self._slots:
+                # пока ждали слот, подключение могли взять для отправки
+                if not self._idle or not self._is_stale(self._idle[0]):
+                    return
+                connection = self._idle.popleft()
+                if await self._is_alive(connection):
+                    await self._release(connection)
+
+    async def _keepalive(self) -> None:
+        """Периодически проверяет простаивающие подключения NOOP"""
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            await self.check_idle()
+
+
+smtp_pool: SMTPConnectionPool | None = None
+
+
+def init_smtp_pool() -> SMTPConnectionPool:
+    connection_classes: dict[str, type[BaseSMTPConnection]] = {
+        "thread": ThreadedSMTPConnection,
+        "asyncio": AsyncSMTPConnection,
+    }
+    connection_class = connection_classes[settings.email.transport]
+
+    def connection_factory() -> BaseSMTPConnection:
+        return connection_class(
+            host=settings.email.host,
+            port=settings.email.port,
+            username=settings.email.username,
+            password=settings.email.password,
+            timeout=settings.email.timeout,
+            starttls=settings.email.starttls,
+        )
+
+    return SMTPConnectionPool(
+        connection_factory,
+        size=settings.email.pool_size,
+        keepalive_interval=settings.email.keepalive_interval,
+        max_messages=settings.email.max_messages_per_connection,
+    )
@@ -0,0 +1,119 @@
+import asyncio
+from logging import getLogger
+
+from bson.objectid import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from config import settings
+
+logger = getLogger()
+
+
+class StatusWriteBuffer:
+    """
+    Буфер записи статусов нотификаций. Переходы статусов собираются в
+    неупорядоченный bulk_write, который выполняется при наборе batch_size
+    обновлений или через flush_interval секунд после первого из них.
+    Вызывающий ждет, пока его пачка не будет записана, поэтому подтверждение
+    сообщения в RabbitMQ отправляется только после записи статуса
+    """
+
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection,
+        batch_size: int,
+        flush_interval: float,
+    ) -> None:
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._pending: list[tuple[UpdateOne, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._writes: set[asyncio.Task] = set()
+
+    async def update(self, notification_id: str, update: dict) -> None:
+        """Добавляет обновление нотификации в пачку и ждет ее записи"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(
+            (UpdateOne({"_id": ObjectId(notification_id)}, update), future)
+        )
+        if len(self._pending) >= self.batch_size:
+            self._start_write()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.flush_interval, self._start_write
+            )
+        await future
+
+    async def flush(self) -> None:
+        """Записывает накопленные обновления и ждет завершения всех записей"""
+        self._start_write()
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    def _start_write(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        write = asyncio.create_task(self._write(batch))
+        self._writes.add(write)
+        write.add_done_callback(self._writes.discard)
+
+    async def write(self, updates: list[tuple[str, dict]]) -> None:
+        """
+        Записывает обновления одним bulk_write сразу, минуя пачку.
+        Ошибки записи только логируются
+        """
+        if updates:
+            await self._bulk_write(
+                [
+                    UpdateOne({"_id": ObjectId(notification_id)}, update)
+                    for notification_id, update in updates
+                ]
+            )
+
+    async def _write(self, batch: list[tuple[UpdateOne, asyncio.Future]]) -> None:
+        failed = await self._bulk_write([operation for operation, _ in batch])
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if index in failed:
+                future.set_exception(failed[index])
+            else:
+                future.set_result(None)
+
+    async def _bulk_write(self, operations: list[UpdateOne]) -> dict[int, PyMongoError]:
+        """Возвращает ошибки записи по индексам операций"""
+        failed: dict[int, PyMongoError] = {}
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as error:
+            for write_error in error.details.get("writeErrors", []):
+                failed[write_error["index"]] = PyMongoError(write_error["errmsg"])
+            logger.error(f"failed to write {len(failed)} notification statuses")
+        except PyMongoError as error:
+            logger.exception(
+                f"failed to write {len(operations)} notification statuses"
+            )
+            failed = dict.fromkeys(range(len(operations)), error)
+        else:
+            logger.debug(f"written {len(operations)} notification statuses")
+        return failed
+
+
+status_buffer: StatusWriteBuffer | None = None
+
+
+def init_status_buffer(collection: AsyncIOMotorCollection) -> StatusWriteBuffer:
+    return StatusWriteBuffer(
+        collection,
+        batch_size=settings.status_write_batch_size,
+        flush_interval=settings.status_write_flush_interval,
+    )
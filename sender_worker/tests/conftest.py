@@ -0,0 +1,25 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+# модули воркера импортируются без пакета, как в контейнере
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+# настройки без значений по умолчанию, к брокеру тесты не подключаются
+for name, value in {
+    "RABBITMQ_USERNAME": "guest",
+    "RABBITMQ_PASSWORD": "guest",
+    "RABBITMQ_QUEUE_NOTIFICATIONS": "notifications",
+    "RABBITMQ_DELIVERY_MODE": "2",
+    "RABBITMQ_HOST": "localhost",
+    "RABBITMQ_PORT": "5672",
+}.items():
+    os.environ.setdefault(name, value)
+
+
+@pytest.fixture
+def mongo_db():
+    return AsyncMongoMockClient()["notifications"]
@@ -0,0 +1,151 @@
+import asyncio
+import smtplib
+
+import pytest
+
+from aiosmtp import AsyncSMTPConnection, prepare_data
+
+GREETING = b"220 mail.example.com ESMTP\r\n"
+EHLO_REPLY = b"250-mail.example.com\r\n250-PIPELINING\r\n250 AUTH PLAIN LOGIN\r\n"
+
+
+class Writer:
+    """Запоминает отправленные серверу пакеты"""
+
+    def __init__(self) -> None:
+        self.packets: list[bytes] = []
+        self.closed = False
+
+    def write(self, data: bytes) -> None:
+        self.packets.append(data)
+
+    async def drain(self) -> None:
+        """Буфера нет, все записано сразу"""
+
+    def close(self) -> None:
+        self.closed = True
+
+    async def wait_closed(self) -> None:
+        """Закрывается сразу"""
+
+
+def server_replies(*replies: bytes) -> asyncio.StreamReader:
+    reader = asyncio.StreamReader()
+    reader.feed_data(b"".join(replies))
+    reader.feed_eof()
+    return reader
+
+
+def make_connection(
+    reader: asyncio.StreamReader, writer: Writer, pipelining: bool = True
+) -> AsyncSMTPConnection:
+    connection = AsyncSMTPConnection(
+        "mail.example.com", 25, "user", "password", timeout=1
+    )
+    connection.reader, connection.writer = reader, writer
+    connection.extensions = {"pipelining": ""} if pipelining else {}
+    return connection
+
+
+@pytest.fixture
+def open_connection(monkeypatch):
+    writer = Writer()
+
+    def serve(*replies: bytes) -> Writer:
+        async def open_stream(host: str, port: int):
+            return server_replies(*replies), writer
+
+        monkeypatch.setattr(asyncio, "open_connection", open_stream)
+        return writer
+
+    return serve
+
+
+def test_data_is_dot_stuffed():
+    assert prepare_data("Hi\n.hidden\r\nend") == b"Hi\r\n..hidden\r\nend\r\n.\r\n"
+
+
+@pytest.mark.asyncio
+async def test_multiline_ehlo_reply_is_parsed(open_connection):
+    open_connection(GREETING, EHLO_REPLY, b"235 2.7.0 Accepted\r\n")
+    connection = AsyncSMTPConnection(
+        "mail.example.com", 25, "user", "password", timeout=1
+    )
+
+    await connection.connect()
+
+    assert connection.extensions == {"pipelining": "", "auth": "PLAIN LOGIN"}
+
+
+@pytest.mark.asyncio
+async def test_failed_auth_closes_transport(open_connection):
+    writer = open_connection(GREETING, EHLO_REPLY, b"535 5.7.8 Bad credentials\r\n")
+    connection = AsyncSMTPConnection(
+        "mail.example.com", 25, "user", "password", timeout=1
+    )
+
+    with pytest.raises(smtplib.SMTPAuthenticationError):
+        await connection.connect()
+
+    assert writer.closed
+    assert connection.writer is None
+
+
+@pytest.mark.asyncio
+async def test_envelope_is_pipelined():
+    writer = Writer()
+    reader = server_replies(
+        b"250 sender ok\r\n",
+        b"250 first ok\r\n",
+        b"550 5.1.1 no such user\r\n",
+        b"354 go ahead\r\n",
+        b"250 queued\r\n",
+    )
+    connection = make_connection(reader, writer)
+
+    refused = await connection.sendmail(
+        "from@example.com", ["first@example.com", "second@example.com"], "Hi"
+    )
+
+    assert refused == {"second@example.com": (550, b"5.1.1 no such user")}
+    assert writer.packets == [
+        b"MAIL FROM:<from@example.com>\r\n"
+        + b"RCPT TO:<first@example.com>\r\n"
+        + b"RCPT TO:<second@example.com>\r\n"
+        + b"DATA\r\n",
+        b"Hi\r\n.\r\n",
+    ]
+    assert connection.data_started
+
+
+@pytest.mark.asyncio
+async def test_refused_recipients_skip_data():
+    writer = Writer()
+    reader = server_replies(
+        b"250 sender ok\r\n",
+        b"550 5.1.1 no such user\r\n",
+        b"250 reset\r\n",
+    )
+    connection = make_connection(reader, writer, pipelining=False)
+
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        await connection.sendmail("from@example.com", ["to@example.com"], "Hi")
+
+    assert writer.packets == [
+        b"MAIL FROM:<from@example.com>\r\n",
+        b"RCPT TO:<to@example.com>\r\n",
+        b"RSET\r\n",
+    ]
+    assert not connection.data_started
+
+
+@pytest.mark.asyncio
+async def test_disconnect_before_data_is_not_sent():
+    writer = Writer()
+    reader = server_replies(b"250 sender ok\r\n")
+    connection = make_connection(reader, writer, pipelining=False)
+
+    with pytest.raises(smtplib.SMTPServerDisconnected):
+        await connection.sendmail("from@example.com", ["to@example.com"], "Hi")
+
+    assert not connection.data_started
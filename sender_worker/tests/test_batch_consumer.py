@@ -0,0 +1,191 @@
+import asyncio
+
+import orjson
+import pytest
+
+import batch_consumer
+from batch_consumer import BatchConsumer
+from models import ChannelEnum, NotificationQueue
+
+
+class Message:
+    content_type = "application/json"
+    content_encoding = None
+    headers = None
+
+    def __init__(self, delivery_tag: int, body: bytes | None = None) -> None:
+        self.delivery_tag = delivery_tag
+        self.body = body or orjson.dumps(
+            {
+                "message": "message",
+                "channel": ChannelEnum.EMAIL,
+                "data": {"email": "user@example.com", "subject": "subject"},
+                "notification_id": str(delivery_tag),
+            }
+        )
+        self.acks: list[bool] = []
+        self.rejected = False
+
+    async def ack(self, multiple: bool = False) -> None:
+        self.acks.append(multiple)
+
+    async def reject(self, requeue: bool = False) -> None:
+        self.rejected = True
+
+
+class Consumer(BatchConsumer):
+    """Потребитель с подмененной отправкой пачки"""
+
+    def __init__(self, batch_size: int, failed: set[int] = frozenset()) -> None:
+        super().__init__(batch_size=batch_size, batch_interval=60)
+        self.failed = failed
+        self.error: Exception | None = None
+        self.sent: list[list[str]] = []
+
+    async def _send(self, batch) -> set[int]:
+        if self.error is not None:
+            raise self.error
+        self.sent.append([notification.notification_id for _, notification in batch])
+        return {message.delivery_tag for message, _ in batch} & self.failed
+
+
+async def receive(consumer: BatchConsumer, messages: list[Message]) -> None:
+    for message in messages:
+        await consumer.on_message(message)
+
+
+@pytest.mark.asyncio
+async def test_batch_is_acknowledged_with_one_multiple_ack():
+    consumer = Consumer(batch_size=3)
+    messages = [Message(tag) for tag in range(1, 4)]
+
+    await receive(consumer, messages)
+    await consumer.flush()
+
+    assert consumer.sent == [["1", "2", "3"]]
+    assert [message.acks for message in messages] == [[], [], [True]]
+    assert consumer._unacked == set()
+
+
+@pytest.mark.asyncio
+async def test_batch_is_acknowledged_individually_while_earlier_batch_is_unacked():
+    consumer = Consumer(batch_size=2)
+    messages = [Message(tag) for tag in range(1, 4)]
+    # сообщение другой пачки еще обрабатывается
+    consumer._unacked.add(0)
+
+    await receive(consumer, messages)
+    await consumer.flush()
+
+    assert [message.acks for message in messages] == [[False], [False], [False]]
+    assert consumer._unacked == {0}
+
+
+@pytest.mark.asyncio
+async def test_later_unacked_messages_allow_multiple_ack():
+    consumer = Consumer(batch_size=2)
+    messages = [Message(tag) for tag in range(1, 4)]
+
+    await receive(consumer, messages)
+    await asyncio.gather(*consumer._batches)
+
+    assert [message.acks for message in messages] == [[], [True], []]
+    assert consumer._unacked == {3}
+    await consumer.flush()
+    assert messages[2].acks == [True]
+
+
+@pytest.mark.asyncio
+async def test_failed_messages_are_rejected():
+    consumer = Consumer(batch_size=3, failed={2})
+    messages = [Message(tag) for tag in range(1, 4)]
+
+    await receive(consumer, messages)
+    await consumer.flush()
+
+    assert [message.acks for message in messages] == [[False], [], [False]]
+    assert [message.rejected for message in messages] == [False, True, False]
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_rejected_and_releases_delivery_tags():
+    consumer = Consumer(batch_size=2)
+    consumer.error = RuntimeError("status write failed")
+    messages = [Message(tag) for tag in range(1, 3)]
+
+    await receive(consumer, messages)
+    await consumer.flush()
+
+    assert all(message.rejected for message in messages)
+    assert all(not message.acks for message in messages)
+    assert consumer._unacked == set()
+
+    # следующая пачка снова подтверждается одним ack
+    consumer.error = None
+    later = [Message(tag) for tag in range(3, 5)]
+    await receive(consumer, later)
+    await consumer.flush()
+    assert [message.acks for message in later] == [[], [True]]
+
+
+@pytest.mark.asyncio
+async def test_invalid_message_is_rejected():
+    consumer = Consumer(batch_size=2)
+    message = Message(1, body=b"{}")
+
+    await consumer.on_message(message)
+
+    assert message.rejected
+    assert consumer._pending == []
+    assert consumer._unacked == set()
+
+
+@pytest.mark.asyncio
+async def test_batch_is_grouped_by_channel(mongo_db, monkeypatch):
+    processed: dict[str, list[str]] = {}
+
+    class Sender:
+        def __init__(self, **kwargs) -> None:
+            self.status_updates = []
+
+        async def process_batch(self, notifications: list[NotificationQueue]):
+            for notification in notifications:
+                processed.setdefault(notification.channel, []).append(
+                    notification.notification_id
+                )
+                self.status_updates.append((notification.notification_id, {}))
+            return [None] * len(notifications)
+
+    class StatusBuffer:
+        def __init__(self) -> None:
+            self.written = []
+
+        async def write(self, updates) -> None:
+            self.written.extend(updates)
+
+    monkeypatch.setattr(batch_consumer.mongo, "get_mongo_db", lambda _: mongo_db)
+    buffer = StatusBuffer()
+    monkeypatch.setattr(batch_consumer.status_buffer, "status_buffer", buffer)
+    monkeypatch.setattr(
+        batch_consumer,
+        "NOTIFICATION_SENDER_REGISTRY",
+        {ChannelEnum.EMAIL: Sender, ChannelEnum.WEBSOCKET: Sender},
+    )
+    consumer = BatchConsumer(batch_size=3, batch_interval=60)
+    websocket = Message(
+        2,
+        body=orjson.dumps(
+            {
+                "message": "message",
+                "channel": ChannelEnum.WEBSOCKET,
+                "data": {"user_id": "user"},
+                "notification_id": "2",
+            }
+        ),
+    )
+
+    await receive(consumer, [Message(1), websocket, Message(3)])
+    await consumer.flush()
+
+    assert processed == {ChannelEnum.EMAIL: ["1", "3"], ChannelEnum.WEBSOCKET: ["2"]}
+    assert len(buffer.written) == 3
@@ -0,0 +1,134 @@
+import asyncio
+import smtplib
+
+import pytest
+
+import delivery
+import smtp_pool
+from bulk import BulkEmailBatcher
+from models import EmailData
+
+LINGER = 60
+
+
+class DeliveryScheduler:
+    """Выполняет отправки сразу, запоминая домены"""
+
+    def __init__(self) -> None:
+        self.domains: list[str] = []
+
+    async def submit(self, domain: str, job):
+        self.domains.append(domain)
+        return await job()
+
+
+class Pool:
+    """Запоминает транзакции, отклоняет адреса из refused"""
+
+    def __init__(self) -> None:
+        self.transactions: list[list[str]] = []
+        self.refused: dict[str, tuple[int, bytes]] = {}
+        self.error: Exception | None = None
+
+    async def sendmail(
+        self, from_addr: str, to_addrs: list[str], msg: str
+    ) -> dict[str, tuple[int, bytes]]:
+        if self.error is not None:
+            raise self.error
+        self.transactions.append(to_addrs)
+        return {
+            to_addr: reply
+            for to_addr, reply in self.refused.items()
+            if to_addr in to_addrs
+        }
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    fake_scheduler = DeliveryScheduler()
+    monkeypatch.setattr(delivery, "delivery_scheduler", fake_scheduler)
+    return fake_scheduler
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    fake_pool = Pool()
+    monkeypatch.setattr(smtp_pool, "smtp_pool", fake_pool)
+    return fake_pool
+
+
+def send(batcher: BulkEmailBatcher, email: str, message: str = "Новая серия"):
+    return batcher.send(message, EmailData(email=email, subject="Новости"))
+
+
+@pytest.mark.asyncio
+async def test_recipients_are_batched_per_domain(scheduler, pool):
+    batcher = BulkEmailBatcher(max_recipients=2, linger=LINGER)
+
+    await asyncio.gather(
+        send(batcher, "first@example.com"),
+        send(batcher, "second@example.com"),
+        send(batcher, "third@example.org"),
+        send(batcher, "fourth@example.org"),
+    )
+
+    assert pool.transactions == [
+        ["first@example.com", "second@example.com"],
+        ["third@example.org", "fourth@example.org"],
+    ]
+    assert scheduler.domains == ["example.com", "example.org"]
+
+
+@pytest.mark.asyncio
+async def test_different_messages_are_not_batched(scheduler, pool):
+    batcher = BulkEmailBatcher(max_recipients=2, linger=0)
+
+    await asyncio.gather(
+        send(batcher, "first@example.com", "Первое письмо"),
+        send(batcher, "second@example.com", "Второе письмо"),
+    )
+
+    assert sorted(pool.transactions) == [
+        ["first@example.com"],
+        ["second@example.com"],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_batch_is_sent_after_linger(scheduler, pool):
+    batcher = BulkEmailBatcher(max_recipients=2, linger=0)
+
+    await send(batcher, "single@example.com")
+
+    assert pool.transactions == [["single@example.com"]]
+
+
+@pytest.mark.asyncio
+async def test_only_refused_recipients_fail(scheduler, pool):
+    pool.refused = {"refused@example.com": (550, b"no such user")}
+    batcher = BulkEmailBatcher(max_recipients=2, linger=LINGER)
+
+    accepted, refused = await asyncio.gather(
+        send(batcher, "accepted@example.com"),
+        send(batcher, "refused@example.com"),
+        return_exceptions=True,
+    )
+
+    assert accepted is None
+    assert isinstance(refused, smtplib.SMTPRecipientsRefused)
+    assert refused.recipients == {"refused@example.com": (550, b"no such user")}
+    assert len(pool.transactions) == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_transaction_fails_all_recipients(scheduler, pool):
+    pool.error = smtplib.SMTPServerDisconnected("closed by server")
+    batcher = BulkEmailBatcher(max_recipients=2, linger=LINGER)
+
+    outcomes = await asyncio.gather(
+        send(batcher, "first@example.com"),
+        send(batcher, "second@example.com"),
+        return_exceptions=True,
+    )
+
+    assert outcomes == [pool.error, pool.error]
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+from bson.objectid import ObjectId
+
+from claim_check import MessageLoader
+
+
+@pytest.mark.asyncio
+async def test_requests_are_loaded_with_one_query(mongo_db, monkeypatch):
+    ids = [ObjectId() for _ in range(3)]
+    await mongo_db.notifications.insert_many(
+        [{"_id": id_, "message": f"message {index}", "status": "unsent"}
+         for index, id_ in enumerate(ids)]
+    )
+    loader = MessageLoader(mongo_db.notifications, batch_size=10, flush_interval=0.01)
+    queries = []
+    find = loader.collection.find
+
+    def counting_find(*args, **kwargs):
+        queries.append(dict(kwargs["projection"]))
+        return find(*args, **kwargs)
+
+    monkeypatch.setattr(loader.collection, "find", counting_find)
+
+    documents = await asyncio.gather(
+        loader.load(str(ids[0])),
+        loader.load(str(ids[0]), with_message=False),
+        loader.load(str(ids[1]), with_message=False),
+        loader.load(str(ObjectId())),
+    )
+
+    assert [document and document.get("message") for document in documents] == [
+        "message 0",
+        "message 0",
+        "message 1",
+        None,
+    ]
+    assert queries == [{"status": 1, "send_date": 1, "message": 1}]
+
+
+@pytest.mark.asyncio
+async def test_message_is_not_loaded_if_not_needed(mongo_db):
+    id_ = ObjectId()
+    await mongo_db.notifications.insert_one(
+        {"_id": id_, "message": "message", "status": "cancelled"}
+    )
+    loader = MessageLoader(mongo_db.notifications, batch_size=1, flush_interval=60)
+
+    document = await loader.load(str(id_), with_message=False)
+
+    assert document == {"_id": id_, "status": "cancelled"}
+
+
+@pytest.mark.asyncio
+async def test_load_error_is_passed_to_every_request(mongo_db, monkeypatch):
+    loader = MessageLoader(mongo_db.notifications, batch_size=2, flush_interval=60)
+
+    def failing_find(*args, **kwargs):
+        raise RuntimeError("mongo is down")
+
+    monkeypatch.setattr(loader.collection, "find", failing_find)
+
+    results = await asyncio.gather(
+        loader.load(str(ObjectId())),
+        loader.load(str(ObjectId())),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
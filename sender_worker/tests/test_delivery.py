@@ -0,0 +1,124 @@
+import asyncio
+import smtplib
+
+import pytest
+from pydantic import ValidationError
+
+import delivery
+from config import DomainDeliveryLimits, Settings, settings
+from delivery import AIMDLimit, DomainBusy, DomainLane, is_throttled
+
+
+def make_lane(**limits) -> DomainLane:
+    return DomainLane("example.com", DomainDeliveryLimits(**limits), lambda _: None)
+
+
+async def wait_forever() -> None:
+    await asyncio.Event().wait()
+
+
+async def stop(lane: DomainLane) -> None:
+    tasks = [lane._dispatcher, *lane._runs]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def test_queue_size_must_be_below_prefetch():
+    with pytest.raises(ValidationError):
+        Settings(rabbitmq_prefetch_count=10, delivery={"queue_size": 10})
+
+    assert Settings(rabbitmq_prefetch_count=10, delivery={"queue_size": 9})
+
+
+def test_throttling_errors():
+    assert is_throttled(smtplib.SMTPResponseException(421, b"slow down"))
+    assert is_throttled(smtplib.SMTPRecipientsRefused({"a@b.c": (450, b"later")}))
+    assert not is_throttled(smtplib.SMTPResponseException(550, b"no such user"))
+    assert not is_throttled(OSError())
+
+
+def test_aimd_limit():
+    limit = AIMDLimit(initial=4, minimum=1, maximum=5, latency_threshold=1)
+
+    # растет на единицу за окно успешных отправок
+    for _ in range(10):
+        limit.on_success(0.1)
+    assert limit.value == 5
+
+    limit.on_congestion()
+    # отправки, начатые до снижения, лимит повторно не снижают
+    limit.on_congestion()
+    assert limit.value == 2
+
+    limit.on_success(2)
+    assert limit.value == 2
+
+
+@pytest.mark.asyncio
+async def test_lane_sends_jobs_and_measures_latency():
+    lane = make_lane()
+
+    async def job() -> str:
+        await asyncio.sleep(0.01)
+        return "sent"
+
+    assert await asyncio.gather(lane.submit(job), lane.submit(job)) == ["sent", "sent"]
+    assert lane.latency >= 0.01
+    assert lane.in_flight == 0
+    await stop(lane)
+
+
+@pytest.mark.asyncio
+async def test_lane_passes_job_errors():
+    lane = make_lane()
+
+    async def job() -> None:
+        raise smtplib.SMTPResponseException(421, b"slow down")
+
+    with pytest.raises(smtplib.SMTPResponseException):
+        await lane.submit(job)
+    assert lane.limit.value == 2
+    await stop(lane)
+
+
+@pytest.mark.asyncio
+async def test_full_lane_is_busy(monkeypatch):
+    monkeypatch.setattr(settings.delivery, "queue_size", 3)
+    monkeypatch.setattr(settings.delivery, "max_drain_time", 100)
+    lane = make_lane(rate=1000, burst=1000, initial_concurrency=1)
+
+    for _ in range(3):
+        lane.submit(wait_forever)
+
+    with pytest.raises(DomainBusy):
+        lane.submit(wait_forever)
+    await stop(lane)
+
+
+@pytest.mark.asyncio
+async def test_slow_lane_is_busy_before_queue_is_full(monkeypatch):
+    monkeypatch.setattr(settings.delivery, "max_drain_time", 10)
+    lane = make_lane(rate=1, burst=1)
+
+    for _ in range(10):
+        lane.submit(wait_forever)
+    with pytest.raises(DomainBusy) as error:
+        lane.submit(wait_forever)
+
+    assert error.value.retry_after == pytest.approx(11, abs=1)
+    await stop(lane)
+
+
+@pytest.mark.asyncio
+async def test_scheduler_keeps_lane_per_domain():
+    scheduler = delivery.DeliveryScheduler()
+
+    async def job() -> int:
+        return len(scheduler._lanes)
+
+    assert await scheduler.submit("a.com", job) == 1
+    assert await scheduler.submit("b.com", job) == 2
+    assert await scheduler.submit("a.com", job) == 2
+    for lane in scheduler._lanes.values():
+        await stop(lane)
@@ -0,0 +1,68 @@
+import pytest
+from bson.objectid import ObjectId
+
+from models import ChannelEnum, NotificationQueue, TemplateRef
+from render import RenderSourceNotFound, TemplateRenderer
+
+
+@pytest.fixture
+async def renderer(mongo_db):
+    shared_context_id = ObjectId()
+    await mongo_db.templates.insert_one(
+        {"_id": "greeting@1", "source": "{{ greeting }}, {{ name }}!"}
+    )
+    await mongo_db.shared_contexts.insert_one(
+        {"_id": shared_context_id, "context": {"greeting": "Привет", "name": "все"}}
+    )
+    renderer = TemplateRenderer(
+        mongo_db, "templates", "shared_contexts", cache_size=10
+    )
+    renderer.shared_context_id = str(shared_context_id)
+    return renderer
+
+
+def notification(renderer: TemplateRenderer, **fields) -> NotificationQueue:
+    return NotificationQueue(
+        channel=ChannelEnum.EMAIL,
+        data={"email": "user@example.com", "subject": "subject"},
+        notification_id=str(ObjectId()),
+        template=TemplateRef(name="greeting", version="1"),
+        shared_context_id=renderer.shared_context_id,
+        **fields,
+    )
+
+
+@pytest.mark.asyncio
+async def test_recipient_context_overrides_shared_context(renderer):
+    message = await renderer.render(notification(renderer, context={"name": "Анна"}))
+
+    assert message == "Привет, Анна!"
+
+
+@pytest.mark.asyncio
+async def test_templates_are_loaded_once(renderer):
+    await renderer.render(notification(renderer, context={"name": "Анна"}))
+    await renderer.templates.delete_many({})
+    await renderer.shared_contexts.delete_many({})
+
+    message = await renderer.render(notification(renderer, context={"name": "Иван"}))
+
+    assert message == "Привет, Иван!"
+
+
+@pytest.mark.asyncio
+async def test_non_personalized_message_is_cached(renderer):
+    message = await renderer.render(notification(renderer, personalized=False))
+
+    assert message == "Привет, все!"
+    assert len(renderer._rendered._values) == 1
+
+
+@pytest.mark.asyncio
+async def test_missing_template(renderer):
+    with pytest.raises(RenderSourceNotFound):
+        await renderer.render(
+            notification(renderer).model_copy(
+                update={"template": TemplateRef(name="greeting", version="2")}
+            )
+        )
@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson.objectid import ObjectId
+
+from config import settings
+from models import ChannelEnum, NotificationQueue, NotificationStatusEnum
+from sender import EmailSender, NotificationNotFound, retry_delay
+
+
+@pytest.fixture
+def sender(mongo_db):
+    sender = EmailSender(
+        mongo_db=mongo_db,
+        event_collection="events",
+        notification_collection="notifications",
+    )
+    # обновления статусов копятся, как при обработке пачки
+    sender.status_updates = []
+    return sender
+
+
+def notification(notification_id: ObjectId, retry_count: int = 0) -> NotificationQueue:
+    return NotificationQueue(
+        message="message",
+        channel=ChannelEnum.EMAIL,
+        data={"email": "user@example.com", "subject": "subject"},
+        notification_id=str(notification_id),
+        retry_count=retry_count,
+    )
+
+
+@pytest.mark.parametrize("retry_count", [1, 2, 3, 10, 100])
+def test_retry_delay_doubles_up_to_maximum(retry_count):
+    delay = min(
+        settings.notification_retry_backoff_max,
+        settings.notification_retry_backoff_base * 2 ** (retry_count - 1),
+    )
+
+    for _ in range(20):
+        assert (
+            timedelta(seconds=delay / 2)
+            <= retry_delay(retry_count)
+            <= timedelta(seconds=delay)
+        )
+
+
+async def stored(mongo_db, notification_id: ObjectId) -> dict:
+    document = await mongo_db.notifications.find_one({"_id": notification_id})
+    document["next_attempt_at"] = document["next_attempt_at"].replace(
+        tzinfo=timezone.utc
+    )
+    return document
+
+
+@pytest.mark.asyncio
+async def test_retry_uses_stored_retry_count(mongo_db, sender):
+    notification_id = ObjectId()
+    await mongo_db.notifications.insert_one(
+        {"_id": notification_id, "status": "unsent", "retry_count": 1}
+    )
+    started = datetime.now(tz=timezone.utc)
+
+    # счетчик в сообщении устарел
+    await sender.proccess_retry(notification(notification_id, retry_count=0))
+
+    document = await stored(mongo_db, notification_id)
+    assert document["retry_count"] == 2
+    assert document["status"] == "unsent"
+    assert document["next_attempt_at"] - started >= timedelta(
+        seconds=settings.notification_retry_backoff_base
+    )
+
+
+@pytest.mark.asyncio
+async def test_retry_is_one_update(mongo_db, sender):
+    notification_id = ObjectId()
+    await mongo_db.notifications.insert_one(
+        {"_id": notification_id, "status": "unsent", "next_attempt_at": None}
+    )
+
+    await sender.proccess_retry(notification(notification_id))
+
+    # нотификация не бывает неотправленной с новым счетчиком и без задержки:
+    # отложенных обновлений статуса не остается
+    assert sender.status_updates == []
+    document = await stored(mongo_db, notification_id)
+    assert document["retry_count"] == 1
+    assert document["next_attempt_at"] > datetime.now(tz=timezone.utc)
+
+
+@pytest.mark.asyncio
+async def test_retry_limit_fails_notification(mongo_db, sender):
+    notification_id = ObjectId()
+    await mongo_db.notifications.insert_one(
+        {
+            "_id": notification_id,
+            "status": "unsent",
+            "retry_count": settings.notification_retry_limit - 1,
+        }
+    )
+
+    await sender.proccess_retry(notification(notification_id))
+
+    document = await stored(mongo_db, notification_id)
+    assert document["status"] == NotificationStatusEnum.FAILED
+    assert document["retry_count"] == settings.notification_retry_limit
+
+
+@pytest.mark.asyncio
+async def test_retry_of_missing_notification(sender):
+    with pytest.raises(NotificationNotFound):
+        await sender.proccess_retry(notification(ObjectId()))
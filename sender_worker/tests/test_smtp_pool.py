@@ -0,0 +1,196 @@
+import asyncio
+import smtplib
+import time
+
+import pytest
+
+from smtp_connection import BaseSMTPConnection
+from smtp_pool import SMTPConnectionPool
+
+KEEPALIVE_INTERVAL = 30
+
+
+class FakeConnection(BaseSMTPConnection):
+    """Подключение к SMTP серверу в памяти"""
+
+    def __init__(self) -> None:
+        super().__init__("localhost", 1025, "user", "password", timeout=1)
+        self.opened = False
+        self.alive = True
+        self.fail_login = False
+        # сервер разрывает подключение, получив текст письма
+        self.drop_after_data = False
+        self.sent: list[list[str]] = []
+
+    async def connect(self) -> None:
+        self.opened = True
+        if self.fail_login:
+            raise smtplib.SMTPAuthenticationError(535, b"bad credentials")
+
+    async def noop(self) -> bool:
+        return self.alive
+
+    async def sendmail(
+        self, from_addr: str, to_addrs: list[str], msg: str
+    ) -> dict[str, tuple[int, bytes]]:
+        self.data_started = False
+        if not self.alive:
+            raise smtplib.SMTPServerDisconnected("closed by server")
+        self.sent.append(to_addrs)
+        if self.drop_after_data:
+            self.data_started = True
+            raise smtplib.SMTPServerDisconnected("closed by server")
+        await asyncio.sleep(0)
+        return {}
+
+    async def close(self) -> None:
+        self.opened = False
+
+
+class ConnectionFactory:
+    def __init__(self) -> None:
+        self.connections: list[FakeConnection] = []
+        self.fail_login = False
+
+    def __call__(self) -> FakeConnection:
+        connection = FakeConnection()
+        connection.fail_login = self.fail_login
+        self.connections.append(connection)
+        return connection
+
+    @property
+    def opened(self) -> list[FakeConnection]:
+        return [connection for connection in self.connections if connection.opened]
+
+
+def make_pool(factory: ConnectionFactory, **options) -> SMTPConnectionPool:
+    pool_options = {
+        "size": 2,
+        "keepalive_interval": KEEPALIVE_INTERVAL,
+        "max_messages": 100,
+    }
+    pool_options.update(options)
+    return SMTPConnectionPool(factory, **pool_options)
+
+
+def make_idle(connection: FakeConnection) -> None:
+    connection.last_used = time.monotonic() - KEEPALIVE_INTERVAL
+
+
+@pytest.mark.asyncio
+async def test_connection_is_reused():
+    factory = ConnectionFactory()
+    pool = make_pool(factory)
+
+    await pool.sendmail("from@example.com", ["first@example.com"], "text")
+    await pool.sendmail("from@example.com", ["second@example.com"], "text")
+
+    assert len(factory.connections) == 1
+    assert factory.connections[0].sent == [
+        ["first@example.com"],
+        ["second@example.com"],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_pool_size_limits_connections():
+    factory = ConnectionFactory()
+    pool = make_pool(factory, size=2)
+
+    await asyncio.gather(
+        *(
+            pool.sendmail("from@example.com", [f"{number}@example.com"], "text")
+            for number in range(5)
+        )
+    )
+
+    assert len(factory.connections) == 2
+
+
+@pytest.mark.asyncio
+async def test_connection_is_replaced_after_max_messages():
+    factory = ConnectionFactory()
+    pool = make_pool(factory, max_messages=2)
+
+    for _ in range(3):
+        await pool.sendmail("from@example.com", ["to@example.com"], "text")
+
+    first, second = factory.connections
+    assert len(first.sent) == 2
+    assert not first.opened
+    assert len(second.sent) == 1
+
+
+@pytest.mark.asyncio
+async def test_broken_idle_connection_is_dropped():
+    factory = ConnectionFactory()
+    pool = make_pool(factory)
+    await pool.sendmail("from@example.com", ["to@example.com"], "text")
+    broken = factory.connections[0]
+    broken.alive = False
+    make_idle(broken)
+
+    await pool.sendmail("from@example.com", ["to@example.com"], "text")
+
+    assert not broken.opened
+    assert factory.opened == factory.connections[1:]
+
+
+@pytest.mark.asyncio
+async def test_disconnected_send_is_retried():
+    factory = ConnectionFactory()
+    pool = make_pool(factory)
+    await pool.sendmail("from@example.com", ["to@example.com"], "text")
+    # сервер закрыл подключение, NOOP этого еще не заметил
+    factory.connections[0].alive = False
+
+    await pool.sendmail("from@example.com", ["to@example.com"], "text")
+
+    broken, reconnected = factory.connections
+    assert not broken.opened
+    assert reconnected.sent == [["to@example.com"]]
+
+
+@pytest.mark.asyncio
+async def test_disconnect_after_data_is_not_retried():
+    factory = ConnectionFactory()
+    pool = make_pool(factory)
+    await pool.sendmail("from@example.com", ["to@example.com"], "text")
+    factory.connections[0].drop_after_data = True
+
+    # письмо могло быть принято, повтор отправил бы его дважды
+    with pytest.raises(smtplib.SMTPServerDisconnected):
+        await pool.sendmail("from@example.com", ["to@example.com"], "text")
+
+    assert len(factory.connections) == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_login_closes_connection():
+    factory = ConnectionFactory()
+    factory.fail_login = True
+    pool = make_pool(factory)
+
+    with pytest.raises(smtplib.SMTPAuthenticationError):
+        await pool.sendmail("from@example.com", ["to@example.com"], "text")
+
+    assert not factory.opened
+
+
+@pytest.mark.asyncio
+async def test_keepalive_checks_idle_connections():
+    factory = ConnectionFactory()
+    pool = make_pool(factory)
+    await asyncio.gather(
+        pool.sendmail("from@example.com", ["first@example.com"], "text"),
+        pool.sendmail("from@example.com", ["second@example.com"], "text"),
+    )
+    alive, broken = factory.connections
+    broken.alive = False
+    make_idle(alive)
+    make_idle(broken)
+
+    await pool.check_idle()
+
+    assert factory.opened == [alive]
+    assert time.monotonic() - alive.last_used < KEEPALIVE_INTERVAL
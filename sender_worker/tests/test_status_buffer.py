@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+from bson.objectid import ObjectId
+
+from status_buffer import StatusWriteBuffer
+
+
+@pytest.fixture
+def buffer(mongo_db):
+    return StatusWriteBuffer(
+        mongo_db.notifications, batch_size=3, flush_interval=60
+    )
+
+
+@pytest.mark.asyncio
+async def test_updates_are_written_in_batches(mongo_db, buffer, monkeypatch):
+    ids = [ObjectId() for _ in range(4)]
+    await mongo_db.notifications.insert_many([{"_id": id_} for id_ in ids])
+    bulk_writes = []
+    bulk_write = buffer.collection.bulk_write
+
+    async def counting_bulk_write(operations, **kwargs):
+        bulk_writes.append(len(operations))
+        return await bulk_write(operations, **kwargs)
+
+    monkeypatch.setattr(buffer.collection, "bulk_write", counting_bulk_write)
+
+    updates = [
+        asyncio.create_task(
+            buffer.update(str(id_), {"$set": {"status": "success"}})
+        )
+        for id_ in ids
+    ]
+    await asyncio.sleep(0.01)
+    # четвертое обновление ждет следующей пачки
+    assert [update.done() for update in updates] == [True, True, True, False]
+
+    await buffer.flush()
+    await asyncio.gather(*updates)
+
+    assert bulk_writes == [3, 1]
+    assert await mongo_db.notifications.count_documents({"status": "success"}) == 4
+
+
+@pytest.mark.asyncio
+async def test_update_waits_for_flush_interval(mongo_db):
+    buffer = StatusWriteBuffer(
+        mongo_db.notifications, batch_size=10, flush_interval=0.01
+    )
+    id_ = ObjectId()
+    await mongo_db.notifications.insert_one({"_id": id_})
+
+    await asyncio.wait_for(buffer.update(str(id_), {"$set": {"status": "failed"}}), 1)
+
+    assert (await mongo_db.notifications.find_one({"_id": id_}))["status"] == "failed"
@@ -0,0 +1,4 @@
+#!/usr/bin/env bash
+
+# each worker keeps its own connections and receives every notification from the fanout exchange
+gunicorn src.main:app --bind 0.0.0.0:8000 --workers 4 --worker-class uvicorn.workers.UvicornWorker --access-logfile - --error-logfile -
\ No newline at end of file
@@ -0,0 +1,83 @@
+from contextlib import suppress
+from typing import Annotated
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Query,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+
+from src.core.config import settings
+from src.services import connections
+from src.utils.jwt import CheckService, InvalidToken, validate_user_token
+from src.utils.services_constant import ServiceEnum
+
+router = APIRouter()
+
+
+async def wait_for_disconnect(websocket: WebSocket) -> None:
+    """
+    Reads the websocket until the client disconnects,
+    client messages are ignored
+    """
+    with suppress(WebSocketDisconnect, RuntimeError):
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+
+@router.websocket("/notifications")
+async def notifications(
+    websocket: WebSocket,
+    token: Annotated[str | None, Query()] = None,
+) -> None:
+    """
+    Streams notifications of the authenticated user.
+    Every websocket message is a JSON array of notifications
+    """
+    try:
+        user = validate_user_token(token or websocket.cookies.get("access_token"))
+    except InvalidToken as err:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(err))
+        return
+
+    registry = connections.connection_registry
+    if not registry.can_accept(user.user_id):
+        await websocket.close(
+            code=status.WS_1008_POLICY_VIOLATION, reason="Too many connections"
+        )
+        return
+
+    await websocket.accept()
+    connection = connections.Connection(
+        websocket,
+        user.user_id,
+        buffer_size=settings.send_buffer_size,
+        batch_size=settings.send_batch_size,
+    )
+    registry.add(connection)
+    connection.start()
+    try:
+        await wait_for_disconnect(websocket)
+    finally:
+        registry.remove(connection)
+        if not connection.closed:
+            await connection.close(status.WS_1000_NORMAL_CLOSURE)
+
+
+@router.get(
+    "/stats", dependencies=[Depends(CheckService(services=[ServiceEnum.ADMIN_PANEL]))]
+)
+async def stats() -> dict[str, int]:
+    """
+    Connections held by this process
+    """
+    registry = connections.connection_registry
+    return {
+        "users": registry.users_count,
+        "connections": registry.connections_count,
+    }
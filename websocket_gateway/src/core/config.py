@@ -0,0 +1,58 @@
+from pathlib import Path
+
+from pydantic import BaseModel
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+class MongoDBSettings(BaseModel):
+    host: str = "localhost"
+    port: int = 27017
+    db_name: str = "notifications"
+    presence_collection: str = "presence"
+
+
+class Settings(BaseSettings):
+    """
+    Service settings
+    """
+
+    project_name: str = "WebSocket Gateway"
+
+    public_key: str
+
+    rabbitmq_username: str
+    rabbitmq_password: str
+    rabbitmq_host: str
+    rabbitmq_port: int
+    rabbitmq_exchange_websocket: str = "websocket_notifications"
+
+    mongo: MongoDBSettings = MongoDBSettings()
+
+    # frames waiting to be written to one connection before it is evicted
+    send_buffer_size: int = 256
+    # max frames coalesced into one websocket message
+    send_batch_size: int = 64
+    max_connections_per_user: int = 10
+
+    # notifications are fanned out to connections in batches
+    fanout_batch_size: int = 500
+    fanout_batch_interval: float = 0.02
+
+    # users connected to the process are written to the presence collection
+    # every presence_flush_interval seconds and expire after presence_ttl
+    # seconds unless refreshed by the heartbeat
+    presence_flush_interval: float = 1
+    presence_heartbeat_interval: int = 30
+    presence_ttl: int = 90
+
+    model_config = SettingsConfigDict(
+        extra="ignore",
+        env_file=Path(__file__).resolve().parent.parent.parent / ".env",
+        env_file_encoding="utf-8",
+        env_nested_delimiter="__",
+    )
+
+
+settings = Settings()
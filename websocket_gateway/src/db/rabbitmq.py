@@ -0,0 +1,46 @@
+import aio_pika
+from aio_pika import ExchangeType
+
+from src.core.config import settings
+
+connection: aio_pika.abc.AbstractRobustConnection | None = None
+channel: aio_pika.abc.AbstractRobustChannel | None = None
+
+
+async def create_connection() -> aio_pika.abc.AbstractRobustConnection:
+    """
+    Creates RabbitMQ connection
+    """
+
+    return await aio_pika.connect_robust(
+        host=settings.rabbitmq_host,
+        port=settings.rabbitmq_port,
+        login=settings.rabbitmq_username,
+        password=settings.rabbitmq_password,
+    )
+
+
+async def create_channel(
+    _connection: aio_pika.abc.AbstractRobustConnection,
+) -> aio_pika.abc.AbstractRobustChannel:
+    """
+    Creates channel for consuming notifications
+    """
+
+    return await _connection.channel()
+
+
+async def declare_process_queue(
+    _channel: aio_pika.abc.AbstractRobustChannel,
+) -> aio_pika.abc.AbstractRobustQueue:
+    """
+    Declares an exclusive queue of this process bound to the websocket
+    fanout exchange, it is deleted by RabbitMQ when the process disconnects
+    """
+
+    exchange = await _channel.declare_exchange(
+        settings.rabbitmq_exchange_websocket, ExchangeType.FANOUT, durable=True
+    )
+    queue = await _channel.declare_queue(exclusive=True, auto_delete=True)
+    await queue.bind(exchange)
+    return queue
@@ -0,0 +1,65 @@
+from contextlib import asynccontextmanager
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+
+from src.api.v1 import websocket
+from src.core.config import settings
+from src.db import mongo, rabbitmq
+from src.services import connections, presence
+from src.services.fanout import FanoutConsumer
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    mongo.mongo = mongo.init_mongo(host=settings.mongo.host, port=settings.mongo.port)
+    presence.presence_tracker = presence.PresenceTracker(
+        mongo.get_mongo_db(settings.mongo.db_name)[settings.mongo.presence_collection],
+        flush_interval=settings.presence_flush_interval,
+        heartbeat_interval=settings.presence_heartbeat_interval,
+        ttl=settings.presence_ttl,
+    )
+    await presence.presence_tracker.ensure_indexes()
+    presence.presence_tracker.start()
+
+    connections.connection_registry = connections.ConnectionRegistry(
+        settings.max_connections_per_user, presence.presence_tracker
+    )
+    rabbitmq.connection = await rabbitmq.create_connection()
+    rabbitmq.channel = await rabbitmq.create_channel(rabbitmq.connection)
+
+    queue = await rabbitmq.declare_process_queue(rabbitmq.channel)
+    consumer = FanoutConsumer(
+        connections.connection_registry,
+        batch_size=settings.fanout_batch_size,
+        batch_interval=settings.fanout_batch_interval,
+    )
+    # notifications are transient, a lost one is still stored in MongoDB
+    await queue.consume(consumer.on_message, no_ack=True)
+    yield
+    await rabbitmq.connection.close()
+    consumer.flush()
+    await connections.connection_registry.close_all()
+    await presence.presence_tracker.close()
+    mongo.mongo.close()
+
+
+app = FastAPI(
+    version="1.0.0",
+    title=settings.project_name,
+    description="WebSocket notifications gateway for online cinema",
+    docs_url="/api/docs",
+    openapi_url="/api/docs.json",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+    contact={
+        "name": "Monty Python",
+        "email": "monty@python.com",
+    },
+)
+
+app.include_router(websocket.router, prefix="/api/v1/websocket")
+
+if __name__ == "__main__":
+    uvicorn.run("main:app", reload=True)
@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+
+
+class WebsocketNotification(BaseModel):
+    notification_id: str
+    user_id: str
+    message: str
@@ -0,0 +1,166 @@
+import asyncio
+from contextlib import suppress
+
+import orjson
+from fastapi import WebSocket, status
+
+from src.core.logger import gateway_logger
+from src.models.notification import WebsocketNotification
+from src.services.presence import PresenceTracker
+
+
+class Connection:
+    """
+    Client websocket with a bounded send buffer. Frames are written by a
+    separate task, so a slow client never blocks the fan-out; a client that
+    lets its buffer fill up is evicted
+    """
+
+    def __init__(
+        self, websocket: WebSocket, user_id: str, buffer_size: int, batch_size: int
+    ) -> None:
+        self.websocket = websocket
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.buffer: asyncio.Queue[str] = asyncio.Queue(buffer_size)
+        self.closed = False
+        self._writer: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def push(self, frame: str) -> bool:
+        """
+        Queues a frame, returns False if the buffer is full
+        """
+        try:
+            self.buffer.put_nowait(frame)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def close(self, code: int, reason: str = "") -> None:
+        self.closed = True
+        if self._writer is not None:
+            self._writer.cancel()
+        with suppress(Exception):
+            await self.websocket.close(code=code, reason=reason)
+
+    async def _write_loop(self) -> None:
+        while True:
+            frames = [await self.buffer.get()]
+            # everything queued while the previous send was in flight
+            # goes out as one websocket message
+            while len(frames) < self.batch_size and not self.buffer.empty():
+                frames.append(self.buffer.get_nowait())
+            message = ",".join(frames)
+            try:
+                await self.websocket.send_text(f"[{message}]")
+            except Exception:
+                gateway_logger.debug(f"failed to write to connection of {self.user_id}")
+                return
+
+
+class ConnectionRegistry:
+    """
+    In-memory registry of client connections of this process keyed by user
+    """
+
+    def __init__(
+        self, max_connections_per_user: int, presence: PresenceTracker | None = None
+    ) -> None:
+        self.max_connections_per_user = max_connections_per_user
+        self.presence = presence
+        self._connections: dict[str, set[Connection]] = {}
+        self._closing: set[asyncio.Task] = set()
+
+    @property
+    def users_count(self) -> int:
+        return len(self._connections)
+
+    @property
+    def connections_count(self) -> int:
+        return sum(len(connections) for connections in self._connections.values())
+
+    def is_connected(self, user_id: str) -> bool:
+        return user_id in self._connections
+
+    def can_accept(self, user_id: str) -> bool:
+        return (
+            len(self._connections.get(user_id, ()))
+            < self.max_connections_per_user
+        )
+
+    def add(self, connection: Connection) -> None:
+        if connection.user_id not in self._connections:
+            self._connections[connection.user_id] = set()
+            if self.presence is not None:
+                self.presence.user_online(connection.user_id)
+        self._connections[connection.user_id].add(connection)
+
+    def remove(self, connection: Connection) -> None:
+        connections = self._connections.get(connection.user_id)
+        if connections is None:
+            return
+        connections.discard(connection)
+        if not connections:
+            self._connections.pop(connection.user_id)
+            if self.presence is not None:
+                self.presence.user_offline(connection.user_id)
+
+    def fan_out(self, notifications: list[WebsocketNotification]) -> int:
+        """
+        Queues notifications to all connections of their users,
+        returns the number of queued frames
+        """
+        delivered = 0
+        for notification in notifications:
+            connections = self._connections.get(notification.user_id)
+            if not connections:
+                continue
+            # serialized once for all connections of the user
+            frame = orjson.dumps(
+                {
+                    "notification_id": notification.notification_id,
+                    "message": notification.message,
+                }
+            ).decode()
+            for connection in list(connections):
+                if connection.push(frame):
+                    delivered += 1
+                else:
+                    self.evict(connection)
+        return delivered
+
+    def evict(self, connection: Connection) -> None:
+        """
+        Drops a connection that doesn't read its frames fast enough
+        """
+        pending = connection.buffer.qsize()
+        gateway_logger.info(
+            f"evicting slow connection of {connection.user_id}, "
+            f"{pending} frames pending"
+        )
+        self.remove(connection)
+        close = asyncio.create_task(
+            connection.close(status.WS_1013_TRY_AGAIN_LATER, "Slow consumer")
+        )
+        self._closing.add(close)
+        close.add_done_callback(self._closing.discard)
+
+    async def close_all(self) -> None:
+        connections = [
+            connection
+            for user_connections in self._connections.values()
+            for connection in user_connections
+        ]
+        self._connections.clear()
+        await asyncio.gather(
+            *(
+                connection.close(status.WS_1001_GOING_AWAY)
+                for connection in connections
+            ),
+        )
+
+
+connection_registry: ConnectionRegistry | None = None
@@ -0,0 +1,59 @@
+import asyncio
+
+from aio_pika.abc import AbstractIncomingMessage
+from pydantic import ValidationError
+
+from src.core.logger import gateway_logger
+from src.models.notification import WebsocketNotification
+from src.services.connections import ConnectionRegistry
+from src.utils.codec import UnsupportedMessage, codec_for_message
+
+
+class FanoutConsumer:
+    """
+    Consumes notifications published by the sender and hands them to the
+    registry in batches of batch_size or every batch_interval seconds.
+    Every process receives every notification, those for users not
+    connected to this process are dropped before validation
+    """
+
+    def __init__(
+        self, registry: ConnectionRegistry, batch_size: int, batch_interval: float
+    ) -> None:
+        self.registry = registry
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self._batch: list[WebsocketNotification] = []
+        self._timer: asyncio.TimerHandle | None = None
+
+    async def on_message(self, message: AbstractIncomingMessage) -> None:
+        try:
+            codec = codec_for_message(message.content_type, message.headers)
+            raw_notification = codec.decode(message.body)
+            if not self.registry.is_connected(raw_notification.get("user_id")):
+                return
+            notification = WebsocketNotification.model_validate(raw_notification)
+        except (UnsupportedMessage, ValueError, AttributeError, ValidationError):
+            gateway_logger.exception(f"invalid websocket notification: {message.body}")
+            return
+
+        self._batch.append(notification)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.batch_interval, self.flush
+            )
+
+    def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = self._batch
+        self._batch = []
+        if batch:
+            delivered = self.registry.fan_out(batch)
+            batch_size = len(batch)
+            gateway_logger.debug(
+                f"fanned out {batch_size} notifications as {delivered} frames"
+            )
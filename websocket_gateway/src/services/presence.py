@@ -0,0 +1,117 @@
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import PyMongoError
+
+from src.core.logger import gateway_logger
+
+
+def make_node_id() -> str:
+    suffix = uuid.uuid4().hex[:8]
+    return f"{socket.gethostname()}-{os.getpid()}-{suffix}"
+
+
+class PresenceTracker:
+    """
+    Publishes users connected to this process to the presence collection.
+    Connects and disconnects are collected and written in one bulk every
+    flush_interval seconds, the heartbeat prolongs all documents of the node
+    with one update, so documents of a crashed node expire by the TTL index
+    """
+
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection,
+        flush_interval: float,
+        heartbeat_interval: int,
+        ttl: int,
+    ) -> None:
+        self.collection = collection
+        self.node_id = make_node_id()
+        self.flush_interval = flush_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.ttl = timedelta(seconds=ttl)
+        # user_id -> online, only the last change of a user matters
+        self._changes: dict[str, bool] = {}
+        self._task: asyncio.Task | None = None
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+        await self.collection.create_index([("user_id", 1), ("expires_at", 1)])
+        await self.collection.create_index("node")
+
+    def user_online(self, user_id: str) -> None:
+        self._changes[user_id] = True
+
+    def user_offline(self, user_id: str) -> None:
+        self._changes[user_id] = False
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        self._changes.clear()
+        try:
+            await self.collection.delete_many({"node": self.node_id})
+        except PyMongoError:
+            gateway_logger.exception("failed to remove presence of the node")
+
+    async def flush(self) -> None:
+        changes = self._changes
+        self._changes = {}
+        if not changes:
+            return
+
+        expires_at = datetime.now(tz=timezone.utc) + self.ttl
+        operations = [
+            UpdateOne(
+                {"_id": f"{self.node_id}:{user_id}"},
+                {
+                    "$set": {
+                        "user_id": user_id,
+                        "node": self.node_id,
+                        "expires_at": expires_at,
+                    }
+                },
+                upsert=True,
+            )
+            if online
+            else DeleteOne({"_id": f"{self.node_id}:{user_id}"})
+            for user_id, online in changes.items()
+        ]
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except PyMongoError:
+            # retried on the next flush unless the user changed state meanwhile
+            for user_id, online in changes.items():
+                self._changes.setdefault(user_id, online)
+            raise
+
+    async def heartbeat(self) -> None:
+        await self.collection.update_many(
+            {"node": self.node_id},
+            {"$set": {"expires_at": datetime.now(tz=timezone.utc) + self.ttl}},
+        )
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_heartbeat = loop.time() + self.heartbeat_interval
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if loop.time() >= next_heartbeat:
+                    next_heartbeat = loop.time() + self.heartbeat_interval
+                    await self.heartbeat()
+            except PyMongoError:
+                gateway_logger.exception("failed to update presence")
+
+
+presence_tracker: PresenceTracker | None = None
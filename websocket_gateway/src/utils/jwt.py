@@ -0,0 +1,123 @@
+from enum import Enum
+from http import HTTPStatus
+from typing import Annotated
+
+import jwt
+from fastapi import Depends
+from fastapi.exceptions import HTTPException
+from fastapi.security import APIKeyCookie
+from pydantic import BaseModel, ValidationError
+
+from src.core.config import settings
+from src.core.logger import gateway_logger
+from src.utils.services_constant import ServiceEnum
+
+LEEWAY = 30
+
+
+class TokenType(str, Enum):
+    ACCESS = "access"
+    REFRESH = "refresh"
+
+
+class TokenPayload(BaseModel):
+    iss: str
+    type: TokenType
+    iat: int
+    exp: int
+
+
+class UserTokenPayload(TokenPayload):
+    user_id: str
+
+
+class ServiceTokenPayload(TokenPayload):
+    service_name: str
+
+
+class InvalidToken(Exception):
+    """
+    Token is missing, expired or malformed
+    """
+
+
+def decode_access_token(token: str | None) -> dict:
+    """
+    Verifies the signature and expiration of an access token.
+    Refresh tokens are rejected
+    """
+    if not token:
+        raise InvalidToken("Access token is missing")
+
+    try:
+        decoded_token = jwt.decode(
+            jwt=token, key=settings.public_key, algorithms=["RS256"], leeway=LEEWAY
+        )
+    except jwt.ExpiredSignatureError:
+        gateway_logger.info("Token expires")
+        raise InvalidToken("Access token is expired")
+    except (jwt.exceptions.InvalidTokenError, ValueError) as err:
+        gateway_logger.info(f"Error while JWT decoding: {err}")
+        raise InvalidToken("Access token is invalid")
+
+    check_token_type(decoded_token)
+    return decoded_token
+
+
+def check_token_type(decoded_token: dict) -> None:
+    """
+    Rejects tokens other than access tokens
+    """
+    if decoded_token.get("type") != TokenType.ACCESS:
+        gateway_logger.info("Token is not an access token")
+        raise InvalidToken("Access token is invalid")
+
+
+def validate_user_token(token: str | None) -> UserTokenPayload:
+    """
+    Validates user JWT passed on websocket connect
+    """
+    decoded_token = decode_access_token(token)
+    try:
+        return UserTokenPayload(**decoded_token)
+    except ValidationError as err:
+        gateway_logger.info(f"Error while JWT decoding: {err}")
+        raise InvalidToken("Access token is invalid")
+
+
+def validate_service_token(token: str | None) -> ServiceTokenPayload:
+    """
+    Validates service JWT
+    """
+    decoded_token = decode_access_token(token)
+    try:
+        return ServiceTokenPayload(**decoded_token)
+    except ValidationError as err:
+        gateway_logger.info(f"Error while JWT decoding: {err}")
+        raise InvalidToken("Access token is invalid")
+
+
+cookie_scheme = APIKeyCookie(name="access_token")
+
+
+class CheckService:
+    """
+    Checks service access
+    """
+
+    def __init__(self, services: list[ServiceEnum]) -> None:
+        self.services = services
+
+    async def __call__(
+        self, jwt_token: Annotated[str, Depends(cookie_scheme)]
+    ) -> ServiceTokenPayload:
+        try:
+            access_token = validate_service_token(jwt_token)
+        except InvalidToken as err:
+            raise HTTPException(status_code=HTTPStatus.UNAUTHORIZED, detail=str(err))
+        if access_token.service_name not in self.services:
+            raise HTTPException(
+                status_code=HTTPStatus.FORBIDDEN,
+                detail="Service doesn't have required permissions",
+            )
+        return access_token
@@ -0,0 +1,8 @@
+from enum import StrEnum, auto
+
+
+class ServiceEnum(StrEnum):
+    AUTH = auto()
+    UGC = auto()
+    SCHEDULER = auto()
+    ADMIN_PANEL = auto()
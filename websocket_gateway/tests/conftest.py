@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+TOKEN_LIFETIME = 300
+RSA_EXPONENT = 65537
+RSA_KEY_SIZE = 2048
+
+signing_key = rsa.generate_private_key(
+    public_exponent=RSA_EXPONENT, key_size=RSA_KEY_SIZE
+)
+public_pem = signing_key.public_key().public_bytes(
+    serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+)
+
+# settings without defaults, the tests don't connect to the broker
+TEST_ENVIRONMENT = {
+    "PUBLIC_KEY": public_pem.decode(),
+    "RABBITMQ_USERNAME": "guest",
+    "RABBITMQ_PASSWORD": "guest",
+    "RABBITMQ_HOST": "localhost",
+    "RABBITMQ_PORT": "5672",
+}
+
+# the services are imported as the src package, like in the containers
+sys.path.insert(0, str(SERVICE_DIR))
+for name, env_value in TEST_ENVIRONMENT.items():
+    os.environ.setdefault(name, env_value)
+
+
+@pytest.fixture
+def make_token():
+    def make(token_type: str = "access", **claims) -> str:
+        issued_at = int(time.time())
+        payload = {
+            "iss": "auth",
+            "type": token_type,
+            "iat": issued_at,
+            "exp": issued_at + TOKEN_LIFETIME,
+            **claims,
+        }
+        return jwt.encode(payload, signing_key, algorithm="RS256")
+
+    return make
@@ -0,0 +1,57 @@
+from http import HTTPStatus
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.services import connections
+from src.utils.jwt import InvalidToken, validate_user_token
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(
+        connections, "connection_registry", connections.ConnectionRegistry(1)
+    )
+    # without the context manager the lifespan doesn't connect to the broker
+    return TestClient(app)
+
+
+def stats_status(client: TestClient, token: str) -> int:
+    client.cookies.set("access_token", token)
+    return client.get("/api/v1/websocket/stats").status_code
+
+
+def test_user_token_is_accepted(make_token):
+    user = validate_user_token(make_token(user_id="user"))
+
+    assert user.user_id == "user"
+
+
+def test_refresh_token_is_rejected(make_token):
+    with pytest.raises(InvalidToken):
+        validate_user_token(make_token("refresh", user_id="user"))
+
+
+def test_missing_token_is_rejected():
+    with pytest.raises(InvalidToken):
+        validate_user_token(None)
+
+
+def test_stats_require_admin_panel(client, make_token):
+    admin_token = make_token(service_name="admin_panel")
+
+    assert stats_status(client, make_token(service_name="ugc")) == HTTPStatus.FORBIDDEN
+    assert stats_status(client, admin_token) == HTTPStatus.OK
+
+
+def test_stats_reject_user_tokens(client, make_token):
+    user_token = make_token(user_id="user")
+
+    assert stats_status(client, user_token) == HTTPStatus.UNAUTHORIZED
+
+
+def test_stats_reject_refresh_tokens(client, make_token):
+    refresh_token = make_token("refresh", service_name="admin_panel")
+
+    assert stats_status(client, refresh_token) == HTTPStatus.UNAUTHORIZED
@@ -0,0 +1,98 @@
+import asyncio
+from types import SimpleNamespace
+
+import orjson
+import pytest
+
+from src.models.notification import WebsocketNotification
+from src.services.connections import Connection, ConnectionRegistry
+from src.services.fanout import FanoutConsumer
+
+BUFFER_SIZE = 2
+BATCH_INTERVAL = 60
+
+
+class ClientWebsocket:
+    """
+    Client side of a websocket, records closes
+    """
+
+    def __init__(self) -> None:
+        self.close_codes: list[int] = []
+
+    async def close(self, code: int, reason: str = "") -> None:
+        self.close_codes.append(code)
+
+
+def connect(registry: ConnectionRegistry, user_id: str) -> Connection:
+    connection = Connection(
+        ClientWebsocket(), user_id, buffer_size=BUFFER_SIZE, batch_size=BUFFER_SIZE
+    )
+    registry.add(connection)
+    return connection
+
+
+def make_notification(user_id: str) -> WebsocketNotification:
+    return WebsocketNotification(
+        notification_id=f"{user_id}-notification", user_id=user_id, message="Hi"
+    )
+
+
+def make_message(user_id: str) -> SimpleNamespace:
+    body = orjson.dumps(make_notification(user_id).model_dump())
+    return SimpleNamespace(body=body, content_type="application/json", headers={})
+
+
+def frames(connection: Connection) -> list[dict]:
+    queued = []
+    while not connection.buffer.empty():
+        queued.append(orjson.loads(connection.buffer.get_nowait()))
+    return queued
+
+
+@pytest.mark.asyncio
+async def test_notification_reaches_user_connections():
+    registry = ConnectionRegistry(max_connections_per_user=BUFFER_SIZE)
+    first, second = connect(registry, "user"), connect(registry, "user")
+    other = connect(registry, "other")
+
+    delivered = registry.fan_out([make_notification("user")])
+
+    expected = [{"notification_id": "user-notification", "message": "Hi"}]
+    assert delivered == 2
+    assert frames(first) == frames(second) == expected
+    assert not frames(other)
+
+
+@pytest.mark.asyncio
+async def test_slow_connection_is_evicted():
+    registry = ConnectionRegistry(max_connections_per_user=1)
+    slow = connect(registry, "user")
+
+    registry.fan_out(
+        [make_notification("user") for _ in range(BUFFER_SIZE + 1)]
+    )
+    await asyncio.sleep(0)
+
+    assert not registry.is_connected("user")
+    assert slow.closed
+    assert slow.websocket.close_codes
+
+
+@pytest.mark.asyncio
+async def test_consumer_drops_other_users():
+    registry = ConnectionRegistry(max_connections_per_user=1)
+    connection = connect(registry, "user")
+    consumer = FanoutConsumer(
+        registry, batch_size=BUFFER_SIZE, batch_interval=BATCH_INTERVAL
+    )
+
+    await consumer.on_message(make_message("user"))
+    await consumer.on_message(make_message("other"))
+    # the batch isn't full, so it waits for the timer
+    assert not frames(connection)
+    consumer.flush()
+
+    assert [frame["notification_id"] for frame in frames(connection)] == [
+        "user-notification"
+    ]